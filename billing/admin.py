@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib import messages
-from .models import SuperPlanRequest, OrgSubscription, OrgLimitOverride, Plan, PlanVersion
+from .models import SuperPlanRequest, OrgSubscription, OrgLimitOverride, Plan, PlanVersion, UsageEvent, UsageReservation
 
 
 @admin.register(SuperPlanRequest)
@@ -32,4 +32,36 @@ class SuperPlanRequestAdmin(admin.ModelAdmin):
                 obj.grant_super(approved_by_user=request.user)
                 return
 
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(UsageEvent)
+class UsageEventAdmin(admin.ModelAdmin):
+    # append-only ledger: viewable for audits, never edited
+    list_display = ("id", "org", "batch", "labels", "period_start", "created_at")
+    list_filter = ("period_start",)
+    search_fields = ("org__name",)
+    raw_id_fields = ("org", "batch")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UsageReservation)
+class UsageReservationAdmin(admin.ModelAdmin):
+    list_display = ("id", "org", "labels", "status", "expires_at", "created_at")
+    list_filter = ("status",)
+    search_fields = ("org__name",)
+    raw_id_fields = ("org", "event")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
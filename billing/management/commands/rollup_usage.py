@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from billing.usage import release_expired_reservations, rollup_usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the UsageEvent ledger into OrgUsageLifetime / OrgUsagePeriod totals and release "
+        "expired usage reservations. Run periodically (cron) or with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", type=int, default=None, help="Only roll up this org id.")
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=0,
+            help="Keep running, rolling up every N seconds (default: once, then exit).",
+        )
+
+    def handle(self, *args, **options):
+        every = max(0.0, options["every"])
+
+        while True:
+            close_old_connections()
+
+            result = rollup_usage(org_id=options["org"])
+            self.stdout.write(f"Rolled up {result['labels']} label(s) across {result['counters']} counter(s).")
+
+            released = release_expired_reservations()
+            if released:
+                self.stdout.write(self.style.WARNING(f"Released {released} expired reservation(s)."))
+
+            if not every:
+                break
+            time.sleep(every)
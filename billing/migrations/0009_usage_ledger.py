@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_verification_reminder_stage'),
+        ('billing', '0008_alter_planversion_options_and_more'),
+        ('workspaces', '0017_labelbatch_row_storage_labelbatchcolumns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orgusagelifetime',
+            name='rolled_up_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orgusagelifetime',
+            name='rolled_up_event_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='orgusageperiod',
+            name='rolled_up_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orgusageperiod',
+            name='rolled_up_event_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='UsageEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('labels', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage_events', to='workspaces.labelbatch')),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_events', to='accounts.org')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['org', 'period_start', 'id'], name='billing_usageevent_bucket_idx')],
+            },
+        ),
+    ]
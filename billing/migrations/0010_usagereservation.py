@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_verification_reminder_stage'),
+        ('billing', '0009_usage_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('labels', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('HELD', 'Held'), ('COMMITTED', 'Committed'), ('RELEASED', 'Released')], default='HELD', max_length=16)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservation', to='billing.usageevent')),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_reservations', to='accounts.org')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['org', 'period_start', 'status', 'expires_at'], name='billing_reservation_held_idx')],
+            },
+        ),
+    ]
@@ -120,10 +120,16 @@ class OrgUsageLifetime(models.Model):
     """
     Lifetime usage for TRIAL (no time window).
     """
+    COUNTER_FIELD = "labels_generated_total"
+
     org = models.OneToOneField(Org, on_delete=models.CASCADE, related_name="usage_lifetime")
     labels_generated_total = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # UsageEvents up to this id are included in labels_generated_total (see rollup_usage)
+    rolled_up_event_id = models.BigIntegerField(default=0)
+    rolled_up_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self) -> str:
         return f"{self.org_id} lifetime labels={self.labels_generated_total}"
 
@@ -132,12 +138,18 @@ class OrgUsagePeriod(models.Model):
     """
     Period usage for paid plans (STARTER/PRO/SUPER): current 30-day window.
     """
+    COUNTER_FIELD = "labels_generated"
+
     org = models.ForeignKey(Org, on_delete=models.CASCADE, related_name="usage_periods")
     period_start = models.DateTimeField()
     period_end = models.DateTimeField()
 
     labels_generated = models.PositiveIntegerField(default=0)
 
+    # UsageEvents up to this id are included in labels_generated (see rollup_usage)
+    rolled_up_event_id = models.BigIntegerField(default=0)
+    rolled_up_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -149,6 +161,72 @@ class OrgUsagePeriod(models.Model):
         return f"{self.org_id} {self.period_start.date()} labels={self.labels_generated}"
 
 
+class UsageEvent(models.Model):
+    """
+    Append-only usage ledger: one row per charge (normally one per LabelBatch), never
+    updated. Totals live in OrgUsageLifetime / OrgUsagePeriod and are brought up to date
+    by `manage.py rollup_usage`; readers add the events past the rollup cursor.
+    """
+    org = models.ForeignKey(Org, on_delete=models.CASCADE, related_name="usage_events")
+    batch = models.ForeignKey(
+        "workspaces.LabelBatch", null=True, blank=True, on_delete=models.SET_NULL, related_name="usage_events"
+    )
+
+    # allowance bucket: OrgUsagePeriod.period_start, or empty for TRIAL lifetime usage
+    period_start = models.DateTimeField(null=True, blank=True)
+    labels = models.IntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["org", "period_start", "id"], name="billing_usageevent_bucket_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.org_id} +{self.labels} labels (batch {self.batch_id})"
+
+
+class UsageReservation(models.Model):
+    """
+    Labels set aside for a generation still in progress (see usage.reserve_labels).
+    HELD reservations count against the allowance until they are committed (-> a
+    UsageEvent), released, or expire; expired holds simply stop counting.
+    """
+    STATUS_HELD = "HELD"
+    STATUS_COMMITTED = "COMMITTED"
+    STATUS_RELEASED = "RELEASED"
+
+    STATUS_CHOICES = [
+        (STATUS_HELD, "Held"),
+        (STATUS_COMMITTED, "Committed"),
+        (STATUS_RELEASED, "Released"),
+    ]
+
+    org = models.ForeignKey(Org, on_delete=models.CASCADE, related_name="usage_reservations")
+    period_start = models.DateTimeField(null=True, blank=True)   # same bucket as UsageEvent
+    labels = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_HELD)
+    expires_at = models.DateTimeField()
+
+    event = models.OneToOneField(
+        UsageEvent, null=True, blank=True, on_delete=models.SET_NULL, related_name="reservation"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["org", "period_start", "status", "expires_at"], name="billing_reservation_held_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.org_id} {self.labels} labels {self.status}"
+
+
 class PaymentEvent(models.Model):
     """
     Placeholder ledger for Phase 1 (real Razorpay fields later).
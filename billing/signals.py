@@ -1,9 +1,18 @@
 # billing/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from accounts.models import Org
-from .models import OrgSubscription
+from .models import (
+    OrgLimitOverride,
+    OrgSubscription,
+    OrgUsageLifetime,
+    OrgUsagePeriod,
+    PaymentEvent,
+    Plan,
+    PlanVersion,
+)
+from .usage import invalidate_billing_snapshot
 
 
 @receiver(post_save, sender=Org)
@@ -11,3 +20,34 @@ def ensure_org_subscription(sender, instance: Org, created: bool, **kwargs):
     # For new orgs, always start in TRIAL
     if created:
         OrgSubscription.objects.get_or_create(org=instance, defaults={"status": OrgSubscription.STATUS_TRIAL})
+
+
+# ---- billing snapshot invalidation (see usage.get_billing_snapshot) ----
+
+@receiver(post_save, sender=OrgSubscription)
+@receiver(post_delete, sender=OrgSubscription)
+@receiver(post_save, sender=OrgUsageLifetime)
+@receiver(post_delete, sender=OrgUsageLifetime)
+@receiver(post_save, sender=OrgUsagePeriod)
+@receiver(post_delete, sender=OrgUsagePeriod)
+@receiver(post_save, sender=OrgLimitOverride)
+@receiver(post_delete, sender=OrgLimitOverride)
+def invalidate_org_billing(sender, instance, **kwargs):
+    invalidate_billing_snapshot(instance.org_id)
+
+
+@receiver(post_save, sender=PaymentEvent)
+def invalidate_on_payment(sender, instance: PaymentEvent, **kwargs):
+    # webhooks / returns record the payment before touching the subscription
+    invalidate_billing_snapshot(instance.org_id)
+
+
+@receiver(post_save, sender=PlanVersion)
+@receiver(post_save, sender=Plan)
+def invalidate_plan_subscribers(sender, instance, **kwargs):
+    subs = OrgSubscription.objects.filter(status=OrgSubscription.STATUS_ACTIVE)
+    if sender is Plan:
+        subs = subs.filter(plan_version__plan=instance)
+    else:
+        subs = subs.filter(plan_version=instance)
+    invalidate_billing_snapshot(*subs.values_list("org_id", flat=True))
@@ -1,3 +1,205 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Org
+
+from .models import OrgUsageLifetime, UsageEvent, UsageReservation
+from . import usage
+from .usage import (
+    LOCAL_SNAPSHOT_TTL, ROLLUP_GRACE, SNAPSHOT_KEY, LabelLimitExceeded, charge_label_generation,
+    clear_local_snapshots, commit_reservation, get_billing_snapshot, get_labels_used, record_label_generation,
+    release_expired_reservations, release_reservation, reserve_labels, rollup_usage, snapshot_cache_enabled,
+)
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+REDIS = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost"}}
+
+
+class BillingSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_snapshots()
+        self.org = Org.objects.create(name="Acme")
+        OrgUsageLifetime.objects.create(org=self.org, labels_generated_total=5)
+
+    def test_cache_enabled_only_for_shared_backends(self):
+        with override_settings(CACHES=LOCMEM):
+            self.assertFalse(snapshot_cache_enabled())
+        with override_settings(CACHES=REDIS):
+            self.assertTrue(snapshot_cache_enabled())
+
+    @override_settings(CACHES=LOCMEM)
+    def test_process_local_cache_memoizes_briefly(self):
+        with mock.patch("billing.usage.time.monotonic", return_value=1000.0):
+            self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 5)
+
+            # a write made by another worker: no signal reaches this process
+            OrgUsageLifetime.objects.filter(org=self.org).update(labels_generated_total=9)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 5)
+
+        with mock.patch("billing.usage.time.monotonic", return_value=1000.0 + LOCAL_SNAPSHOT_TTL):
+            self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 9)
+        self.assertIsNone(cache.get(SNAPSHOT_KEY.format(org_id=self.org.id)))
+
+    @override_settings(CACHES=LOCMEM)
+    def test_process_local_cache_invalidated_by_own_writes(self):
+        self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            usage_row = OrgUsageLifetime.objects.get(org=self.org)
+            usage_row.labels_generated_total = 9
+            usage_row.save()
+        self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 9)
+
+    def test_snapshot_fetches_subscription_once(self):
+        with mock.patch.object(usage, "get_or_create_subscription", wraps=usage.get_or_create_subscription) as get_sub:
+            usage.build_billing_snapshot(self.org)
+        self.assertEqual(get_sub.call_count, 1)
+
+    def test_shared_cache_hit_runs_no_queries_and_writes_invalidate(self):
+        with mock.patch("billing.usage.snapshot_cache_enabled", return_value=True):
+            self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 5)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 5)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                usage_row = OrgUsageLifetime.objects.get(org=self.org)
+                usage_row.labels_generated_total = 9
+                usage_row.save()
+
+            self.assertEqual(get_billing_snapshot(self.org.id)["labels_used"], 9)
+
+
+class UsageLedgerTests(TestCase):
+    # a fresh org is on TRIAL: TRIAL_LABELS_TOTAL (5) lifetime labels
+
+    def setUp(self):
+        clear_local_snapshots()
+        self.org = Org.objects.create(name="Acme")
+
+    def age_events(self, by):
+        UsageEvent.objects.filter(org=self.org).update(created_at=timezone.now() - by)
+
+    def test_only_enforced_charges_lock_the_counter(self):
+        with mock.patch.object(usage, "_lock_bucket", wraps=usage._lock_bucket) as lock:
+            record_label_generation(self.org, 2)
+            self.assertEqual(lock.call_count, 0)
+            charge_label_generation(self.org, 1)
+            self.assertEqual(lock.call_count, 1)
+
+    def test_rollup_leaves_recent_events_to_readers(self):
+        record_label_generation(self.org, 3)
+
+        self.assertEqual(rollup_usage(), {"counters": 0, "labels": 0})
+        self.assertEqual(get_labels_used(self.org), 3)
+
+        self.age_events(ROLLUP_GRACE + timedelta(seconds=1))
+        self.assertEqual(rollup_usage(), {"counters": 1, "labels": 3})
+        counter = OrgUsageLifetime.objects.get(org=self.org)
+        self.assertEqual(counter.labels_generated_total, 3)
+        self.assertEqual(counter.rolled_up_event_id, UsageEvent.objects.get(org=self.org).id)
+
+    def test_labels_used_adds_events_past_the_cursor(self):
+        record_label_generation(self.org, 3)
+        self.age_events(ROLLUP_GRACE * 2)
+        rollup_usage()
+
+        record_label_generation(self.org, 1)
+        # 3 rolled up + 1 pending
+        self.assertEqual(get_labels_used(self.org), 4)
+
+        # nothing new to fold: the counter is not visited again
+        self.assertEqual(rollup_usage(), {"counters": 0, "labels": 0})
+        self.age_events(ROLLUP_GRACE * 2)
+        self.assertEqual(rollup_usage(), {"counters": 1, "labels": 1})
+        self.assertEqual(OrgUsageLifetime.objects.get(org=self.org).labels_generated_total, 4)
+        self.assertEqual(get_labels_used(self.org), 4)
+
+
+class ReservationTests(TestCase):
+    # a fresh org is on TRIAL: TRIAL_LABELS_TOTAL (5) lifetime labels
+
+    def setUp(self):
+        clear_local_snapshots()
+        self.org = Org.objects.create(name="Acme")
+
+    def remaining(self):
+        clear_local_snapshots()
+        return get_billing_snapshot(self.org.id)["labels_remaining"]
+
+    def test_reserve_over_limit_raises(self):
+        with self.assertRaises(LabelLimitExceeded) as ctx:
+            reserve_labels(self.org, 6)
+        self.assertEqual(ctx.exception.remaining, 5)
+        self.assertFalse(UsageReservation.objects.exists())
+
+    def test_held_labels_reduce_remaining(self):
+        reserve_labels(self.org, 3)
+        self.assertEqual(self.remaining(), 2)
+
+        with self.assertRaises(LabelLimitExceeded):
+            reserve_labels(self.org, 3)
+        with self.assertRaises(LabelLimitExceeded):
+            charge_label_generation(self.org, 3)
+
+    def test_commit_live_hold_skips_the_limit_check(self):
+        res = reserve_labels(self.org, 3)
+        record_label_generation(self.org, 2)   # used 2 + held 3: allowance fully spent
+
+        with mock.patch.object(usage, "_check_allowance") as check:
+            event = commit_reservation(res)
+        check.assert_not_called()
+
+        self.assertEqual(event.labels, 3)
+        self.assertEqual(res.status, UsageReservation.STATUS_COMMITTED)
+        self.assertEqual(get_labels_used(self.org), 5)
+        self.assertEqual(self.remaining(), 0)
+
+    def test_commit_lapsed_hold_enforces_the_limit(self):
+        res = reserve_labels(self.org, 3)
+        UsageReservation.objects.filter(pk=res.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        record_label_generation(self.org, 4)
+
+        with self.assertRaises(LabelLimitExceeded):
+            commit_reservation(res)
+        res.refresh_from_db()
+        self.assertEqual(res.status, UsageReservation.STATUS_HELD)
+        self.assertEqual(get_labels_used(self.org), 4)
+
+    def test_commit_lapsed_hold_that_fits(self):
+        res = reserve_labels(self.org, 3)
+        release_reservation(res)
+        event = commit_reservation(res)
+        self.assertEqual(event.labels, 3)
+
+    def test_commit_twice_returns_the_same_event(self):
+        res = reserve_labels(self.org, 3)
+        first = commit_reservation(res)
+        second = commit_reservation(UsageReservation.objects.get(pk=res.pk))
+        self.assertEqual(first, second)
+        self.assertEqual(UsageEvent.objects.filter(org=self.org).count(), 1)
+
+    def test_release(self):
+        res = reserve_labels(self.org, 3)
+        self.assertTrue(release_reservation(res))
+        self.assertFalse(release_reservation(res))
+        self.assertEqual(self.remaining(), 5)
+
+        commit_reservation(reserve_labels(self.org, 1))
+        self.assertEqual(self.remaining(), 4)
+
+    def test_release_expired_reservations(self):
+        live = reserve_labels(self.org, 1)
+        expired = reserve_labels(self.org, 2, ttl=timedelta(seconds=-1))
+        self.assertEqual(self.remaining(), 4)   # an expired hold already stopped counting
+
+        self.assertEqual(release_expired_reservations(), 1)
+        expired.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(expired.status, UsageReservation.STATUS_RELEASED)
+        self.assertEqual(live.status, UsageReservation.STATUS_HELD)
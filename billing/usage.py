@@ -1,17 +1,50 @@
 # billing/usage.py
 from __future__ import annotations
 
+import threading
+import time
 from datetime import timedelta, datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
+from django.conf import settings as django_settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Sum
+from django.db.models.functions import Now
 from django.utils import timezone
 
 from accounts.models import Org
 from billing.constants import (
     TRIAL_WORKSPACE_LIMIT, TRIAL_TEMPLATE_LIMIT, TRIAL_LABELS_TOTAL,
 )
-from .models import OrgSubscription, OrgUsageLifetime, OrgUsagePeriod, OrgLimitOverride
+from .models import (
+    OrgLimitOverride,
+    OrgSubscription,
+    OrgUsageLifetime,
+    OrgUsagePeriod,
+    UsageEvent,
+    UsageReservation,
+)
+
+SNAPSHOT_TTL = 300              # seconds; writes invalidate explicitly, the TTL is a backstop
+SNAPSHOT_KEY = "billing:snapshot:v1:{org_id}"
+
+# per-process backends: an invalidation would only reach the worker that made the write
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# with those, snapshots are memoized per process for a few seconds instead: other workers
+# see a write at most LOCAL_SNAPSHOT_TTL late (the pill only; limits are enforced live)
+LOCAL_SNAPSHOT_TTL = 5
+LOCAL_SNAPSHOT_MAX = 1024
+
+_local_snapshots: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+_local_lock = threading.Lock()
+RESERVATION_TTL = timedelta(minutes=30)
+# rollup_usage leaves newer events to the readers: an event is written as the last
+# statement of its transaction, so one this old is committed (or never will be)
+ROLLUP_GRACE = timedelta(minutes=5)
 
 
 def get_or_create_subscription(org: Org) -> OrgSubscription:
@@ -60,15 +93,17 @@ def refresh_subscription_state(sub: OrgSubscription, *, now=None) -> OrgSubscrip
 
     return sub
 
-def get_effective_entitlements(org: Org) -> Dict[str, Optional[int]]:
+def get_effective_entitlements(org: Org, sub: Optional[OrgSubscription] = None) -> Dict[str, Optional[int]]:
     """
     Returns effective entitlements (None = unlimited):
       - workspace_limit
       - template_limit
       - labels_limit
     NOTE: labels_limit is the unified key used everywhere in views/templates/pill.
+    Pass an already refreshed `sub` to skip fetching it again.
     """
-    sub = refresh_subscription_state(get_or_create_subscription(org))
+    if sub is None:
+        sub = refresh_subscription_state(get_or_create_subscription(org))
 
     # defaults
     ent: Dict[str, Optional[int]] = {
@@ -111,68 +146,422 @@ def get_effective_entitlements(org: Org) -> Dict[str, Optional[int]]:
 
     return ent
 
-@transaction.atomic()
+def _pending_labels(org_id: int, period_start, after_event_id: int) -> int:
+    """
+    Ledger events of one allowance bucket not yet rolled up (id > after_event_id).
+    """
+    agg = UsageEvent.objects.filter(
+        org_id=org_id, period_start=period_start, id__gt=int(after_event_id or 0)
+    ).aggregate(total=Sum("labels"))
+    return int(agg["total"] or 0)
+
+
+def _labels_used(org: Org, sub: OrgSubscription) -> int:
+    # rolled-up total + events past the cursor; a missing usage row means nothing generated yet
+    if sub.status == OrgSubscription.STATUS_TRIAL:
+        rolled, cursor = (
+            OrgUsageLifetime.objects
+            .filter(org=org)
+            .values_list("labels_generated_total", "rolled_up_event_id")
+            .first()
+        ) or (0, 0)
+        return int(rolled or 0) + _pending_labels(org.id, None, cursor)
+
+    if sub.status == OrgSubscription.STATUS_ACTIVE and sub.current_period_start and sub.current_period_end:
+        rolled, cursor = (
+            OrgUsagePeriod.objects
+            .filter(org=org, period_start=sub.current_period_start)
+            .values_list("labels_generated", "rolled_up_event_id")
+            .first()
+        ) or (0, 0)
+        return int(rolled or 0) + _pending_labels(org.id, sub.current_period_start, cursor)
+
+    return 0
+
+
 def get_labels_used(org: Org, now=None) -> int:
-    now = now or timezone.now()
+    """
+    Labels counted against the current allowance (TRIAL: lifetime, ACTIVE: period).
+    Read-only and lock-free: the rolled-up counter plus the UsageEvents recorded since.
+    """
+    sub = refresh_subscription_state(get_or_create_subscription(org), now=now)
+    return _labels_used(org, sub)
+
+
+class LabelLimitExceeded(Exception):
+    def __init__(self, requested: int, remaining: int):
+        self.requested = requested
+        self.remaining = remaining
+        super().__init__(f"You need {requested} labels but only {remaining} are left. Please upgrade.")
+
+
+def _usage_counter(org: Org, now):
+    """
+    (queryset of the org's current usage row, period_start) for the org's allowance
+    bucket (period_start None = TRIAL lifetime), or (None, None) when nothing is being
+    counted (no TRIAL / ACTIVE subscription). The row is created if missing.
+    """
     sub = get_or_create_subscription(org)
     sub = refresh_subscription_state(sub, now=now)
 
     # TRIAL => lifetime usage
     if sub.status == OrgSubscription.STATUS_TRIAL:
-        usage, _ = OrgUsageLifetime.objects.select_for_update().get_or_create(org=org)
-        return int(usage.labels_generated_total or 0)
+        OrgUsageLifetime.objects.get_or_create(org=org)
+        return OrgUsageLifetime.objects.filter(org=org), None
 
     # ACTIVE => period usage
     if sub.status == OrgSubscription.STATUS_ACTIVE and sub.current_period_start and sub.current_period_end:
-        usage, _ = OrgUsagePeriod.objects.select_for_update().get_or_create(
+        usage, created = OrgUsagePeriod.objects.get_or_create(
             org=org,
             period_start=sub.current_period_start,
             defaults={"period_end": sub.current_period_end, "labels_generated": 0},
         )
-        if usage.period_end != sub.current_period_end:
-            usage.period_end = sub.current_period_end
-            usage.save(update_fields=["period_end", "updated_at"])
-        return int(usage.labels_generated or 0)
+        rows = OrgUsagePeriod.objects.filter(pk=usage.pk)
+        if not created and usage.period_end != sub.current_period_end:
+            rows.update(period_end=sub.current_period_end, updated_at=now)
+        return rows, sub.current_period_start
+
+    return None, None
+
+
+def _held_labels(org_id: int, period_start, now) -> int:
+    """
+    Labels in unexpired HELD reservations of one allowance bucket.
+    """
+    agg = UsageReservation.objects.filter(
+        org_id=org_id,
+        period_start=period_start,
+        status=UsageReservation.STATUS_HELD,
+        expires_at__gt=now,
+    ).aggregate(total=Sum("labels"))
+    return int(agg["total"] or 0)
+
+
+def _lock_bucket(rows) -> None:
+    # Touching the usage row takes its lock until commit, so concurrent limit checks of
+    # one org cannot both spend the same allowance. Only taken where a limit is enforced.
+    rows.update(updated_at=Now())
+
+
+def _check_allowance(org: Org, rows, period_start, qty: int, limit: Optional[int], now) -> None:
+    """
+    Raises LabelLimitExceeded unless qty fits next to used + held labels.
+    Call with the bucket locked (_lock_bucket).
+    """
+    if limit is None:
+        return
+
+    used = 0
+    if rows is not None:
+        rolled, cursor = rows.values_list(rows.model.COUNTER_FIELD, "rolled_up_event_id").get()
+        used = int(rolled or 0) + _pending_labels(org.id, period_start, cursor)
+        used += _held_labels(org.id, period_start, now)
+
+    if used + qty > int(limit):
+        raise LabelLimitExceeded(qty, max(0, int(limit) - used))
 
-    return 0
 
 @transaction.atomic()
-def record_label_generation(org: Org, qty: int) -> None:
+def _append_usage(org: Org, qty: int, batch=None, limit: Optional[int] = None,
+                  enforce: bool = False) -> Optional[UsageEvent]:
+    now = timezone.now()
+    rows, period_start = _usage_counter(org, now)
+
+    if enforce and limit is not None:
+        if rows is not None:
+            _lock_bucket(rows)
+        _check_allowance(org, rows, period_start, qty, limit, now)
+    if rows is None:
+        return None
+
+    event = UsageEvent.objects.create(org=org, batch=batch, period_start=period_start, labels=qty)
+    invalidate_billing_snapshot(org.id)
+    return event
+
+
+def record_label_generation(org: Org, qty: int, batch=None) -> None:
+    """
+    Appends a UsageEvent for qty labels (no limit check).
+    """
     qty = int(qty or 0)
     if qty <= 0:
         return
+    _append_usage(org, qty, batch=batch)
 
-    now = timezone.now()
-    sub = get_or_create_subscription(org)
-    sub = refresh_subscription_state(sub, now=now)
 
-    # TRIAL => lifetime usage
-    if sub.status == OrgSubscription.STATUS_TRIAL:
-        usage, _ = OrgUsageLifetime.objects.select_for_update().get_or_create(org=org)
-        usage.labels_generated_total = int(usage.labels_generated_total or 0) + qty
-        usage.save(update_fields=["labels_generated_total", "updated_at"])
-        return
+def charge_label_generation(org: Org, qty: int, batch=None) -> None:
+    """
+    Check-and-record: reads the allowance left (rollup + pending events + held
+    reservations) and appends a UsageEvent while holding the usage row (limited plans
+    only), so concurrent generations cannot both spend the same allowance. Raises LabelLimitExceeded
+    (nothing recorded) when qty does not fit.
 
-    # ACTIVE => period usage
-    if sub.status == OrgSubscription.STATUS_ACTIVE and sub.current_period_start and sub.current_period_end:
-        usage, _ = OrgUsagePeriod.objects.select_for_update().get_or_create(
-            org=org,
-            period_start=sub.current_period_start,
-            defaults={"period_end": sub.current_period_end, "labels_generated": 0},
-        )
-        usage.labels_generated = int(usage.labels_generated or 0) + qty
-        usage.save(update_fields=["labels_generated", "updated_at"])
+    Call it inside the transaction that creates the batch, as its last statement: a
+    failed batch insert rolls the charge back, and the row stays locked only until commit.
+    For work that takes long before it can be charged, use reserve_labels instead.
+    """
+    qty = int(qty or 0)
+    if qty <= 0:
         return
 
-    return
+    limit = get_effective_entitlements(org).get("labels_limit")  # None => unlimited
+    _append_usage(org, qty, batch=batch, limit=limit, enforce=True)
+
+
+@transaction.atomic()
+def reserve_labels(org: Org, qty: int, ttl: timedelta = RESERVATION_TTL) -> UsageReservation:
+    """
+    Sets qty labels aside for a generation that takes a while (large import, background
+    render). The usage row is only locked while the hold is written, so call this outside
+    the long-running transaction. Then either commit_reservation or release_reservation;
+    a hold that is never finished stops counting after ttl.
+    Raises LabelLimitExceeded when qty does not fit.
+    """
+    qty = max(1, int(qty or 0))
+    now = timezone.now()
+
+    limit = get_effective_entitlements(org).get("labels_limit")  # None => unlimited
+    rows, period_start = _usage_counter(org, now)
+    if rows is not None and limit is not None:
+        _lock_bucket(rows)
+    _check_allowance(org, rows, period_start, qty, limit, now)
+
+    reservation = UsageReservation.objects.create(
+        org=org, period_start=period_start, labels=qty, expires_at=now + ttl,
+    )
+    invalidate_billing_snapshot(org.id)
+    return reservation
+
+
+@transaction.atomic()
+def commit_reservation(reservation: UsageReservation, batch=None, qty: Optional[int] = None) -> Optional[UsageEvent]:
+    """
+    Turns a hold into usage: appends the UsageEvent (qty defaults to the reserved labels,
+    and may be less). Safe to call inside the batch transaction.
+
+    A hold that expired or was released no longer guards anything, so the labels are
+    then charged like charge_label_generation (may raise LabelLimitExceeded).
+    Committing twice returns the first event.
+    """
+    res = UsageReservation.objects.select_for_update().select_related("org").get(pk=reservation.pk)
+    if res.status == UsageReservation.STATUS_COMMITTED:
+        return res.event
+
+    qty = res.labels if qty is None else int(qty)
+    if qty > res.labels:
+        raise ValueError(f"Cannot commit {qty} labels against a reservation of {res.labels}.")
+
+    now = timezone.now()
+    lapsed = res.status != UsageReservation.STATUS_HELD or res.expires_at <= now
+    limit = get_effective_entitlements(res.org).get("labels_limit") if lapsed else None
+
+    # a live hold is already counted against the allowance: no re-check needed
+    event = _append_usage(res.org, qty, batch=batch, limit=limit, enforce=lapsed) if qty > 0 else None
+
+    res.status = UsageReservation.STATUS_COMMITTED
+    res.event = event
+    res.save(update_fields=["status", "event", "updated_at"])
+
+    reservation.status, reservation.event = res.status, event
+    return event
+
+
+def release_reservation(reservation: UsageReservation) -> bool:
+    """
+    Gives a HELD reservation back (failed or cancelled generation). Returns False if it
+    was already committed or released.
+    """
+    released = UsageReservation.objects.filter(
+        pk=reservation.pk, status=UsageReservation.STATUS_HELD,
+    ).update(status=UsageReservation.STATUS_RELEASED, updated_at=timezone.now())
+
+    if released:
+        reservation.status = UsageReservation.STATUS_RELEASED
+        invalidate_billing_snapshot(reservation.org_id)
+    return bool(released)
+
+
+def release_expired_reservations() -> int:
+    """
+    Marks expired holds RELEASED. They already stopped counting at expires_at; this
+    keeps the HELD set small and the admin view honest.
+    """
+    expired = UsageReservation.objects.filter(
+        status=UsageReservation.STATUS_HELD, expires_at__lte=timezone.now(),
+    )
+    org_ids = list(expired.values_list("org_id", flat=True).distinct())
+    count = expired.update(status=UsageReservation.STATUS_RELEASED, updated_at=timezone.now())
+    invalidate_billing_snapshot(*org_ids)
+    return count
+
+
+def _rollup_counter(model, pk: int, org_id: int, period_start, now) -> int:
+    with transaction.atomic():
+        counter = model.objects.select_for_update().get(pk=pk)
+        agg = UsageEvent.objects.filter(
+            org_id=org_id, period_start=period_start, id__gt=counter.rolled_up_event_id,
+            created_at__lt=now - ROLLUP_GRACE,
+        ).aggregate(total=Sum("labels"), last=Max("id"))
+
+        updates = {"rolled_up_at": now}
+        if agg["last"]:
+            updates[model.COUNTER_FIELD] = F(model.COUNTER_FIELD) + int(agg["total"] or 0)
+            updates["rolled_up_event_id"] = agg["last"]
+        model.objects.filter(pk=pk).update(**updates)
+        return int(agg["total"] or 0)
+
+
+def rollup_usage(org_id: Optional[int] = None, now=None) -> Dict[str, int]:
+    """
+    Folds UsageEvents older than ROLLUP_GRACE into OrgUsageLifetime / OrgUsagePeriod
+    totals and advances their cursors. Only counters with such events past their cursor
+    are visited; each is locked for its own short transaction, never by the writers.
+    Returns {"counters": visited, "labels": rolled up}.
+    """
+    now = now or timezone.now()
+    new_events = UsageEvent.objects.filter(
+        org_id=OuterRef("org_id"),
+        id__gt=OuterRef("rolled_up_event_id"),
+        created_at__lt=now - ROLLUP_GRACE,
+    )
+    counters = labels = 0
+
+    lifetimes = OrgUsageLifetime.objects.filter(Exists(new_events.filter(period_start__isnull=True)))
+    periods = OrgUsagePeriod.objects.filter(Exists(new_events.filter(period_start=OuterRef("period_start"))))
+    if org_id:
+        lifetimes = lifetimes.filter(org_id=org_id)
+        periods = periods.filter(org_id=org_id)
+
+    for pk, oid in lifetimes.values_list("pk", "org_id").iterator():
+        labels += _rollup_counter(OrgUsageLifetime, pk, oid, None, now)
+        counters += 1
+    for pk, oid, period_start in periods.values_list("pk", "org_id", "period_start").iterator():
+        labels += _rollup_counter(OrgUsagePeriod, pk, oid, period_start, now)
+        counters += 1
+
+    return {"counters": counters, "labels": labels}
 
 
 def get_labels_remaining(org: Org) -> Optional[int]:
-    ent = get_effective_entitlements(org)
-    limit = ent.get("labels_limit")  # None => unlimited
+    """
+    From the cached snapshot, so it may trail a concurrent generation by one write;
+    charge_label_generation re-checks under the usage row before anything is recorded.
+    """
+    return get_billing_snapshot(org.id, org=org)["labels_remaining"]
 
-    if limit is None:
-        return None
 
-    used = get_labels_used(org)
-    return max(0, int(limit) - int(used))
+def _plan_code_label(sub: OrgSubscription):
+    if sub.status == OrgSubscription.STATUS_TRIAL:
+        return "TRIAL", "Free Trial"
+    if sub.status == OrgSubscription.STATUS_ACTIVE and sub.plan_version and sub.plan_version.plan:
+        plan_code = (sub.plan_version.plan.code or "NONE").upper()
+        return plan_code, sub.plan_version.plan.name or plan_code
+    return "NONE", "NONE"
+
+
+def build_billing_snapshot(org: Org) -> Dict[str, Any]:
+    now = timezone.now()
+    sub = refresh_subscription_state(get_or_create_subscription(org), now=now)
+
+    labels_limit = get_effective_entitlements(org, sub=sub).get("labels_limit")  # None => unlimited
+    used = _labels_used(org, sub)
+    plan_code, plan_label = _plan_code_label(sub)
+
+    held = 0
+    if sub.status == OrgSubscription.STATUS_TRIAL:
+        held = _held_labels(org.id, None, now)
+    elif sub.status == OrgSubscription.STATUS_ACTIVE and sub.current_period_start:
+        held = _held_labels(org.id, sub.current_period_start, now)
+
+    return {
+        "status": sub.status,
+        "plan_code": plan_code,
+        "plan_label": plan_label,
+        "labels_limit": labels_limit,
+        "labels_used": used,
+        "labels_held": held,
+        "labels_remaining": None if labels_limit is None else max(0, int(labels_limit) - used - held),
+        "period_end": sub.current_period_end,
+    }
+
+
+def snapshot_cache_enabled() -> bool:
+    backend = django_settings.CACHES.get("default", {}).get("BACKEND", "")
+    return backend not in PROCESS_LOCAL_CACHES
+
+
+def _snapshot_ttl(snap: Dict[str, Any], ttl: int) -> int:
+    # never outlive an ACTIVE period
+    if snap["period_end"]:
+        ttl = max(1, min(ttl, int((snap["period_end"] - timezone.now()).total_seconds())))
+    return ttl
+
+
+def clear_local_snapshots() -> None:
+    with _local_lock:
+        _local_snapshots.clear()
+
+
+def _get_local_snapshot(org_id: int, org: Optional[Org]) -> Dict[str, Any]:
+    now = time.monotonic()
+    with _local_lock:
+        hit = _local_snapshots.get(org_id)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+
+    snap = build_billing_snapshot(org or Org.objects.get(id=org_id))
+    expires = now + _snapshot_ttl(snap, LOCAL_SNAPSHOT_TTL)
+
+    with _local_lock:
+        if len(_local_snapshots) >= LOCAL_SNAPSHOT_MAX:
+            for stale in [k for k, (exp, _) in _local_snapshots.items() if exp <= now]:
+                del _local_snapshots[stale]
+            if len(_local_snapshots) >= LOCAL_SNAPSHOT_MAX:
+                _local_snapshots.clear()
+        _local_snapshots[org_id] = (expires, snap)
+    return snap
+
+
+def get_billing_snapshot(org_id: int, org: Optional[Org] = None) -> Dict[str, Any]:
+    """
+    Plan + label allowance of an org, cached (see build_billing_snapshot for the keys).
+    A cache hit runs no queries; pass `org` to save the Org lookup on a miss.
+
+    Invalidated by signals on subscription / usage / override / plan writes; the TTL
+    never outlives an ACTIVE period, so expiry shows up on time without a write.
+    With a per-process cache (no Redis) the snapshot is only memoized in the process
+    for LOCAL_SNAPSHOT_TTL seconds, since an invalidation could not reach other workers.
+    """
+    if not snapshot_cache_enabled():
+        return _get_local_snapshot(org_id, org)
+
+    key = SNAPSHOT_KEY.format(org_id=org_id)
+    snap = cache.get(key)
+    if snap is not None:
+        return snap
+
+    snap = build_billing_snapshot(org or Org.objects.get(id=org_id))
+    cache.set(key, snap, _snapshot_ttl(snap, SNAPSHOT_TTL))
+    return snap
+
+
+def invalidate_billing_snapshot(*org_ids: int) -> None:
+    """
+    Drops cached snapshots once the current transaction commits (immediately outside one),
+    so a concurrent reader cannot re-cache the pre-commit state.
+    """
+    org_ids = [org_id for org_id in org_ids if org_id]
+    if not org_ids:
+        return
+
+    if snapshot_cache_enabled():
+        keys = [SNAPSHOT_KEY.format(org_id=org_id) for org_id in org_ids]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        return
+
+    def drop_local():
+        with _local_lock:
+            for org_id in org_ids:
+                _local_snapshots.pop(org_id, None)
+
+    transaction.on_commit(drop_local)
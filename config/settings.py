@@ -196,6 +196,24 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Cache (compiled template layouts, etc.)
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    # per process: fine for compiled layouts; billing snapshots are then only memoized for
+    # a few seconds (an invalidation could not reach the other workers; see billing.usage)
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 #media
 
 MEDIA_URL = '/media/'
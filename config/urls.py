@@ -8,13 +8,12 @@ from django.urls import re_path
 from django.views.static import serve as django_serve
 from django.conf.urls.static import static
 from django.db.models import Sum
-from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 import os
 from cms.models import CMSPost
-from workspaces.models import Workspace, LabelTemplate, LabelBatch
+from workspaces.models import Workspace, LabelTemplate, DailyLabelUsage
 from django.contrib.sitemaps.views import sitemap, index
 from django.views.decorators.cache import cache_page
 from cms.sitemaps import CMSPostSitemap, StaticViewSitemap
@@ -164,13 +163,14 @@ def dashboard_view(request):
         ctx["start_date"] = ""
         ctx["end_date"] = ""
 
-    # Base queryset filtered by workspace scope (+ date range)
-    batches_qs = LabelBatch.objects.filter(workspace_id__in=scoped_ids)
+    # Daily rollup filtered by workspace scope (+ date range): a few rows per day instead
+    # of every batch (see workspaces.signals / backfill_daily_usage)
+    usage_qs = DailyLabelUsage.objects.filter(workspace_id__in=scoped_ids)
 
     if start_dt:
-        batches_qs = batches_qs.filter(created_at__gte=start_dt)
+        usage_qs = usage_qs.filter(day__gte=timezone.localdate(start_dt))
     if end_dt:
-        batches_qs = batches_qs.filter(created_at__lt=end_dt)
+        usage_qs = usage_qs.filter(day__lt=timezone.localdate(end_dt))
 
     # ---- KPI metrics ----
     ctx["workspace_count"] = len(scoped_ids)
@@ -179,15 +179,15 @@ def dashboard_view(request):
         workspace_id__in=scoped_ids
     ).count()
 
-    labels_total = batches_qs.aggregate(total=Sum("quantity")).get("total") or 0
+    labels_total = usage_qs.aggregate(total=Sum("labels")).get("total") or 0
     ctx["labels_total"] = int(labels_total)
 
     # ---- Chart: date-wise labels generated ----
     daily = (
-        batches_qs
-        .annotate(day=TruncDate("created_at"))
+        usage_qs
         .values("day")
-        .annotate(total=Sum("quantity"))
+        .annotate(total=Sum("labels"))
+        .filter(total__gt=0)
         .order_by("day")
     )
 
@@ -199,17 +199,18 @@ def dashboard_view(request):
 
     # ---- Top categories by labels generated ----
     top_categories = (
-        batches_qs
-        .values("template__category")
-        .annotate(total=Sum("quantity"))
+        usage_qs
+        .values("template_category")
+        .annotate(total=Sum("labels"))
+        .filter(total__gt=0)
         .order_by("-total")[:8]
     )
 
     cat_map = dict(LabelTemplate.CATEGORY_CHOICES)
     ctx["top_categories"] = [
         {
-            "key": row["template__category"],
-            "label": cat_map.get(row["template__category"], row["template__category"]),
+            "key": row["template_category"],
+            "label": cat_map.get(row["template_category"], row["template_category"]),
             "total": int(row["total"] or 0),
         }
         for row in top_categories
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WorkspacesConfig(AppConfig):
     name = 'workspaces'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from workspaces.utils.daily_usage import rebuild_daily_usage
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyLabelUsage dashboard table from existing label batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", type=int, default=None, help="Only rebuild this org id.")
+        parser.add_argument(
+            "--workspace",
+            type=int,
+            action="append",
+            default=None,
+            help="Only rebuild this workspace id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_daily_usage(org_id=options["org"], workspace_ids=options["workspace"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily usage row(s)."))
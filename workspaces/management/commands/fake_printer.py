@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from workspaces.utils.fake_printer import FakePrinterServer
+
+
+class Command(BaseCommand):
+    help = "Run a stand-in raw port 9100 label printer (for trying out spool_batch without hardware)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=9100)
+        parser.add_argument("--drop-after", type=int, default=0, help="Drop the connection once after N labels.")
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds to stall per read (slow printer).")
+        parser.add_argument("--out", default="", help="Append every received label to this file.")
+
+    def handle(self, *args, **options):
+        server = FakePrinterServer(
+            (options["bind"], options["port"]),
+            drop_after=options["drop_after"],
+            latency=options["latency"],
+        ).start()
+        self.stdout.write(f"Fake printer listening on {options['bind']}:{server.server_address[1]} (Ctrl+C to stop)")
+
+        seen = 0
+        try:
+            while True:
+                time.sleep(1)
+                with server.lock:
+                    new = server.labels[seen:]
+                    seen = len(server.labels)
+                if not new:
+                    continue
+                if options["out"]:
+                    with open(options["out"], "ab") as fh:
+                        fh.writelines(new)
+                self.stdout.write(f"{seen} label(s) received")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from workspaces.utils.render_jobs import claim_next_job, purge_old_jobs, requeue_stale_jobs, run_job
+
+PURGE_EVERY = 3600   # seconds between deletions of expired jobs / artifacts
+
+
+class Command(BaseCommand):
+    help = "Process queued label render/export jobs (PDF, CSV). Run one or more alongside the web process."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process queued jobs until the queue is empty, then exit.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        once = options["once"]
+        sleep = max(0.1, options["sleep"])
+
+        self.stdout.write("Render worker started.")
+        next_purge = 0.0
+
+        while True:
+            close_old_connections()
+
+            if time.monotonic() >= next_purge:
+                purged = purge_old_jobs()
+                if purged:
+                    self.stdout.write(f"Deleted {purged} expired job(s) and their files.")
+                next_purge = time.monotonic() + PURGE_EVERY
+
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"Recovered {requeued} stale job(s)."))
+
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(sleep)
+                continue
+
+            self.stdout.write(f"Job #{job.id}: {job.kind} for batch #{job.batch_id}")
+            started = time.monotonic()
+            run_job(job)
+
+            elapsed = time.monotonic() - started
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(f"Job #{job.id} done in {elapsed:.1f}s"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job #{job.id} failed: {job.error}"))
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from workspaces.models import LabelBatch
+from workspaces.utils.batch_expansion import batch_label_total
+from workspaces.utils.compiled_layout import get_compiled_layout
+from workspaces.utils.spooler import RAW_PORT, RawPrinterSpooler, SpoolError
+from workspaces.utils.thermal import FORMAT_EPL, FORMAT_ZPL, clamp_thermal_dpi, thermal_labels
+
+
+class Command(BaseCommand):
+    help = "Print a label batch straight to a raw TCP (port 9100) thermal printer as ZPL or EPL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("batch_id", type=int)
+        parser.add_argument("--host", required=True, help="Printer IP / hostname.")
+        parser.add_argument("--port", type=int, default=RAW_PORT)
+        parser.add_argument("--format", choices=["zpl", "epl"], default="zpl")
+        parser.add_argument("--dpi", type=int, default=0, help="Printer resolution (default: template DPI).")
+        parser.add_argument("--start", type=int, default=1, help="First label number (to resume a job).")
+        parser.add_argument("--end", type=int, default=0, help="Last label number (default: whole batch).")
+        parser.add_argument("--chunk", type=int, default=50, help="Labels per acknowledged chunk.")
+        parser.add_argument("--offset-x", type=float, default=0.0, help="Horizontal calibration offset in mm.")
+        parser.add_argument("--offset-y", type=float, default=0.0, help="Vertical calibration offset in mm.")
+        parser.add_argument("--gap", type=float, default=3.0, help="Gap between labels on the roll in mm (EPL).")
+        parser.add_argument(
+            "--no-status",
+            action="store_true",
+            help="Do not wait for ~HS status replies (always the case for EPL).",
+        )
+
+    def handle(self, *args, **options):
+        batch = (
+            LabelBatch.objects
+            .select_related("template", "workspace__org")
+            .filter(id=options["batch_id"])
+            .first()
+        )
+        if batch is None:
+            raise CommandError(f"Batch #{options['batch_id']} not found.")
+
+        layout = get_compiled_layout(batch.template)
+        fmt = FORMAT_EPL if options["format"] == "epl" else FORMAT_ZPL
+        dpi = clamp_thermal_dpi(options["dpi"], batch.template.dpi)
+        total = batch_label_total(batch)
+        end = min(total, options["end"] or total)
+        start = max(1, options["start"])
+
+        if start > end:
+            raise CommandError(f"Nothing to print: start {start} is after end {end}.")
+
+        settings = {
+            "stock_type": "ROLL",
+            "offset_x_mm": options["offset_x"],
+            "offset_y_mm": options["offset_y"],
+            "gap_y_mm": options["gap"],
+        }
+
+        def source(first):
+            return thermal_labels(fmt, batch, layout, settings, dpi, first, end)
+
+        ack = "sent" if (fmt == FORMAT_EPL or options["no_status"]) else "status"
+        spooler = RawPrinterSpooler(options["host"], options["port"], ack=ack, chunk_labels=options["chunk"])
+
+        count = end - start + 1
+        self.stdout.write(f"Sending labels {start}-{end} of batch #{batch.id} ({fmt}, {dpi} dpi) to {options['host']}:{options['port']}")
+
+        step = max(1, count // 20)
+        reported = [start - 1]
+
+        def on_progress(acked):
+            if acked - reported[0] >= step or acked == end:
+                reported[0] = acked
+                self.stdout.write(f"  {acked}/{end} acknowledged")
+
+        try:
+            last = spooler.spool(source, start_label=start, on_progress=on_progress)
+        except SpoolError as e:
+            raise CommandError(f"{e}. Resume with --start {e.last_acked + 1}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: labels {start}-{last} sent."))
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0013_labelbatchitem_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labelbatch',
+            name='label_index',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='labelbatchitem',
+            index=models.Index(fields=['batch', 'row_index'], name='ws_batchitem_batch_row_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0015_renderjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='renderjob',
+            name='kind',
+            field=models.CharField(choices=[('PDF', 'PDF'), ('CSV', 'CSV'), ('TIFF', 'TIFF')], default='PDF', max_length=8),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-17 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0016_alter_renderjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labelbatch',
+            name='row_storage',
+            field=models.CharField(choices=[('ROWS', 'One LabelBatchItem per row'), ('COLUMNS', 'Columnar (LabelBatchColumns)')], default='ROWS', max_length=8),
+        ),
+        migrations.CreateModel(
+            name='LabelBatchColumns',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('keys', models.JSONField(blank=True, default=list)),
+                ('codec', models.CharField(choices=[('json', 'JSON'), ('zlib', 'JSON + zlib')], default='zlib', max_length=8)),
+                ('data', models.BinaryField()),
+                ('batch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='columns', to='workspaces.labelbatch')),
+            ],
+        ),
+    ]
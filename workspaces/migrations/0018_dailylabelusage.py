@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_verification_reminder_stage'),
+        ('workspaces', '0017_labelbatch_row_storage_labelbatchcolumns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLabelUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template_category', models.CharField(max_length=30)),
+                ('day', models.DateField()),
+                ('labels', models.PositiveBigIntegerField(default=0)),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_label_usage', to='accounts.org')),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_label_usage', to='workspaces.workspace')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['workspace', 'day'], name='ws_dailyusage_ws_day_idx'), models.Index(fields=['org', 'day'], name='ws_dailyusage_org_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('workspace', 'template_category', 'day'), name='ws_dailyusage_unique_bucket')],
+            },
+        ),
+    ]
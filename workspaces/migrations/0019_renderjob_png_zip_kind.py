@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0018_dailylabelusage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='renderjob',
+            name='kind',
+            field=models.CharField(choices=[('PDF', 'PDF'), ('CSV', 'CSV'), ('TIFF', 'TIFF'), ('PNG_ZIP', 'PNG ZIP')], default='PDF', max_length=8),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0019_renderjob_png_zip_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='renderjob',
+            name='kind',
+            field=models.CharField(choices=[('PDF', 'PDF'), ('CSV', 'CSV'), ('TIFF', 'TIFF'), ('PNG_ZIP', 'PNG ZIP'), ('THERMAL', 'ZPL / EPL')], default='PDF', max_length=8),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 01:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0020_renderjob_thermal_kind'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='labelbatchcolumns',
+            options={'ordering': ['batch', 'first_row']},
+        ),
+        migrations.AddField(
+            model_name='labelbatchcolumns',
+            name='first_row',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='labelbatchcolumns',
+            name='batch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='columns', to='workspaces.labelbatch'),
+        ),
+        migrations.AddConstraint(
+            model_name='labelbatchcolumns',
+            constraint=models.UniqueConstraint(fields=('batch', 'first_row'), name='ws_batchcolumns_block_uniq'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    from workspaces.utils.daily_usage import rebuild_daily_usage
+
+    rebuild_daily_usage(
+        batch_model=apps.get_model("workspaces", "LabelBatch"),
+        usage_model=apps.get_model("workspaces", "DailyLabelUsage"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0021_labelbatchcolumns_blocks'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
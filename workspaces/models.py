@@ -399,6 +399,14 @@ class LabelBatch(models.Model):
         (MODE_MULTI, "Multiple SKUs"),
     ]
 
+    STORAGE_ROWS = "ROWS"
+    STORAGE_COLUMNS = "COLUMNS"
+
+    STORAGE_CHOICES = [
+        (STORAGE_ROWS, "One LabelBatchItem per row"),
+        (STORAGE_COLUMNS, "Columnar (LabelBatchColumns)"),
+    ]
+
     workspace = models.ForeignKey(
         "Workspace",
         on_delete=models.CASCADE,
@@ -433,6 +441,12 @@ class LabelBatch(models.Model):
     # User-supplied values for non-barcode/QR fields (by field.key)
     field_values = models.JSONField(default=dict, blank=True)
 
+    # MULTI only: prefix-sum index over item quantities (see utils/batch_index.py)
+    label_index = models.JSONField(null=True, blank=True, editable=False)
+
+    # MULTI only: where the uploaded rows live (see utils/batch_columns.py)
+    row_storage = models.CharField(max_length=8, choices=STORAGE_CHOICES, default=STORAGE_ROWS)
+
     class Meta:
         ordering = ["-created_at"]
 
@@ -456,6 +470,154 @@ class LabelBatchItem(models.Model):
 
     class Meta:
         ordering = ["row_index", "id"]
+        indexes = [
+            models.Index(fields=["batch", "row_index"], name="ws_batchitem_batch_row_idx"),
+        ]
 
     def __str__(self):
         return f"Batch #{self.batch_id} Row {self.row_index}"
+
+
+class LabelBatchColumns(models.Model):
+    """
+    One block of rows of a MULTI batch (rows first_row .. first_row + row_count - 1):
+    ean / gs1 / quantity vectors plus one value array per field key, JSON encoded
+    (zlib compressed when codec="zlib"). Read through workspaces.utils.batch_columns.
+    """
+    CODEC_JSON = "json"
+    CODEC_ZLIB = "zlib"
+
+    CODEC_CHOICES = [
+        (CODEC_JSON, "JSON"),
+        (CODEC_ZLIB, "JSON + zlib"),
+    ]
+
+    batch = models.ForeignKey(
+        "LabelBatch",
+        on_delete=models.CASCADE,
+        related_name="columns",
+    )
+
+    first_row = models.PositiveIntegerField(default=0)  # 0-based position of the block's first row
+    row_count = models.PositiveIntegerField(default=0)
+    keys = models.JSONField(default=list, blank=True)
+    codec = models.CharField(max_length=8, choices=CODEC_CHOICES, default=CODEC_ZLIB)
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ["batch", "first_row"]
+        constraints = [
+            models.UniqueConstraint(fields=["batch", "first_row"], name="ws_batchcolumns_block_uniq"),
+        ]
+
+    def __str__(self):
+        return f"Batch #{self.batch_id} rows {self.first_row + 1}-{self.first_row + self.row_count}"
+
+
+class DailyLabelUsage(models.Model):
+    """
+    Labels generated per (workspace, template category, day): the dashboard charts read
+    this instead of aggregating LabelBatch. Kept current by workspaces/signals.py;
+    `manage.py backfill_daily_usage` rebuilds it from the batches.
+    """
+    org = models.ForeignKey(Org, on_delete=models.CASCADE, related_name="daily_label_usage")
+    workspace = models.ForeignKey(
+        "Workspace",
+        on_delete=models.CASCADE,
+        related_name="daily_label_usage",
+    )
+    template_category = models.CharField(max_length=30)
+    day = models.DateField()    # batch created_at in the current time zone (as TruncDate)
+    labels = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["workspace", "template_category", "day"], name="ws_dailyusage_unique_bucket"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["workspace", "day"], name="ws_dailyusage_ws_day_idx"),
+            models.Index(fields=["org", "day"], name="ws_dailyusage_org_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} ws #{self.workspace_id} {self.template_category}: {self.labels}"
+
+
+class RenderJob(models.Model):
+    """
+    Background render/export of a LabelBatch, picked up by `manage.py render_worker`.
+    """
+    KIND_PDF = "PDF"
+    KIND_CSV = "CSV"
+    KIND_TIFF = "TIFF"
+    KIND_PNG_ZIP = "PNG_ZIP"
+    KIND_THERMAL = "THERMAL"
+
+    KIND_CHOICES = [
+        (KIND_PDF, "PDF"),
+        (KIND_CSV, "CSV"),
+        (KIND_TIFF, "TIFF"),
+        (KIND_PNG_ZIP, "PNG ZIP"),
+        (KIND_THERMAL, "ZPL / EPL"),
+    ]
+
+    STATUS_QUEUED = "QUEUED"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    batch = models.ForeignKey(
+        "LabelBatch",
+        on_delete=models.CASCADE,
+        related_name="render_jobs",
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="render_jobs",
+    )
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES, default=KIND_PDF)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    # print settings + computed page layout captured at enqueue time
+    params = models.JSONField(default=dict, blank=True)
+
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+
+    artifact = models.FileField(upload_to="render_jobs/", blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="ws_renderjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"RenderJob #{self.id} {self.kind} batch #{self.batch_id} ({self.status})"
+
+    @property
+    def percent(self) -> int:
+        if not self.progress_total:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return min(100, int(self.progress_done * 100 / self.progress_total))
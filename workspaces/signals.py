@@ -0,0 +1,35 @@
+# workspaces/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import LabelBatch, RenderJob
+from .utils.artifact_cache import drop_batch_artifacts
+from .utils.daily_usage import add_daily_usage
+
+
+@receiver(post_save, sender=LabelBatch)
+def count_new_batch(sender, instance: LabelBatch, created: bool, **kwargs):
+    # counted after the batch's transaction commits; a failed import is never counted
+    if created and not kwargs.get("raw"):
+        add_daily_usage(instance, instance.quantity)
+
+
+@receiver(pre_delete, sender=LabelBatch)
+def uncount_deleted_batch(sender, instance: LabelBatch, **kwargs):
+    # pre_delete: on cascades (template / workspace deleted) the parents still exist here
+    add_daily_usage(instance, -int(instance.quantity or 0))
+
+
+@receiver(post_delete, sender=RenderJob)
+def delete_job_artifact(sender, instance: RenderJob, **kwargs):
+    # also runs for the jobs of a deleted batch (cascade); files go only once the rows are gone
+    if instance.artifact:
+        storage, name = instance.artifact.storage, instance.artifact.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=LabelBatch)
+def delete_batch_artifacts(sender, instance: LabelBatch, **kwargs):
+    batch_id = instance.id
+    transaction.on_commit(lambda: drop_batch_artifacts(batch_id))
@@ -1,3 +1,607 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Org
+from billing.models import UsageEvent, UsageReservation
+from billing.usage import clear_local_snapshots
+
+from .models import DailyLabelUsage, LabelBatch, LabelBatchItem, LabelTemplate, RenderJob, Workspace
+from .utils import artifact_cache
+from .utils.artifact_cache import artifact_key, cached_artifact_path, store_artifact
+from .utils import batch_columns
+from .utils.batch_columns import iter_column_rows, store_batch_columns, use_columnar_storage
+from .utils.batch_expansion import build_barcode_base, iter_batch_labels
+from .utils.daily_usage import rebuild_daily_usage
+from .utils.batch_index import BatchIndexMismatch, build_batch_index, get_batch_index, locate_label
+from .utils.fake_printer import FakePrinterServer
+from .utils.imposition import SHEET_PRESETS
+from .utils.render_jobs import SYNC_RENDER_MAX_LABELS, enqueue_render_job, job_retention, purge_old_jobs, run_job
+from .utils.spooler import RawPrinterSpooler
+
+# (ean, gs1, quantity) per row; SKUs repeat so per-SKU serials carry across rows
+ROWS = [
+    ("1111111111111", "", 3),
+    ("2222222222222", "G2", 1),
+    ("1111111111111", "", 4),
+    ("3333333333333", "", 0),   # 0 prints one label, as PositiveIntegerField "or 1" did
+    ("2222222222222", "G2", 2),
+    ("1111111111111", "", 1),
+]
+
+
+def old_numbering(batch, rows):
+    """
+    Label numbering of the original _build_batch_label_payload (full walk over all rows):
+    [(label_no, row_index, serial, barcode_value), ...]
+    """
+    sku_totals = {}
+    for ean, gs1, qty in rows:
+        sku_totals[(ean, gs1)] = sku_totals.get((ean, gs1), 0) + int(qty or 1)
+
+    out = []
+    counters = {}
+    label_no = 0
+    for row_index, (ean, gs1, qty) in enumerate(rows, start=1):
+        digits = max(3, len(str(sku_totals[(ean, gs1)])))
+        base = build_barcode_base(batch.workspace.org, batch, ean, gs1)
+        for _ in range(int(qty or 1)):
+            label_no += 1
+            counters[(ean, gs1)] = counters.get((ean, gs1), 0) + 1
+            serial = str(counters[(ean, gs1)]).zfill(digits)
+            out.append((label_no, row_index, serial, f"{base}{serial}"))
+    return out
+
+
+class BatchFixtureMixin:
+    def setUp(self):
+        super().setUp()
+        # block ids are reused once a test's transaction rolls back
+        batch_columns.clear_decoded_cache()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Org.objects.create(name="Acme")
+        cls.user = get_user_model().objects.create_user(email="owner@example.com", password="x", org=cls.org)
+        cls.workspace = Workspace.objects.create(org=cls.org, name="WS", created_by=cls.user)
+        cls.template = LabelTemplate.objects.create(
+            workspace=cls.workspace, name="T", width_cm=5, height_cm=3, created_by=cls.user,
+            layout_json={"items": [
+                {"field_type": "TEXT", "key": "name", "name": "Name"},
+                {"field_type": "BARCODE", "key": "barcode", "name": "Barcode"},
+            ]},
+        )
+
+    def make_multi_batch(self, rows=ROWS):
+        batch = LabelBatch.objects.create(
+            workspace=self.workspace, template=self.template, created_by=self.user,
+            mode=LabelBatch.MODE_MULTI, quantity=sum(int(q or 1) for _, _, q in rows),
+        )
+        LabelBatchItem.objects.bulk_create([
+            LabelBatchItem(batch=batch, row_index=i, ean_code=ean, gs1_code=gs1, quantity=qty,
+                           field_values={"name": f"row {i}"})
+            for i, (ean, gs1, qty) in enumerate(rows, start=1)
+        ])
+        return batch
+
+    def make_columnar_batch(self, rows=ROWS):
+        batch = LabelBatch.objects.create(
+            workspace=self.workspace, template=self.template, created_by=self.user,
+            mode=LabelBatch.MODE_MULTI, quantity=sum(int(q or 1) for _, _, q in rows),
+        )
+        store_batch_columns(batch, [
+            {"ean_code": ean, "gs1_code": gs1, "quantity": qty or 1, "field_values": {"name": f"row {i}"}}
+            for i, (ean, gs1, qty) in enumerate(rows, start=1)
+        ])
+        return batch
+
+
+class BatchIndexTests(BatchFixtureMixin, TestCase):
+    def test_locate_label_matches_full_walk(self):
+        batch = self.make_multi_batch()
+        index = get_batch_index(batch)
+        expected = old_numbering(batch, ROWS)
+
+        self.assertEqual(index["total"], len(expected))
+        for label_no, row_index, serial, _ in expected:
+            pos, serial_num, digits = locate_label(index, label_no)
+            self.assertEqual(index["row_index"][pos], row_index, label_no)
+            self.assertEqual(str(serial_num).zfill(digits), serial, label_no)
+
+    def test_locate_label_out_of_range(self):
+        index = build_batch_index([(1, "A", "", 2), (2, "B", "", 3)])
+        self.assertIsNone(locate_label(index, 0))
+        self.assertIsNone(locate_label(index, 6))
+        self.assertEqual(locate_label(index, 3), (1, 1, 3))
+
+    def test_index_is_persisted(self):
+        batch = self.make_multi_batch()
+        get_batch_index(batch)
+        batch.refresh_from_db()
+        self.assertEqual(batch.label_index["total"], len(old_numbering(batch, ROWS)))
+
+        with self.assertNumQueries(0):
+            get_batch_index(batch)
+
+
+class BatchExpansionTests(BatchFixtureMixin, TestCase):
+    items_ui = [{"field_type": "TEXT", "key": "name"}]
+
+    def expanded(self, batch, start=None, end=None):
+        return [
+            (rec.index, rec.row_index, rec.serial, rec.barcode_value)
+            for rec in iter_batch_labels(batch, self.items_ui, start, end)
+        ]
+
+    def assert_matches_old(self, batch):
+        expected = old_numbering(batch, ROWS)
+        total = len(expected)
+        self.assertEqual(self.expanded(batch), expected)
+
+        # every window, so each row boundary is crossed from both sides
+        for start in range(1, total + 1):
+            for end in range(start, total + 1):
+                self.assertEqual(self.expanded(batch, start, end), expected[start - 1:end], (start, end))
+
+        self.assertEqual(self.expanded(batch, total + 1, total + 5), [])
+        self.assertEqual(self.expanded(batch, None, 2), expected[:2])
+
+    def test_row_storage_matches_old_payload(self):
+        self.assert_matches_old(self.make_multi_batch())
+
+    def test_columnar_storage_matches_old_payload(self):
+        self.assert_matches_old(self.make_columnar_batch())
+
+    def test_columnar_blocks_match_old_payload(self):
+        # 6 rows in blocks of 2: ranges cross block boundaries as well as row boundaries
+        with mock.patch.object(batch_columns, "BLOCK_ROWS", 2):
+            batch = self.make_columnar_batch()
+        self.assertEqual(batch.columns.count(), 3)
+        self.assert_matches_old(batch)
+
+    def test_rows_carry_field_values(self):
+        batch = self.make_multi_batch()
+        names = [(rec.index, rec.row.field_values["name"]) for rec in iter_batch_labels(batch, self.items_ui, 3, 5)]
+        self.assertEqual(names, [(3, "row 1"), (4, "row 2"), (5, "row 3")])
+
+    def test_duplicate_row_index_keeps_row_data(self):
+        # legacy / retried ingest: rows 2 and 3 both stored as row_index 2
+        batch = self.make_multi_batch()
+        batch.items.filter(row_index=3).update(row_index=2)
+
+        def names(start, end):
+            return [(rec.index, rec.row.field_values["name"]) for rec in iter_batch_labels(batch, self.items_ui, start, end)]
+
+        full = names(None, None)
+        self.assertEqual([n for _, n in full[3:9]], ["row 2"] + ["row 3"] * 4 + ["row 4"])
+        for start in range(1, len(full) + 1):
+            for end in range(start, len(full) + 1):
+                self.assertEqual(names(start, end), full[start - 1:end], (start, end))
+
+    def test_rows_out_of_line_with_index_fail_loudly(self):
+        batch = self.make_multi_batch()
+        get_batch_index(batch)
+        batch.items.filter(row_index=3).delete()
+
+        with self.assertRaises(BatchIndexMismatch):
+            list(iter_batch_labels(batch, self.items_ui, 1, 12))
+        with self.assertRaises(BatchIndexMismatch):
+            list(iter_batch_labels(batch, self.items_ui, 5, 6))
+
+    def test_single_batch_serials(self):
+        batch = LabelBatch.objects.create(
+            workspace=self.workspace, template=self.template, created_by=self.user,
+            mode=LabelBatch.MODE_SINGLE, ean_code="999", quantity=1200,
+        )
+        base = build_barcode_base(self.org, batch, "999", "")
+        self.assertEqual(
+            self.expanded(batch, 998, 1001),
+            [(n, 1, str(n).zfill(4), f"{base}{str(n).zfill(4)}") for n in range(998, 1002)],
+        )
+
+
+class SpoolerResumeTests(SimpleTestCase):
+    preamble = "^XA^DFR:WSLABEL.ZPL^FS^XZ\n"
+
+    def source(self, total):
+        def labels_from(start):
+            self.starts.append(start)
+            return self.preamble, ((n, f"^XA^XFR:WSLABEL.ZPL^FS^FN1^FDL{n}^FS^XZ\n") for n in range(start, total + 1))
+        return labels_from
+
+    def test_resumes_after_last_acknowledged_label(self):
+        self.starts = []
+        server = FakePrinterServer(("127.0.0.1", 0), drop_after=120).start()
+        self.addCleanup(server.stop)
+        host, port = server.server_address
+
+        spooler = RawPrinterSpooler(host, port, ack="status", chunk_labels=50, io_timeout=5)
+        with mock.patch("workspaces.utils.spooler.time.sleep"):
+            last = spooler.spool(self.source(260))
+
+        self.assertTrue(server.dropped)
+        self.assertEqual(last, 260)
+        # chunks 1-50 and 51-100 were acknowledged by ~HS before the drop at label 120
+        self.assertEqual(self.starts, [1, 101])
+
+        # stored format resent on the new connection
+        self.assertEqual(len(server.formats), 2)
+
+        numbers = [int(re.search(rb"\^FDL(\d+)\^", label).group(1)) for label in server.labels]
+        self.assertEqual(numbers[:120], list(range(1, 121)))
+        # resume starts right after the last ack: only the unacknowledged tail is resent
+        self.assertEqual(numbers[120:], list(range(101, 261)))
+        self.assertEqual(sorted(set(numbers)), list(range(1, 261)))
+
+
+class ArtifactCacheTests(BatchFixtureMixin, TestCase):
+    settings_ = {"paper": "A4", "cols": 3, "gap_x_mm": 2}
+
+    def setUp(self):
+        super().setUp()
+        self.batch = self.make_multi_batch()
+
+    def test_key_is_stable(self):
+        self.assertEqual(
+            artifact_key(self.batch, "pdf", dict(self.settings_)),
+            artifact_key(self.batch, "pdf", dict(reversed(list(self.settings_.items())))),
+        )
+
+    def test_key_changes_with_template_version(self):
+        before = artifact_key(self.batch, "pdf", self.settings_)
+        self.template.updated_at += timedelta(seconds=1)
+        self.assertNotEqual(artifact_key(self.batch, "pdf", self.settings_), before)
+
+    def test_key_changes_with_print_settings_and_kind(self):
+        key = artifact_key(self.batch, "pdf", self.settings_)
+        self.assertNotEqual(artifact_key(self.batch, "pdf", dict(self.settings_, gap_x_mm=3)), key)
+        self.assertNotEqual(artifact_key(self.batch, "pdf", dict(self.settings_, offset_x_mm=0)), key)
+        self.assertNotEqual(artifact_key(self.batch, "html", self.settings_), key)
+
+    def test_oldest_artifacts_are_evicted(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(LABEL_ARTIFACT_CACHE_DIR=tmp):
+            keys = [artifact_key(self.batch, "pdf", dict(self.settings_, cols=n)) for n in range(1, 9)]
+            for n, key in enumerate(keys):
+                path = store_artifact(self.batch, key, "pdf", BytesIO(b"%PDF-" + key.encode()))
+                # distinct mtimes without sleeping
+                os.utime(path, (time.time() + n, time.time() + n))
+
+            kept = [k for k in keys if cached_artifact_path(self.batch, k, "pdf")]
+            self.assertEqual(kept, keys[-artifact_cache.MAX_ARTIFACTS_PER_BATCH:])
+            with open(cached_artifact_path(self.batch, keys[-1], "pdf"), "rb") as fh:
+                self.assertEqual(fh.read(), b"%PDF-" + keys[-1].encode())
+            self.assertFalse([n for n in os.listdir(os.path.join(tmp, str(self.batch.id))) if n.endswith(".tmp")])
+
+    def test_new_artifact_survives_eviction_with_equal_mtimes(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(LABEL_ARTIFACT_CACHE_DIR=tmp):
+            with mock.patch("workspaces.utils.artifact_cache.os.path.getmtime", return_value=0.0):
+                for n in range(1, 9):
+                    key = artifact_key(self.batch, "pdf", dict(self.settings_, cols=n))
+                    path = store_artifact(self.batch, key, "pdf", BytesIO(b"%PDF-"))
+                    self.assertEqual(cached_artifact_path(self.batch, key, "pdf"), path)
+
+            self.assertEqual(len(os.listdir(os.path.join(tmp, str(self.batch.id)))), artifact_cache.MAX_ARTIFACTS_PER_BATCH)
+
+
+@override_settings(LABEL_RENDER_PROCESSES=1)
+class PngZipExportTests(BatchFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.client.force_login(self.user)
+
+    def url(self, batch):
+        return reverse("label_batch_export_png_zip", args=[self.workspace.id, batch.id])
+
+    def test_small_batch_streams_in_request(self):
+        batch = self.make_multi_batch()
+        resp = self.client.get(self.url(batch) + "?dpi=100", secure=True)
+        self.assertEqual(resp.status_code, 200)
+
+        with zipfile.ZipFile(BytesIO(b"".join(resp.streaming_content))) as zf:
+            names = zf.namelist()
+            self.assertEqual(len(names), len(old_numbering(batch, ROWS)))
+            self.assertTrue(zf.read(names[0]).startswith(b"\x89PNG"))
+
+    def test_large_batch_is_sent_to_the_worker(self):
+        batch = self.make_multi_batch([("1111111111111", "", SYNC_RENDER_MAX_LABELS + 1)])
+        resp = self.client.get(self.url(batch), secure=True)
+        self.assertRedirects(
+            resp, reverse("label_batch_print", args=[self.workspace.id, batch.id]) + "?",
+            fetch_redirect_response=False,
+        )
+
+    def test_render_job_writes_zip(self):
+        batch = self.make_multi_batch()
+        job = enqueue_render_job(batch, RenderJob.KIND_PNG_ZIP, {"dpi": 100}, user=self.user)
+        with override_settings(MEDIA_ROOT=self.media.name):
+            run_job(job)
+            self.assertEqual(job.status, RenderJob.STATUS_DONE, job.error)
+            self.assertEqual(job.progress_done, len(old_numbering(batch, ROWS)))
+            with job.artifact.open("rb") as fh, zipfile.ZipFile(fh) as zf:
+                self.assertEqual(zf.namelist()[0], "0001_001.png")
+                self.assertEqual(len(zf.namelist()), job.progress_done)
+
+
+class ThermalExportTests(BatchFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.client.force_login(self.user)
+
+    def test_large_batch_renders_in_worker_then_serves_cached_artifact(self):
+        batch = self.make_multi_batch([("1111111111111", "", SYNC_RENDER_MAX_LABELS + 1)])
+        url = reverse("label_batch_print_thermal", args=[self.workspace.id, batch.id]) + "?format=zpl&dpi=203"
+
+        with override_settings(MEDIA_ROOT=self.media.name, LABEL_ARTIFACT_CACHE_DIR=self.media.name):
+            resp = self.client.get(url, secure=True)
+            self.assertEqual(resp.status_code, 302)
+
+            # print settings come from the same query string the print page sends
+            job_url = reverse("label_batch_render_job_create", args=[self.workspace.id, batch.id]) + "?format=zpl"
+            resp = self.client.post(job_url, {"kind": RenderJob.KIND_THERMAL, "format": "zpl", "dpi": "203"}, secure=True)
+            self.assertEqual(resp.status_code, 202)
+
+            job = RenderJob.objects.get(id=resp.json()["id"])
+            run_job(job)
+            self.assertEqual(job.status, RenderJob.STATUS_DONE, job.error)
+            self.assertEqual(job.progress_done, SYNC_RENDER_MAX_LABELS + 1)
+            with job.artifact.open("rb") as fh:
+                zpl = fh.read()
+            # stored format + one recall per label
+            self.assertEqual(zpl.count(b"^XZ"), SYNC_RENDER_MAX_LABELS + 2)
+
+            resp = self.client.get(url, secure=True)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(b"".join(resp.streaming_content), zpl)
+
+
+class BatchColumnsTests(BatchFixtureMixin, TestCase):
+    def make_blocks(self, rows=40, block_rows=10):
+        data = [("%013d" % n, "", 1) for n in range(rows)]
+        with mock.patch.object(batch_columns, "BLOCK_ROWS", block_rows):
+            return self.make_columnar_batch(data)
+
+    def test_columnar_storage_is_opt_in(self):
+        self.assertFalse(use_columnar_storage())
+        with override_settings(LABEL_BATCH_COLUMNAR=True):
+            self.assertTrue(use_columnar_storage())
+
+    def test_range_reads_decode_only_overlapping_blocks(self):
+        batch = self.make_blocks()
+        with mock.patch.object(batch_columns, "decode_block", wraps=batch_columns.decode_block) as decode:
+            rows = list(iter_column_rows(batch, 12, 21))
+        self.assertEqual([r.row_index for r in rows], list(range(13, 23)))
+        self.assertEqual(sorted(c.args[1] for c in decode.call_args_list), [10, 20])
+
+        # blocks 10 and 20 are now cached: no data fetched or decoded again
+        with mock.patch.object(batch_columns, "decode_block") as decode, self.assertNumQueries(1):
+            self.assertEqual(len(list(iter_column_rows(batch, 15, 25))), 11)
+        decode.assert_not_called()
+
+    def test_history_row_count_sums_blocks(self):
+        from .views import BATCH_ROW_COUNT
+
+        columnar = self.make_blocks()
+        rows = self.make_multi_batch()
+        counts = dict(
+            LabelBatch.objects.filter(id__in=[columnar.id, rows.id])
+            .annotate(row_count=BATCH_ROW_COUNT).values_list("id", "row_count")
+        )
+        self.assertEqual(counts, {columnar.id: 40, rows.id: len(ROWS)})
+
+    def test_decoded_cache_is_byte_bounded(self):
+        batch = self.make_blocks()
+        list(iter_column_rows(batch))
+        sizes = {block_id: block.nbytes for block_id, block in batch_columns._decoded.items()}
+        self.assertEqual(len(sizes), 4)
+        last_two = list(sizes)[-2:]
+
+        batch_columns.clear_decoded_cache()
+        cap = sum(sizes[b] for b in last_two)
+        with mock.patch.object(batch_columns, "DECODED_CACHE_BYTES", cap):
+            self.assertEqual(len(list(iter_column_rows(batch))), 40)
+        self.assertEqual(list(batch_columns._decoded), last_two)
+        self.assertEqual(batch_columns._decoded_bytes, cap)
+
+
+class DailyUsageTests(BatchFixtureMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_template = LabelTemplate.objects.create(
+            workspace=cls.workspace, name="T2", width_cm=5, height_cm=3, created_by=cls.user,
+            category=LabelTemplate.CATEGORY_FOOTWEAR,
+        )
+
+    def make_batch(self, quantity, day=None, template=None):
+        batch = LabelBatch.objects.create(
+            workspace=self.workspace, template=template or self.template, created_by=self.user,
+            mode=LabelBatch.MODE_SINGLE, quantity=quantity,
+        )
+        if day:
+            created_at = timezone.make_aware(datetime(day.year, day.month, day.day, 12))
+            LabelBatch.objects.filter(id=batch.id).update(created_at=created_at)
+            batch.created_at = created_at
+        return batch
+
+    def usage(self):
+        return {
+            (u.template_category, u.day): u.labels
+            for u in DailyLabelUsage.objects.filter(workspace=self.workspace)
+        }
+
+    def old_aggregates(self):
+        # what the dashboard used to compute from LabelBatch on every view
+        return {
+            (b["template__category"], b["day"]): b["total"]
+            for b in LabelBatch.objects.filter(workspace=self.workspace)
+            .annotate(day=TruncDate("created_at"))
+            .values("template__category", "day")
+            .annotate(total=Sum("quantity"))
+            .order_by()
+        }
+
+    def test_batch_counted_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            batch = self.make_batch(7)
+            self.assertEqual(self.usage(), {})   # no bucket row touched inside the transaction
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.usage(), {(self.template.category, timezone.localdate()): 7})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_batch(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.delete()
+        self.assertEqual(self.usage(), {(self.template.category, timezone.localdate()): 3})
+
+    def test_rolled_back_batch_is_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.make_batch(5)
+                    raise RuntimeError("import failed")
+            except RuntimeError:
+                pass
+        self.assertEqual(self.usage(), {})
+
+    def test_rebuild_matches_batch_aggregates(self):
+        for quantity, day, template in [
+            (4, date(2026, 3, 1), self.template),
+            (6, date(2026, 3, 1), self.template),
+            (2, date(2026, 3, 1), self.other_template),
+            (9, date(2026, 3, 2), self.template),
+            (1, date(2026, 3, 5), self.other_template),
+        ]:
+            self.make_batch(quantity, day, template)
+
+        self.assertEqual(rebuild_daily_usage(org_id=self.org.id), 4)
+        self.assertEqual(self.usage(), self.old_aggregates())
+
+    def test_dashboard_custom_range_includes_end_day(self):
+        get_user_model().objects.filter(id=self.user.id).update(role=get_user_model().ROLE_ADMIN)
+        for quantity, day in [(1, date(2026, 3, 1)), (10, date(2026, 3, 2)), (100, date(2026, 3, 3)),
+                              (1000, date(2026, 3, 4))]:
+            self.make_batch(quantity, day)
+        rebuild_daily_usage(org_id=self.org.id)
+
+        self.client.force_login(self.user)
+        resp = self.client.get(
+            reverse("dashboard"), {"range": "custom", "start": "2026-03-02", "end": "2026-03-03"}, secure=True,
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["labels_total"], 110)
+
+
+class MultiImportReservationTests(BatchFixtureMixin, TestCase):
+    CSV = b"EAN_CODE,GS1_CODE,QUANTITY,name\n1111111111111,,2,a\n2222222222222,,1,b\n"
+
+    def setUp(self):
+        super().setUp()
+        clear_local_snapshots()
+        get_user_model().objects.filter(id=self.user.id).update(role=get_user_model().ROLE_ADMIN)
+        self.client.force_login(self.user)
+
+    def post_import(self):
+        url = reverse("label_generate_multi", args=[self.workspace.id, self.template.id])
+        return self.client.post(url, {"import_file": SimpleUploadedFile("rows.csv", self.CSV)}, secure=True)
+
+    def test_import_commits_its_hold(self):
+        resp = self.post_import()
+        self.assertEqual(resp.status_code, 302)
+
+        res = UsageReservation.objects.get(org=self.org)
+        self.assertEqual(res.status, UsageReservation.STATUS_COMMITTED)
+        self.assertEqual(res.event.labels, 3)
+        self.assertEqual(res.event.batch, LabelBatch.objects.get(workspace=self.workspace))
+
+    def test_failed_import_releases_its_hold(self):
+        with mock.patch("workspaces.views.ingest_batch_items", side_effect=RuntimeError("COPY failed")):
+            with self.assertRaises(RuntimeError):
+                self.post_import()
+
+        res = UsageReservation.objects.get(org=self.org)
+        self.assertEqual(res.status, UsageReservation.STATUS_RELEASED)
+        self.assertFalse(LabelBatch.objects.filter(workspace=self.workspace).exists())
+        self.assertFalse(UsageEvent.objects.filter(org=self.org).exists())
+
+
+class RenderJobRetentionTests(BatchFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name, LABEL_ARTIFACT_CACHE_DIR=None)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.batch = self.make_multi_batch()
+
+    def finished_job(self, age=timedelta(0)):
+        job = enqueue_render_job(self.batch, RenderJob.KIND_CSV, {}, user=self.user)
+        run_job(job)
+        self.assertEqual(job.status, RenderJob.STATUS_DONE, job.error)
+        RenderJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - age)
+        return job
+
+    def test_purge_deletes_expired_jobs_and_files(self):
+        old = self.finished_job(age=job_retention() + timedelta(hours=1))
+        recent = self.finished_job()
+        queued = enqueue_render_job(self.batch, RenderJob.KIND_CSV, {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(purge_old_jobs(), 1)
+
+        self.assertEqual(set(RenderJob.objects.values_list("id", flat=True)), {recent.id, queued.id})
+        self.assertFalse(old.artifact.storage.exists(old.artifact.name))
+        self.assertTrue(recent.artifact.storage.exists(recent.artifact.name))
+
+    def test_deleting_a_batch_deletes_its_files(self):
+        job = self.finished_job()
+        cache_path = store_artifact(self.batch, "k" * 64, "pdf", BytesIO(b"%PDF"))
+        self.assertIsNotNone(cache_path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batch.delete()
+
+        self.assertFalse(job.artifact.storage.exists(job.artifact.name))
+        self.assertFalse(os.path.exists(os.path.dirname(cache_path)))
+
+
+class PrintSettingsTests(BatchFixtureMixin, TestCase):
+    def print_settings(self, query=None, **defaults):
+        from .views import _get_print_settings
+
+        self.template.print_defaults = defaults
+        return _get_print_settings(RequestFactory().get("/", query or {}), self.template)
+
+    def test_auto_layout_is_opt_in(self):
+        # templates saved before auto layout existed keep their manual grid
+        settings = self.print_settings()
+        self.assertEqual((settings["auto_layout"], settings["labels_per_row"]), (0, 1))
+        self.assertEqual(self.print_settings(labels_per_row=3)["labels_per_row"], 3)
+
+        self.assertEqual(self.print_settings({"auto_layout": "1"})["auto_layout"], 1)
+        self.assertEqual(self.print_settings(auto_layout=1)["auto_layout"], 1)
+
+    def test_sheet_preset_fixes_the_grid(self):
+        code, preset = next(iter(SHEET_PRESETS.items()))
+        settings = self.print_settings({"preset": code, "auto_layout": "1"})
+        self.assertEqual((settings["auto_layout"], settings["labels_per_row"]), (0, preset["cols"]))
@@ -83,6 +83,13 @@ urlpatterns = [
         name="label_batch_print",
     ),
     path("<int:workspace_id>/labels/batch/<int:batch_id>/print/full/", views.label_batch_print_full, name="label_batch_print_full"),
+    path("<int:workspace_id>/labels/batch/<int:batch_id>/print/pdf/", views.label_batch_print_pdf, name="label_batch_print_pdf"),
+    path("<int:workspace_id>/labels/batch/<int:batch_id>/print/thermal/", views.label_batch_print_thermal, name="label_batch_print_thermal"),
+    path("<int:workspace_id>/labels/batch/<int:batch_id>/print/png/", views.label_batch_label_png, name="label_batch_label_png"),
+    path("<int:workspace_id>/labels/batch/<int:batch_id>/export/png/", views.label_batch_export_png_zip, name="label_batch_export_png_zip"),
+    path("<int:workspace_id>/labels/batch/<int:batch_id>/jobs/", views.label_batch_render_job_create, name="label_batch_render_job_create"),
+    path("jobs/<int:job_id>/", views.render_job_status, name="render_job_status"),
+    path("jobs/<int:job_id>/download/", views.render_job_download, name="render_job_download"),
     path(
         "workspaces/<int:workspace_id>/labels/batch/<int:batch_id>/export/",
         views.label_batch_export_csv,
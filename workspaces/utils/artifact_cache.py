@@ -0,0 +1,107 @@
+# workspaces/utils/artifact_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from django.conf import settings as django_settings
+
+# Bump when renderer output changes so stale artifacts are no longer addressed.
+ARTIFACT_CACHE_VERSION = 2
+MAX_ARTIFACTS_PER_BATCH = 6   # distinct settings/kinds kept per batch (oldest evicted)
+
+
+def artifact_cache_dir() -> str:
+    return (
+        getattr(django_settings, "LABEL_ARTIFACT_CACHE_DIR", None)
+        or os.path.join(str(django_settings.MEDIA_ROOT), "print_cache")
+    )
+
+
+def settings_hash(print_settings: Dict[str, Any]) -> str:
+    normalized = json.dumps(print_settings or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def artifact_key(batch, kind: str, print_settings: Dict[str, Any]) -> str:
+    """
+    Key for a rendered batch: batch id + template version + print settings + output kind.
+    Batches never change after creation, so the template's updated_at is the only other input.
+    """
+    updated = getattr(batch.template, "updated_at", None)
+    raw = "|".join((
+        str(ARTIFACT_CACHE_VERSION),
+        str(batch.id),
+        updated.isoformat() if updated else "",
+        kind.lower(),
+        settings_hash(print_settings),
+    ))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def artifact_last_modified(batch):
+    updated = getattr(batch.template, "updated_at", None)
+    if updated and batch.created_at:
+        return max(updated, batch.created_at)
+    return updated or batch.created_at
+
+
+def artifact_etag(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def _path(batch_id: int, key: str, ext: str) -> str:
+    return os.path.join(artifact_cache_dir(), str(batch_id), f"{key}.{ext}")
+
+
+def cached_artifact_path(batch, key: str, ext: str) -> Optional[str]:
+    path = _path(batch.id, key, ext)
+    return path if os.path.isfile(path) else None
+
+
+def _prune(batch_dir: str, keep: str) -> None:
+    # `keep` was just written: never evict it, even if mtimes tie (coarse fs timestamps)
+    try:
+        entries = [
+            os.path.join(batch_dir, n) for n in os.listdir(batch_dir)
+            if not n.endswith(".tmp") and os.path.join(batch_dir, n) != keep
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for old in entries[MAX_ARTIFACTS_PER_BATCH - 1:]:
+            os.remove(old)
+    except OSError:
+        pass
+
+
+def drop_batch_artifacts(batch_id: int) -> None:
+    # the batch is gone: none of its settings/kinds can be addressed again
+    shutil.rmtree(os.path.join(artifact_cache_dir(), str(batch_id)), ignore_errors=True)
+
+
+def store_artifact(batch, key: str, ext: str, fileobj) -> Optional[str]:
+    """
+    Copies fileobj (from its current position) into the cache atomically.
+    Returns the cached path, or None if the cache dir is not writable.
+    """
+    path = _path(batch.id, key, ext)
+    batch_dir = os.path.dirname(path)
+    try:
+        os.makedirs(batch_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=batch_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            shutil.copyfileobj(fileobj, fh)
+        os.replace(tmp, path)
+    except OSError:
+        return None
+
+    _prune(batch_dir, keep=path)
+    return path
+
+
+def store_artifact_text(batch, key: str, ext: str, text: str) -> Optional[str]:
+    return store_artifact(batch, key, ext, BytesIO(text.encode("utf-8")))
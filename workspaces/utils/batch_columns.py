@@ -0,0 +1,233 @@
+# workspaces/utils/batch_columns.py
+from __future__ import annotations
+
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings as django_settings
+from django.db.models import F
+
+from workspaces.models import LabelBatch, LabelBatchColumns
+
+ZLIB_LEVEL = 6
+BLOCK_ROWS = 5000                        # rows per LabelBatchColumns record (the unit of decoding)
+BLOCKS_PER_INSERT = 20                   # encoded blocks held before one bulk_create
+DECODED_CACHE_BYTES = 64 * 1024 * 1024   # decoded blocks kept per process (rows never change after import)
+CELL_OVERHEAD_BYTES = 64                 # rough per-value cost of a decoded str/int over its JSON text
+
+_decoded: "OrderedDict[int, ColumnBlock]" = OrderedDict()
+_decoded_bytes = 0
+_decoded_lock = threading.Lock()
+
+
+def use_columnar_storage() -> bool:
+    # opt-in: by default rows are stored as LabelBatchItems (COPY / bulk_create ingest)
+    return bool(getattr(django_settings, "LABEL_BATCH_COLUMNAR", False))
+
+
+class ColumnRow:
+    """
+    One row of a columnar batch, with the same attributes as LabelBatchItem
+    (row_index, ean_code, gs1_code, quantity, field_values).
+    """
+
+    def __init__(self, block: "ColumnBlock", pos: int):
+        self._block = block
+        self._pos = pos
+
+    @property
+    def row_index(self) -> int:
+        return self._block.first_row + self._pos + 1
+
+    @property
+    def ean_code(self) -> str:
+        return self._block.ean[self._pos]
+
+    @property
+    def gs1_code(self) -> str:
+        return self._block.gs1[self._pos]
+
+    @property
+    def quantity(self) -> int:
+        return self._block.qty[self._pos]
+
+    @cached_property
+    def field_values(self) -> Dict[str, str]:
+        pos = self._pos
+        return {k: col[pos] for k, col in self._block.fields.items()}
+
+    def __repr__(self):
+        return f"<ColumnRow {self.row_index} of batch #{self._block.batch_id}>"
+
+
+class ColumnBlock:
+    """
+    Decoded rows of one LabelBatchColumns record. Position p (0-based) is batch row
+    first_row + p, i.e. row_index first_row + p + 1.
+    """
+
+    def __init__(self, batch_id: int, first_row: int, ean: List[str], gs1: List[str], qty: List[int],
+                 fields: Dict[str, List[str]], nbytes: int = 0):
+        self.batch_id = batch_id
+        self.first_row = first_row
+        self.ean = ean
+        self.gs1 = gs1
+        self.qty = qty
+        self.fields = fields
+        self.nbytes = nbytes
+
+    def __len__(self) -> int:
+        return len(self.qty)
+
+
+def encode_block(rows: List[Dict[str, Any]], compress: bool = True) -> Tuple[List[str], str, bytes]:
+    """
+    normalized rows (see bulk_import.validate_and_normalize_rows) -> (keys, codec, data).
+    Keys missing from a row store "" (same as a missing key in field_values).
+    """
+    ean: List[str] = []
+    gs1: List[str] = []
+    qty: List[int] = []
+    fields: Dict[str, List[str]] = {}
+
+    for n, r in enumerate(rows):
+        ean.append(r["ean_code"])
+        gs1.append(r.get("gs1_code") or "")
+        qty.append(int(r.get("quantity") or 1))
+        fv = r.get("field_values") or {}
+        for k in fv:
+            if k not in fields:
+                fields[k] = [""] * n
+        for k, col in fields.items():
+            col.append(str(fv.get(k, "") or ""))
+
+    payload = json.dumps(
+        {"ean": ean, "gs1": gs1, "qty": qty, "fields": fields},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    if compress:
+        return list(fields), LabelBatchColumns.CODEC_ZLIB, zlib.compress(payload, ZLIB_LEVEL)
+    return list(fields), LabelBatchColumns.CODEC_JSON, payload
+
+
+def decode_block(batch_id: int, first_row: int, codec: str, data) -> ColumnBlock:
+    raw = bytes(data)
+    if codec == LabelBatchColumns.CODEC_ZLIB:
+        raw = zlib.decompress(raw)
+    d = json.loads(raw)
+    qty = [int(q) for q in d["qty"]]
+    nbytes = len(raw) + CELL_OVERHEAD_BYTES * len(qty) * (3 + len(d["fields"]))
+    return ColumnBlock(batch_id, first_row, d["ean"], d["gs1"], qty, d["fields"], nbytes)
+
+
+def store_batch_columns(batch, normalized_rows: Iterable[Dict[str, Any]], compress: bool = True) -> int:
+    """
+    Writes the batch rows as LabelBatchColumns records of BLOCK_ROWS rows each and marks
+    the batch columnar. Call inside the batch's transaction. Returns the number of rows stored.
+    """
+    pending: List[LabelBatchColumns] = []
+    rows: List[Dict[str, Any]] = []
+    stored = 0
+
+    def add_block():
+        nonlocal rows, stored
+        keys, codec, data = encode_block(rows, compress=compress)
+        pending.append(LabelBatchColumns(
+            batch=batch, first_row=stored, row_count=len(rows), keys=keys, codec=codec, data=data,
+        ))
+        stored += len(rows)
+        rows = []
+
+    for r in normalized_rows:
+        rows.append(r)
+        if len(rows) >= BLOCK_ROWS:
+            add_block()
+            if len(pending) >= BLOCKS_PER_INSERT:
+                LabelBatchColumns.objects.bulk_create(pending)
+                pending.clear()
+    if rows:
+        add_block()
+    if pending:
+        LabelBatchColumns.objects.bulk_create(pending)
+
+    batch.row_storage = LabelBatch.STORAGE_COLUMNS
+    batch.save(update_fields=["row_storage"])
+    return stored
+
+
+def is_columnar(batch) -> bool:
+    return getattr(batch, "row_storage", LabelBatch.STORAGE_ROWS) == LabelBatch.STORAGE_COLUMNS
+
+
+def clear_decoded_cache() -> None:
+    global _decoded_bytes
+    with _decoded_lock:
+        _decoded.clear()
+        _decoded_bytes = 0
+
+
+def _load_block(batch_id: int, block_id: int, first_row: int, cache: bool = True) -> ColumnBlock:
+    global _decoded_bytes
+
+    with _decoded_lock:
+        block = _decoded.get(block_id)
+        if block is not None:
+            _decoded.move_to_end(block_id)
+            return block
+
+    codec, data = LabelBatchColumns.objects.values_list("codec", "data").get(id=block_id)
+    block = decode_block(batch_id, first_row, codec, data)
+    if not cache or block.nbytes > DECODED_CACHE_BYTES:
+        return block
+
+    with _decoded_lock:
+        if block_id not in _decoded:
+            _decoded[block_id] = block
+            _decoded_bytes += block.nbytes
+            while _decoded_bytes > DECODED_CACHE_BYTES:
+                _, old = _decoded.popitem(last=False)
+                _decoded_bytes -= old.nbytes
+    return block
+
+
+def _blocks(batch, first: int = 0, last: Optional[int] = None, cache: bool = True) -> Iterator[ColumnBlock]:
+    """
+    Decoded blocks overlapping row positions first..last (inclusive), in row order.
+    Only those blocks are fetched.
+    """
+    qs = LabelBatchColumns.objects.filter(batch_id=batch.id)
+    if last is not None:
+        qs = qs.filter(first_row__lte=last)
+    if first > 0:
+        qs = qs.annotate(end_row=F("first_row") + F("row_count")).filter(end_row__gt=first)
+
+    for block_id, first_row in list(qs.order_by("first_row").values_list("id", "first_row")):
+        yield _load_block(batch.id, block_id, first_row, cache=cache)
+
+
+def iter_column_rows(batch, first: int = 0, last: Optional[int] = None) -> Iterator[ColumnRow]:
+    """
+    Rows at positions first..last (0-based, inclusive; None = to the end), in row_index order.
+    """
+    first = max(0, first)
+    for block in _blocks(batch, first, last):
+        lo = max(first, block.first_row) - block.first_row
+        hi = len(block) - 1 if last is None else min(last - block.first_row, len(block) - 1)
+        for pos in range(lo, hi + 1):
+            yield ColumnRow(block, pos)
+
+
+def iter_column_index_rows(batch) -> Iterator[Tuple[int, str, str, int]]:
+    """
+    (row_index, ean_code, gs1_code, quantity) per row, as build_batch_index expects.
+    A one-off full pass, so the decoded blocks are not cached.
+    """
+    for block in _blocks(batch, cache=False):
+        for pos, (ean, gs1, qty) in enumerate(zip(block.ean, block.gs1, block.qty)):
+            yield block.first_row + pos + 1, ean, gs1, qty
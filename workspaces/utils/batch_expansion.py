@@ -0,0 +1,186 @@
+# workspaces/utils/batch_expansion.py
+from __future__ import annotations
+
+from typing import Any, Iterator, List, NamedTuple, Optional
+
+from workspaces.models import LabelBatch
+from workspaces.utils.batch_index import get_batch_index, iter_index_rows
+from workspaces.utils.qr_payload import build_qr_payload
+
+
+class LabelRecord(NamedTuple):
+    """
+    One printed label. `row` is the LabelBatchItem (MULTI) or the LabelBatch itself (SINGLE);
+    both expose ean_code / gs1_code / field_values.
+    """
+    index: int            # 1-based label number within the batch
+    serial: str           # zero-padded per-SKU serial
+    barcode_value: str
+    qr_value: str
+    row: Any
+    row_index: int
+    row_quantity: int
+
+
+def org_suffix4(org) -> str:
+    raw = str(getattr(org, "id", "") or "")
+    return raw[-4:].zfill(4)
+
+
+def build_barcode_base(org, batch, ean: str, gs1: str) -> str:
+    ean = (ean or "").strip()
+    gs1 = (gs1 or "").strip()
+    org_suffix = org_suffix4(org)
+    batch_part = str(getattr(batch, "id", "") or "")
+    return f"{ean}{gs1}{org_suffix}{batch_part}"
+
+
+def is_multi_batch(batch) -> bool:
+    return batch.mode == LabelBatch.MODE_MULTI
+
+
+def batch_label_total(batch) -> int:
+    if is_multi_batch(batch):
+        return int(get_batch_index(batch).get("total") or 0)
+    return max(1, int(batch.quantity or 1))
+
+
+def iter_batch_labels(batch, items_ui: List[dict], start_index: Optional[int] = None,
+                      end_index: Optional[int] = None) -> Iterator[LabelRecord]:
+    """
+    Lazily expands a batch into LabelRecords for labels start_index..end_index (1-based,
+    inclusive; None = open ended). Only the rows covering the range are read, one at a
+    time, so memory stays flat regardless of batch size.
+    """
+    org = batch.workspace.org
+    total = batch_label_total(batch)
+    lo = max(1, start_index if start_index is not None else 1)
+    hi = min(total, end_index if end_index is not None else total)
+    if lo > hi:
+        return
+
+    if is_multi_batch(batch):
+        index = get_batch_index(batch)
+        for row, row_start, serial_start, total_for_sku in iter_index_rows(batch, index, lo, hi):
+            row_values = row.field_values or {}
+            ean = (row.ean_code or "").strip()
+            gs1 = (row.gs1_code or "").strip()
+            row_qty = max(1, int(getattr(row, "quantity", 1) or 1))
+            row_index = int(getattr(row, "row_index", 1) or 1)
+            serial_digits = max(3, len(str(total_for_sku)))
+
+            qr_value = build_qr_payload(ean, gs1, row_values, items_ui)
+            barcode_base = build_barcode_base(org, batch, ean, gs1)
+
+            first = max(lo, row_start + 1)
+            last = min(hi, row_start + row_qty)
+            for label_no in range(first, last + 1):
+                serial = str(serial_start + (label_no - row_start)).zfill(serial_digits)
+                yield LabelRecord(
+                    index=label_no,
+                    serial=serial,
+                    barcode_value=f"{barcode_base}{serial}" if barcode_base else "",
+                    qr_value=qr_value,
+                    row=row,
+                    row_index=row_index,
+                    row_quantity=row_qty,
+                )
+        return
+
+    user_values = batch.field_values or {}
+    ean = (batch.ean_code or "").strip()
+    gs1 = (batch.gs1_code or "").strip()
+    serial_digits = max(3, len(str(total)))
+
+    qr_value = build_qr_payload(ean, gs1, user_values, items_ui)
+    barcode_base = build_barcode_base(org, batch, ean, gs1)
+
+    for label_no in range(lo, hi + 1):
+        serial = str(label_no).zfill(serial_digits)
+        yield LabelRecord(
+            index=label_no,
+            serial=serial,
+            barcode_value=f"{barcode_base}{serial}" if barcode_base else serial,
+            qr_value=qr_value,
+            row=batch,
+            row_index=1,
+            row_quantity=total,
+        )
+
+
+def label_values(record: LabelRecord, base_items: List[dict]) -> List[dict]:
+    """
+    Copies base_items (ui or mm print items) with per-label "value" filled in.
+    """
+    row_values = record.row.field_values or {}
+    out_items = []
+    for it in base_items:
+        out = dict(it)
+        ft = (out.get("field_type") or "TEXT").upper()
+        key = (out.get("key") or "").strip()
+
+        if ft == "BARCODE":
+            out["value"] = record.barcode_value
+        elif ft == "QRCODE":
+            out["value"] = record.qr_value
+        elif ft == "STATIC_TEXT":
+            out["value"] = out.get("static_value") or out.get("name") or ""
+        else:
+            out["value"] = row_values.get(key, "") if key else ""
+
+        out_items.append(out)
+    return out_items
+
+
+def static_values(static_items: List[dict]) -> List[dict]:
+    """
+    Copies static layer items (CompiledLayout.static_mm) with their fixed "value" filled in.
+    """
+    return [
+        dict(it, value=(it.get("static_value") or it.get("name") or "") if it["field_type"] == "STATIC_TEXT" else "")
+        for it in static_items
+    ]
+
+
+def export_fieldnames(layout) -> List[str]:
+    """
+    History export columns for a CompiledLayout (one row per printed label, both modes).
+    """
+    fieldnames = [
+        "Label Index",
+        "Row Index",
+        "Row Quantity",
+        "Row Serial",
+        "EAN Code",
+        "GS1 Code",
+    ]
+    if layout.has_barcode:
+        fieldnames.append("Barcode Encoded")
+    if layout.has_qr:
+        fieldnames.append("QR Encoded")
+
+    fieldnames += [layout.key_to_name.get(k, k) for k in layout.var_keys]
+    return fieldnames
+
+
+def iter_export_rows(batch, layout) -> Iterator[dict]:
+    for rec in iter_batch_labels(batch, layout.items_ui):
+        fv = rec.row.field_values or {}
+        out = {
+            "Label Index": rec.index,
+            "Row Index": rec.row_index,
+            "Row Quantity": rec.row_quantity,
+            "Row Serial": rec.serial,
+            "EAN Code": (rec.row.ean_code or "").strip(),
+            "GS1 Code": (rec.row.gs1_code or "").strip(),
+        }
+
+        if layout.has_barcode:
+            out["Barcode Encoded"] = rec.barcode_value
+        if layout.has_qr:
+            out["QR Encoded"] = rec.qr_value
+
+        for k in layout.var_keys:
+            out[layout.key_to_name.get(k, k)] = (fv.get(k, "") or "")
+
+        yield out
@@ -0,0 +1,160 @@
+# workspaces/utils/batch_index.py
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from workspaces.utils.batch_columns import is_columnar, iter_column_index_rows, iter_column_rows
+
+INDEX_VERSION = 1
+
+
+class BatchIndexMismatch(Exception):
+    """The batch rows no longer line up with its persisted label index."""
+
+
+def build_batch_index(rows: Iterable[Tuple[int, str, str, int]]) -> Dict[str, Any]:
+    """
+    Prefix-sum index over MULTI batch rows.
+
+    rows: (row_index, ean_code, gs1_code, quantity) in print order.
+
+    Returns parallel lists (one entry per row):
+      row_index:    LabelBatchItem.row_index
+      start:        labels printed before this row (0-based offset of its first label)
+      serial_start: labels of the same SKU (ean, gs1) printed before this row
+      sku_total:    total labels of this row's SKU in the batch (drives serial zero-padding)
+    plus "total" = labels in the whole batch.
+    """
+    row_indexes = []
+    starts = []
+    serial_starts = []
+    sku_keys = []
+
+    sku_counts: Dict[Tuple[str, str], int] = {}
+    total = 0
+
+    for row_index, ean, gs1, qty in rows:
+        qty = max(1, int(qty or 1))
+        sku_key = ((ean or "").strip(), (gs1 or "").strip())
+
+        row_indexes.append(int(row_index))
+        starts.append(total)
+        serial_starts.append(sku_counts.get(sku_key, 0))
+        sku_keys.append(sku_key)
+
+        sku_counts[sku_key] = sku_counts.get(sku_key, 0) + qty
+        total += qty
+
+    return {
+        "v": INDEX_VERSION,
+        "total": total,
+        "row_index": row_indexes,
+        "start": starts,
+        "serial_start": serial_starts,
+        "sku_total": [sku_counts[k] for k in sku_keys],
+    }
+
+
+def get_batch_index(batch) -> Dict[str, Any]:
+    """
+    Returns the persisted index of a MULTI batch, building + saving it on first use.
+    Batch rows never change after creation, so the index never goes stale.
+    """
+    index = batch.label_index or {}
+    if index.get("v") == INDEX_VERSION:
+        return index
+
+    if is_columnar(batch):
+        rows = iter_column_index_rows(batch)
+    else:
+        rows = (
+            batch.items
+            .order_by("row_index", "id")
+            .values_list("row_index", "ean_code", "gs1_code", "quantity")
+            .iterator()
+        )
+    index = build_batch_index(rows)
+
+    batch.label_index = index
+    batch.save(update_fields=["label_index"])
+    return index
+
+
+def locate_label(index: Dict[str, Any], label_no: int) -> Optional[Tuple[int, int, int]]:
+    """
+    Map a 1-based label number to (row position, per-SKU serial number, serial digits)
+    in O(log rows). Returns None if out of range.
+    """
+    if label_no < 1 or label_no > int(index.get("total") or 0):
+        return None
+
+    starts = index["start"]
+    pos = bisect_right(starts, label_no - 1) - 1
+    offset = (label_no - 1) - starts[pos]
+    serial_num = index["serial_start"][pos] + offset + 1
+    digits = max(3, len(str(index["sku_total"][pos])))
+    return pos, serial_num, digits
+
+
+def row_range_for_labels(index: Dict[str, Any], start_label: int, end_label: int) -> Optional[Tuple[int, int]]:
+    """
+    Row positions (inclusive) covering labels start_label..end_label (1-based).
+    """
+    total = int(index.get("total") or 0)
+    start_label = max(1, start_label)
+    end_label = min(total, end_label)
+    if start_label > end_label:
+        return None
+
+    starts = index["start"]
+    first = bisect_right(starts, start_label - 1) - 1
+    last = bisect_right(starts, end_label - 1) - 1
+    return first, last
+
+
+def iter_index_rows(batch, index: Dict[str, Any], start_label: int = 1,
+                    end_label: Optional[int] = None) -> Iterator[Tuple[Any, int, int, int]]:
+    """
+    Yields (row, start, serial_start, sku_total) for the rows that overlap labels
+    start_label..end_label, fetching only those rows. row is a LabelBatchItem, or a
+    ColumnRow for columnar batches.
+    """
+    total = int(index.get("total") or 0)
+    if end_label is None:
+        end_label = total
+
+    span = row_range_for_labels(index, start_label, end_label)
+    if span is None:
+        return
+    first, last = span
+
+    if is_columnar(batch):
+        for pos, row in enumerate(iter_column_rows(batch, first, last), start=first):
+            yield row, index["start"][pos], index["serial_start"][pos], index["sku_total"][pos]
+        return
+
+    row_indexes = index["row_index"]
+    qs = batch.items.order_by("row_index", "id")
+    skip = 0
+    if first > 0 or last < len(row_indexes) - 1:
+        qs = qs.filter(row_index__gte=row_indexes[first], row_index__lte=row_indexes[last])
+        # rows before `first` that share its row_index (duplicates) come back too
+        while first - skip > 0 and row_indexes[first - skip - 1] == row_indexes[first]:
+            skip += 1
+
+    pos = first - skip
+    for row in qs.iterator():
+        if pos > last:
+            break
+        if row.row_index != row_indexes[pos]:
+            raise BatchIndexMismatch(
+                f"Batch #{batch.id}: row at position {pos} has row_index {row.row_index}, "
+                f"index expects {row_indexes[pos]}."
+            )
+        if pos >= first:
+            yield row, index["start"][pos], index["serial_start"][pos], index["sku_total"][pos]
+        pos += 1
+
+    if pos <= last:
+        raise BatchIndexMismatch(f"Batch #{batch.id}: rows {pos}..{last} of the index are missing.")
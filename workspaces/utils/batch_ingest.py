@@ -0,0 +1,115 @@
+# workspaces/utils/batch_ingest.py
+from __future__ import annotations
+
+import json
+from io import StringIO
+from typing import Any, Dict, Iterable, Iterator, List
+
+from django.db import connection
+
+from workspaces.models import LabelBatchItem
+from workspaces.utils.batch_columns import store_batch_columns, use_columnar_storage
+
+BULK_CHUNK_SIZE = 2000   # rows per bulk_create INSERT
+COPY_CHUNK_SIZE = 10000  # rows per COPY buffer
+
+ITEM_COLUMNS = ("batch", "row_index", "ean_code", "gs1_code", "quantity", "field_values")
+
+
+def _item_values(batch, normalized_rows: Iterable[Dict[str, Any]]) -> Iterator[tuple]:
+    for idx, r in enumerate(normalized_rows, start=1):
+        yield (
+            batch.id,
+            idx,
+            r["ean_code"],
+            r.get("gs1_code") or "",
+            int(r.get("quantity") or 1),
+            r.get("field_values") or {},
+        )
+
+
+def _chunks(it: Iterable, size: int) -> Iterator[List]:
+    buf = []
+    for x in it:
+        buf.append(x)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def _copy_text(value) -> str:
+    # PostgreSQL COPY text format escaping
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _can_copy() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cur:
+        return hasattr(cur.cursor, "copy_expert")  # psycopg2
+
+
+def _copy_items(batch, normalized_rows) -> int:
+    opts = LabelBatchItem._meta
+    qn = connection.ops.quote_name
+    cols = ", ".join(qn(opts.get_field(name).column) for name in ITEM_COLUMNS)
+    sql = f"COPY {qn(opts.db_table)} ({cols}) FROM STDIN"
+
+    count = 0
+    with connection.cursor() as cur:
+        for chunk in _chunks(_item_values(batch, normalized_rows), COPY_CHUNK_SIZE):
+            buf = StringIO()
+            for batch_id, row_index, ean, gs1, qty, fv in chunk:
+                buf.write("\t".join((
+                    str(batch_id),
+                    str(row_index),
+                    _copy_text(ean),
+                    _copy_text(gs1),
+                    str(qty),
+                    _copy_text(json.dumps(fv)),
+                )))
+                buf.write("\n")
+            buf.seek(0)
+            cur.cursor.copy_expert(sql, buf)
+            count += len(chunk)
+    return count
+
+
+def _bulk_create_items(batch, normalized_rows) -> int:
+    count = 0
+    for chunk in _chunks(_item_values(batch, normalized_rows), BULK_CHUNK_SIZE):
+        LabelBatchItem.objects.bulk_create([
+            LabelBatchItem(
+                batch=batch,
+                row_index=row_index,
+                ean_code=ean,
+                gs1_code=gs1,
+                quantity=qty,
+                field_values=fv,
+            )
+            for _, row_index, ean, gs1, qty, fv in chunk
+        ])
+        count += len(chunk)
+    return count
+
+
+def ingest_batch_items(batch, normalized_rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Stores the rows of a MULTI batch (row_index = 1..N in file order): one LabelBatchItem
+    per row via COPY on PostgreSQL (psycopg2), chunked bulk_create elsewhere; compressed
+    LabelBatchColumns blocks instead when LABEL_BATCH_COLUMNAR is on (opt-in).
+    Call inside the batch's transaction. Returns the number of rows written.
+    """
+    if use_columnar_storage():
+        return store_batch_columns(batch, normalized_rows)
+    if _can_copy():
+        return _copy_items(batch, normalized_rows)
+    return _bulk_create_items(batch, normalized_rows)
@@ -2,7 +2,7 @@ from __future__ import annotations
 import csv
 import re
 from io import StringIO, BytesIO
-from typing import Dict, List, Tuple, Any
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from openpyxl import load_workbook, Workbook
 
@@ -12,6 +12,7 @@ REQUIRED_COL = "EAN_CODE"
 OPTIONAL_COL = "GS1_CODE"
 QTY_COL = "QUANTITY"
 MIN_QTY = 1
+MAX_ROW_ERRORS = 50  # stop validating after this many bad rows
 
 
 
@@ -61,29 +62,52 @@ def parse_csv_bytes(content: bytes) -> Tuple[List[str], List[Dict[str, str]]]:
     return headers, rows
 
 
-def parse_xlsx_bytes(content: bytes) -> Tuple[List[str], List[Dict[str, str]]]:
-    wb = load_workbook(filename=BytesIO(content), data_only=True)
+def iter_xlsx_rows(source) -> Tuple[List[str], Iterator[Dict[str, str]]]:
+    """
+    Streaming XLSX reader (openpyxl read_only mode).
+    source: bytes or a binary file object (e.g. the UploadedFile itself).
+
+    Only the header row is read up front; data rows are yielded one at a time as
+    {header: value} dicts, blank rows skipped. The workbook is closed when the
+    iterator is exhausted or discarded.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    wb = load_workbook(filename=source, read_only=True, data_only=True)
     ws = wb.active
-    all_rows = list(ws.iter_rows(values_only=True))
-    if not all_rows:
-        return [], []
+    row_iter = ws.iter_rows(values_only=True)
+
+    first = next(row_iter, None)
+    if first is None:
+        wb.close()
+        return [], iter(())
+
+    raw_headers = [str(x or "").strip() for x in first]
+
+    def gen():
+        try:
+            for row in row_iter:
+                if not row:
+                    continue
+                values = [str(x or "").strip() for x in row]
+                if not any(values):
+                    continue
+                d = {}
+                for i, h in enumerate(raw_headers):
+                    if not h:
+                        continue
+                    d[h] = values[i] if i < len(values) else ""
+                yield d
+        finally:
+            wb.close()
+
+    return raw_headers, gen()
 
-    raw_headers = [str(x or "").strip() for x in all_rows[0]]
-    headers = raw_headers
-    rows = []
-    for row in all_rows[1:]:
-        if not row:
-            continue
-        values = [str(x or "").strip() for x in row]
-        if not any(values):
-            continue
-        d = {}
-        for i, h in enumerate(raw_headers):
-            if not h:
-                continue
-            d[h] = values[i] if i < len(values) else ""
-        rows.append(d)
-    return headers, rows
+
+def parse_xlsx_bytes(content: bytes) -> Tuple[List[str], List[Dict[str, str]]]:
+    headers, rows = iter_xlsx_rows(content)
+    return headers, list(rows)
 
 
 def make_csv_template_bytes(headers: List[str]) -> bytes:
@@ -102,15 +126,27 @@ def make_xlsx_template_bytes(headers: List[str]) -> bytes:
     return bio.getvalue()
 
 
+def _close_rows(rows) -> None:
+    # release the workbook of a partially consumed iter_xlsx_rows() iterator
+    close = getattr(rows, "close", None)
+    if close:
+        close()
+
+
 def validate_and_normalize_rows(
     expected_headers: List[str],
     var_keys: List[str],
     file_headers: List[str],
-    rows: List[Dict[str, str]],
+    rows: Iterable[Dict[str, str]],
+    max_errors: int = MAX_ROW_ERRORS,
 ) -> Tuple[List[Dict[str, Any]], List[str]]:
     """
     Returns (normalized_rows, errors)
 
+    Headers are checked before any row is read. rows may be a lazy iterator
+    (see iter_xlsx_rows); it is consumed one row at a time and abandoned once
+    max_errors row errors have been collected.
+
     normalized_rows is:
       [
         {"ean_code": "...", "gs1_code": "...", "field_values": {...}},
@@ -119,9 +155,10 @@ def validate_and_normalize_rows(
     """
 
     errors = []
+    no_rows_error = "Uploaded file has no data rows. Please fill at least 1 row."
 
-    if not rows:
-        return [], ["Uploaded file has no data rows. Please fill at least 1 row."]
+    if not file_headers:
+        return [], [no_rows_error]
 
     # Build mapping: normalized header -> original header
     file_map = {}
@@ -130,8 +167,6 @@ def validate_and_normalize_rows(
         if nh and nh not in file_map:
             file_map[nh] = h
 
-    expected_norm = [norm_header(h) for h in expected_headers]
-
     # Required: EAN_CODE present
     if REQUIRED_COL not in file_map:
         errors.append("Missing EAN_CODE column. Please download the correct template and re-upload.")
@@ -147,11 +182,17 @@ def validate_and_normalize_rows(
             errors.append(f"Missing column: {k}. Please download the correct template and re-upload.")
 
     if errors:
+        _close_rows(rows)
         return [], errors
 
     # Normalize rows
     normalized = []
+    idx = 0
     for idx, r in enumerate(rows, start=1):
+        if max_errors and len(errors) >= max_errors:
+            errors.append(f"Stopped checking after {max_errors} problems. Please fix these and re-upload.")
+            break
+
         ean = (r.get(file_map.get(REQUIRED_COL, ""), "") or "").strip()
         gs1 = (r.get(file_map.get(OPTIONAL_COL, ""), "") or "").strip() if file_map.get(OPTIONAL_COL) else ""
         qty_raw = ""
@@ -190,6 +231,11 @@ def validate_and_normalize_rows(
             "field_values": fv,
         })
 
+    _close_rows(rows)
+
+    if idx == 0:
+        return [], [no_rows_error]
+
     if errors:
         return [], errors
 
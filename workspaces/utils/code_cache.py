@@ -0,0 +1,163 @@
+# workspaces/utils/code_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from workspaces.utils import label_codes
+
+# Bump when an encoder's output changes, so old disk entries are no longer addressed.
+CODE_CACHE_VERSION = 1
+LOCAL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _runs_to_text(runs: List[Tuple[int, int]]) -> str:
+    return " ".join(f"{x},{w}" for x, w in runs)
+
+
+def _runs_from_text(text: str) -> List[Tuple[int, int]]:
+    out = []
+    for part in text.split():
+        x, w = part.split(",")
+        out.append((int(x), int(w)))
+    return out
+
+
+def _matrix_to_text(matrix: List[List[bool]]) -> str:
+    return "\n".join("".join("1" if v else "0" for v in row) for row in matrix)
+
+
+def _matrix_from_text(text: str) -> List[List[bool]]:
+    return [[c == "1" for c in line] for line in text.split("\n") if line]
+
+
+# kind -> (encoder returning text, options tag, file extension)
+# The options tag is part of the cache key: change it whenever the encoder options change.
+CODE_KINDS: Dict[str, Tuple[Callable[[str], str], str, str]] = {
+    "barcode_svg": (label_codes.make_barcode_svg, "code128;quiet=12;bar=80;text=22", "svg"),
+    "qr_svg": (label_codes.make_qr_svg, "qr;ecc=M;border=4", "svg"),
+    "barcode_png": (label_codes.make_barcode_png, "code128;mh=20;mw=0.25;fs=10;td=5;qz=3", "txt"),
+    "qr_png": (label_codes.make_qr_png, "qr;ecc=M;box=8;border=4", "txt"),
+    "barcode_runs": (lambda v: _runs_to_text(label_codes.barcode_runs(v)), "code128", "txt"),
+    "qr_matrix": (lambda v: _matrix_to_text(label_codes.qr_matrix(v)), "qr;ecc=M;border=4", "txt"),
+}
+
+
+class _LRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.data: "OrderedDict[str, str]" = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and self.data:
+                _, evicted = self.data.popitem(last=False)
+                self.size -= len(evicted)
+
+
+_memory = _LRU(LOCAL_CACHE_MAX_BYTES)
+
+
+def code_cache_dir() -> str:
+    return getattr(settings, "LABEL_CODE_CACHE_DIR", None) or os.path.join(str(settings.MEDIA_ROOT), "code_cache")
+
+
+def code_cache_key(kind: str, value: str) -> str:
+    _, options, _ = CODE_KINDS[kind]
+    raw = f"{CODE_CACHE_VERSION}\0{kind}\0{options}\0{value}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _disk_path(kind: str, key: str) -> str:
+    ext = CODE_KINDS[kind][2]
+    return os.path.join(code_cache_dir(), key[:2], key[2:4], f"{key}.{ext}")
+
+
+def _disk_read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def _disk_write(path: str, text: str) -> None:
+    # best effort: a read-only or full disk just means no disk tier
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def get_code(kind: str, value: str) -> Optional[str]:
+    """
+    Encoded barcode / QR output for value: memory LRU -> disk (content addressed by
+    kind + options + value) -> encoder. Returns None for empty values.
+    """
+    if not value:
+        return None
+
+    key = code_cache_key(kind, value)
+    text = _memory.get(key)
+    if text is not None:
+        return text
+
+    path = _disk_path(kind, key)
+    text = _disk_read(path)
+    if text is None:
+        encoder = CODE_KINDS[kind][0]
+        text = encoder(value)
+        _disk_write(path, text)
+
+    _memory.set(key, text)
+    return text
+
+
+def barcode_svg(value: str) -> Optional[str]:
+    return get_code("barcode_svg", value)
+
+
+def qr_svg(value: str) -> Optional[str]:
+    return get_code("qr_svg", value)
+
+
+def barcode_png(value: str) -> Optional[str]:
+    return get_code("barcode_png", value)
+
+
+def qr_png(value: str) -> Optional[str]:
+    return get_code("qr_png", value)
+
+
+def barcode_runs(value: str) -> List[Tuple[int, int]]:
+    text = get_code("barcode_runs", value)
+    return _runs_from_text(text) if text else []
+
+
+def qr_matrix(value: str) -> List[List[bool]]:
+    text = get_code("qr_matrix", value)
+    return _matrix_from_text(text) if text else []
@@ -0,0 +1,189 @@
+# workspaces/utils/compiled_layout.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from django.core.cache import cache
+
+from workspaces.utils.bulk_import import EXCLUDE_TYPES, build_expected_headers
+from workspaces.utils.layout_engine import get_ui_px_per_cm, load_layout_from_template
+
+COMPILED_LAYOUT_VERSION = 2
+LAYOUT_CACHE_TTL = 60 * 60 * 24   # shared cache; keys change whenever the template is saved
+LOCAL_CACHE_SIZE = 256            # compiled layouts kept per process
+
+STATIC_TYPES = ("SHAPE", "STATIC_TEXT")
+
+
+class CompiledLayout(NamedTuple):
+    """
+    Everything the generation / print / preview / export views derive from a template layout.
+    Shared between requests: treat the lists and dicts as read-only (copy before mutating).
+    """
+    template_id: int
+    version: str
+
+    meta: Dict[str, Any]
+    items_ui: List[dict]         # stored layout items (UI px)
+    items_norm: List[dict]       # items_ui with render fields normalized
+    items_mm: List[dict]         # items_norm + x_mm/y_mm/w_mm/h_mm/font_size_mm for print
+    static_mm: List[dict]        # items_mm drawn identically on every label (see split_static_items)
+    dynamic_mm: List[dict]       # the remaining items_mm, in paint (z) order
+
+    width_cm: float
+    height_cm: float
+    label_w_mm: float
+    label_h_mm: float
+    ui_px_per_cm: float
+    mm_per_px: float
+    canvas_bg: str
+
+    headers: List[str]           # bulk import columns
+    var_keys: List[str]          # user-input keys in template order
+    key_to_name: Dict[str, str]  # user-input key -> display name
+    has_barcode: bool
+    has_qr: bool
+
+
+def norm_align(v) -> str:
+    v = (v or "left").lower()
+    return v if v in ("left", "center", "right") else "left"
+
+
+def normalize_render_item(it: dict) -> dict:
+    out = dict(it)
+    out["field_type"] = (out.get("field_type") or "TEXT").upper()
+    out["z_index"] = int(out.get("z_index") or 0)
+    out["font_family"] = (out.get("font_family") or "Inter").strip() or "Inter"
+    out["font_size"] = int(out.get("font_size") or 14)
+    out["font_bold"] = bool(out.get("font_bold"))
+    out["font_italic"] = bool(out.get("font_italic"))
+    out["font_underline"] = bool(out.get("font_underline"))
+    out["text_align"] = norm_align(out.get("text_align"))
+    out["text_color"] = (out.get("text_color") or "#000000").strip() or "#000000"
+    out["bg_color"] = (out.get("bg_color") or "transparent").strip() or "transparent"
+    out["show_label"] = bool(out.get("show_label", True))
+    out["shape_type"] = (out.get("shape_type") or "RECT").upper()
+    out["shape_color"] = (out.get("shape_color") or "#000000").strip() or "#000000"
+    return out
+
+
+def item_to_mm(it: dict, mm_per_px: float) -> dict:
+    """
+    Print geometry for one normalized item (see _label_print_label.html).
+    """
+    out = dict(it)
+    out["x_mm"] = float(out.get("x") or 0) * mm_per_px
+    out["y_mm"] = float(out.get("y") or 0) * mm_per_px
+    out["w_mm"] = max(0.1, float(out.get("width") or 1) * mm_per_px)
+    out["h_mm"] = max(0.1, float(out.get("height") or 1) * mm_per_px)
+    out["font_size_mm"] = max(0.5, float(out.get("font_size") or 14) * mm_per_px)
+    return out
+
+
+def split_static_items(items: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    (static layer, per-label items), both in paint order. The static layer is the run of
+    shapes / static text painted before the first per-label item, so drawing it once as a
+    background keeps the stacking identical to drawing every item per label.
+    """
+    ordered = sorted(items, key=lambda x: int(x.get("z_index") or 0))
+    split = 0
+    while split < len(ordered) and ordered[split]["field_type"] in STATIC_TYPES:
+        split += 1
+    return ordered[:split], ordered[split:]
+
+
+def layout_version(template) -> str:
+    updated = getattr(template, "updated_at", None)
+    return updated.isoformat() if updated else ""
+
+
+def compile_layout(template) -> CompiledLayout:
+    stored = load_layout_from_template(template)
+    meta = stored.get("_meta") or {}
+    items_ui = stored.get("items") or []
+
+    width_cm = float(template.width_cm or 10)
+    height_cm = float(template.height_cm or 10)
+    ui_px_per_cm = float(meta.get("ui_px_per_cm") or get_ui_px_per_cm(width_cm, height_cm))
+    mm_per_px = 10.0 / float(ui_px_per_cm or 1.0)
+
+    items_norm = [normalize_render_item(it) for it in items_ui]
+    items_mm = [item_to_mm(it, mm_per_px) for it in items_norm]
+    static_mm, dynamic_mm = split_static_items(items_mm)
+
+    headers, var_keys = build_expected_headers(items_ui)
+
+    key_to_name = {}
+    for it in items_ui:
+        k = (it.get("key") or "").strip()
+        ft = (it.get("field_type") or "").upper()
+        if not k or ft in EXCLUDE_TYPES:
+            continue
+        key_to_name[k] = (it.get("name") or k).strip() or k
+
+    return CompiledLayout(
+        template_id=template.id,
+        version=layout_version(template),
+        meta=meta,
+        items_ui=items_ui,
+        items_norm=items_norm,
+        items_mm=items_mm,
+        static_mm=static_mm,
+        dynamic_mm=dynamic_mm,
+        width_cm=width_cm,
+        height_cm=height_cm,
+        label_w_mm=width_cm * 10.0,
+        label_h_mm=height_cm * 10.0,
+        ui_px_per_cm=ui_px_per_cm,
+        mm_per_px=mm_per_px,
+        canvas_bg=(template.canvas_bg_color or "#ffffff").strip() or "#ffffff",
+        headers=headers,
+        var_keys=var_keys,
+        key_to_name=key_to_name,
+        has_barcode=any(it["field_type"] == "BARCODE" for it in items_norm),
+        has_qr=any(it["field_type"] == "QRCODE" for it in items_norm),
+    )
+
+
+_local: "OrderedDict[Tuple[int, str], CompiledLayout]" = OrderedDict()
+_local_lock = Lock()
+
+
+def _cache_key(template_id: int, version: str) -> str:
+    return f"ws:layout:v{COMPILED_LAYOUT_VERSION}:{template_id}:{version}"
+
+
+def get_compiled_layout(template) -> CompiledLayout:
+    """
+    Compiled layout for (template.id, template.updated_at).
+    Looks in the per-process LRU, then the shared cache, and compiles on a miss.
+    Any template save bumps updated_at, so stale entries are simply never looked up again.
+    """
+    version = layout_version(template)
+    if not version:
+        return compile_layout(template)
+
+    local_key = (template.id, version)
+    with _local_lock:
+        compiled = _local.get(local_key)
+        if compiled is not None:
+            _local.move_to_end(local_key)
+            return compiled
+
+    key = _cache_key(template.id, version)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_layout(template)
+        cache.set(key, compiled, LAYOUT_CACHE_TTL)
+
+    with _local_lock:
+        _local[local_key] = compiled
+        _local.move_to_end(local_key)
+        while len(_local) > LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+    return compiled
@@ -0,0 +1,53 @@
+# workspaces/utils/csv_stream.py
+from __future__ import annotations
+
+import csv
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+# flush to the client every ~64 KB instead of once per row
+CSV_CHUNK_BYTES = 64 * 1024
+
+
+class _Echo:
+    """
+    File-like object whose write() just returns the value, so csv.writer can be used
+    to format rows without buffering them.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_csv_chunks(fieldnames: List[str], rows: Iterable[Dict[str, Any]],
+                    chunk_bytes: int = CSV_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Yields UTF-8 encoded CSV (header + rows) in chunks of roughly chunk_bytes.
+    rows is consumed lazily, so memory stays bounded by one chunk.
+    """
+    writer = csv.DictWriter(_Echo(), fieldnames=fieldnames)
+
+    buf = [writer.writeheader()]
+    size = len(buf[0])
+    for row in rows:
+        line = writer.writerow(row)
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf = []
+            size = 0
+
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip-compresses a byte stream on the fly (wbits=31 -> gzip container).
+    """
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk)
+        if data:
+            yield data
+    yield z.flush()
@@ -0,0 +1,117 @@
+# workspaces/utils/daily_usage.py
+from __future__ import annotations
+
+from datetime import date
+from typing import Iterable, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from workspaces.models import DailyLabelUsage, LabelBatch
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def batch_day(batch):
+    # same day boundary as TruncDate("created_at") in the current time zone
+    return timezone.localdate(batch.created_at) if batch.created_at else timezone.localdate()
+
+
+def usage_bucket(batch) -> Tuple[int, int, str, date]:
+    """(org_id, workspace_id, template_category, day) of a batch's DailyLabelUsage row."""
+    workspace = batch.workspace
+    return workspace.org_id, workspace.id, batch.template.category, batch_day(batch)
+
+
+def add_to_bucket(bucket: Tuple[int, int, str, date], labels: int) -> None:
+    """
+    Adds `labels` (negative to take back) to a (see usage_bucket) bucket with one UPDATE,
+    creating the bucket on its first batch.
+    """
+    labels = int(labels or 0)
+    if not labels:
+        return
+
+    org_id, workspace_id, category, day = bucket
+    rows = DailyLabelUsage.objects.filter(workspace_id=workspace_id, template_category=category, day=day)
+    if rows.update(labels=F("labels") + labels):
+        return
+    if labels < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyLabelUsage.objects.create(
+                org_id=org_id,
+                workspace_id=workspace_id,
+                template_category=category,
+                day=day,
+                labels=labels,
+            )
+    except IntegrityError:
+        # another batch created the bucket first
+        rows.update(labels=F("labels") + labels)
+
+
+def add_daily_usage(batch, labels: int) -> None:
+    """
+    Adds `labels` to the batch's bucket once the surrounding transaction commits, so the
+    bucket row is not locked for the rest of it (e.g. a long MULTI import) and a rolled
+    back batch is never counted. The bucket is resolved now, while the batch's
+    workspace / template still exist.
+    """
+    if not int(labels or 0):
+        return
+    bucket = usage_bucket(batch)
+    transaction.on_commit(lambda: add_to_bucket(bucket, labels))
+
+
+def rebuild_daily_usage(org_id: Optional[int] = None, workspace_ids: Optional[Iterable[int]] = None,
+                        *, batch_model=LabelBatch, usage_model=DailyLabelUsage) -> int:
+    """
+    Recomputes DailyLabelUsage from LabelBatch (all, one org, or some workspaces) in one
+    transaction. Returns the number of buckets written.
+    Migrations pass their historical models as batch_model / usage_model.
+    """
+    batches = batch_model.objects.all()
+    usage = usage_model.objects.all()
+    if org_id:
+        batches = batches.filter(workspace__org_id=org_id)
+        usage = usage.filter(org_id=org_id)
+    if workspace_ids is not None:
+        workspace_ids = list(workspace_ids)
+        batches = batches.filter(workspace_id__in=workspace_ids)
+        usage = usage.filter(workspace_id__in=workspace_ids)
+
+    buckets = (
+        batches
+        .annotate(day=TruncDate("created_at"))
+        .values("workspace__org_id", "workspace_id", "template__category", "day")
+        .annotate(labels=Sum("quantity"))
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        usage.delete()
+
+        chunk = []
+        for b in buckets.iterator():
+            chunk.append(usage_model(
+                org_id=b["workspace__org_id"],
+                workspace_id=b["workspace_id"],
+                template_category=b["template__category"],
+                day=b["day"],
+                labels=int(b["labels"] or 0),
+            ))
+            if len(chunk) >= BACKFILL_CHUNK_SIZE:
+                usage_model.objects.bulk_create(chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            usage_model.objects.bulk_create(chunk)
+            written += len(chunk)
+
+    return written
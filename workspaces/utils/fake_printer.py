@@ -0,0 +1,99 @@
+# workspaces/utils/fake_printer.py
+from __future__ import annotations
+
+import re
+import socketserver
+import threading
+from typing import List, Optional
+
+# ~HS reply: three STX/ETX framed status strings (paper ok, not paused, buffer empty)
+HS_REPLY = (
+    b"\x02030,0,0,0519,000,0,0,0,000,0,0,0\x03\r\n"
+    b"\x02000,0,0,0,0,2,4,0,00000000,1,000\x03\r\n"
+    b"\x021234,0\x03\r\n"
+)
+
+# end of one printed label in ZPL / EPL
+LABEL_END = re.compile(rb"\^XZ|(?:^|\n)P\d+\r?\n")
+
+# ^DF stores a format instead of printing it
+FORMAT_DEFINITION = b"^DF"
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: FakePrinterServer = self.server
+        pending = b""
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                break
+
+            if server.latency:
+                threading.Event().wait(server.latency)
+
+            status_queries = data.count(b"~HS")
+            data = data.replace(b"~HS", b"")
+
+            pending += data
+            last_end = 0
+            for m in LABEL_END.finditer(pending):
+                block = pending[last_end:m.end()]
+                last_end = m.end()
+                with server.lock:
+                    if FORMAT_DEFINITION in block:
+                        server.formats.append(block)
+                        continue
+                    server.labels.append(block)
+                    count = len(server.labels)
+
+                if server.drop_after and count >= server.drop_after and not server.dropped:
+                    # simulate a cable pull / printer reboot mid-job
+                    server.dropped = True
+                    pending = b""
+                    return
+            pending = pending[last_end:]
+
+            with server.lock:
+                server.received_bytes += len(data)
+
+            # answered only after everything before the query has been taken in
+            for _ in range(status_queries):
+                self.request.sendall(HS_REPLY)
+
+
+class FakePrinterServer(socketserver.ThreadingTCPServer):
+    """
+    Stand-in for a raw port 9100 label printer: accepts ZPL/EPL, answers ~HS status
+    queries, records every complete label (stored ^DF formats separately), and can
+    drop the connection once after `drop_after` labels to exercise spooler resume.
+
+        server = FakePrinterServer(("127.0.0.1", 0), drop_after=120)
+        server.start()
+        ... spool to server.server_address ...
+        server.stop()
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 9100), drop_after: int = 0, latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.drop_after = drop_after
+        self.dropped = False
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.labels: List[bytes] = []
+        self.formats: List[bytes] = []
+        self.received_bytes = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FakePrinterServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,178 @@
+# workspaces/utils/imposition.py
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional
+
+PAGE_SIZES = {
+    "A4": {"w": 210.0, "h": 297.0},
+    "A5": {"w": 148.0, "h": 210.0},
+    "A3": {"w": 297.0, "h": 420.0},
+    "LETTER": {"w": 215.9, "h": 279.4},
+    "LEGAL": {"w": 215.9, "h": 355.6},
+}
+
+# Pre-cut label sheets (manufacturer templates, portrait). Margins / gaps in mm.
+SHEET_PRESETS = {
+    "L7159": {"title": "Avery L7159 (24 per A4, 63.5 x 33.9)", "page_size": "A4",
+              "label_w_mm": 63.5, "label_h_mm": 33.9, "cols": 3, "rows": 8,
+              "margin_left_mm": 7.21, "margin_top_mm": 12.9, "gap_x_mm": 2.54, "gap_y_mm": 0.0},
+    "L7160": {"title": "Avery L7160 (21 per A4, 63.5 x 38.1)", "page_size": "A4",
+              "label_w_mm": 63.5, "label_h_mm": 38.1, "cols": 3, "rows": 7,
+              "margin_left_mm": 7.21, "margin_top_mm": 15.15, "gap_x_mm": 2.54, "gap_y_mm": 0.0},
+    "L7161": {"title": "Avery L7161 (18 per A4, 63.5 x 46.6)", "page_size": "A4",
+              "label_w_mm": 63.5, "label_h_mm": 46.6, "cols": 3, "rows": 6,
+              "margin_left_mm": 7.21, "margin_top_mm": 8.8, "gap_x_mm": 2.54, "gap_y_mm": 0.0},
+    "L7163": {"title": "Avery L7163 (14 per A4, 99.1 x 38.1)", "page_size": "A4",
+              "label_w_mm": 99.1, "label_h_mm": 38.1, "cols": 2, "rows": 7,
+              "margin_left_mm": 4.65, "margin_top_mm": 15.15, "gap_x_mm": 2.5, "gap_y_mm": 0.0},
+    "L7165": {"title": "Avery L7165 (8 per A4, 99.1 x 67.7)", "page_size": "A4",
+              "label_w_mm": 99.1, "label_h_mm": 67.7, "cols": 2, "rows": 4,
+              "margin_left_mm": 4.65, "margin_top_mm": 13.1, "gap_x_mm": 2.5, "gap_y_mm": 0.0},
+    "L7173": {"title": "Avery L7173 (10 per A4, 99.1 x 57)", "page_size": "A4",
+              "label_w_mm": 99.1, "label_h_mm": 57.0, "cols": 2, "rows": 5,
+              "margin_left_mm": 4.65, "margin_top_mm": 6.0, "gap_x_mm": 2.5, "gap_y_mm": 0.0},
+    "L7651": {"title": "Avery L7651 (65 per A4, 38.1 x 21.2)", "page_size": "A4",
+              "label_w_mm": 38.1, "label_h_mm": 21.2, "cols": 5, "rows": 13,
+              "margin_left_mm": 4.75, "margin_top_mm": 10.7, "gap_x_mm": 2.5, "gap_y_mm": 0.0},
+    "5160": {"title": "Avery 5160 (30 per Letter, 2.625 x 1 in)", "page_size": "LETTER",
+             "label_w_mm": 66.675, "label_h_mm": 25.4, "cols": 3, "rows": 10,
+             "margin_left_mm": 4.7625, "margin_top_mm": 12.7, "gap_x_mm": 3.175, "gap_y_mm": 0.0},
+    "5161": {"title": "Avery 5161 (20 per Letter, 4 x 1 in)", "page_size": "LETTER",
+             "label_w_mm": 101.6, "label_h_mm": 25.4, "cols": 2, "rows": 10,
+             "margin_left_mm": 3.96875, "margin_top_mm": 12.7, "gap_x_mm": 4.7625, "gap_y_mm": 0.0},
+    "5163": {"title": "Avery 5163 (10 per Letter, 4 x 2 in)", "page_size": "LETTER",
+             "label_w_mm": 101.6, "label_h_mm": 50.8, "cols": 2, "rows": 5,
+             "margin_left_mm": 3.96875, "margin_top_mm": 12.7, "gap_x_mm": 4.7625, "gap_y_mm": 0.0},
+    "5164": {"title": "Avery 5164 (6 per Letter, 4 x 3.33 in)", "page_size": "LETTER",
+             "label_w_mm": 101.6, "label_h_mm": 84.67, "cols": 2, "rows": 3,
+             "margin_left_mm": 3.96875, "margin_top_mm": 12.7, "gap_x_mm": 4.7625, "gap_y_mm": 0.0},
+}
+
+FIT_TOLERANCE_MM = 0.05     # rounding slack so exact-fit sheets (presets) don't lose a row
+PRESET_SIZE_TOLERANCE_MM = 1.0
+
+
+def fit_count(avail_mm: float, size_mm: float, gap_mm: float) -> int:
+    """
+    How many items of size_mm separated by gap_mm fit in avail_mm.
+    """
+    if size_mm <= 0 or avail_mm <= 0:
+        return 0
+    return max(0, int(math.floor((avail_mm + gap_mm + FIT_TOLERANCE_MM) / (size_mm + gap_mm))))
+
+
+def apply_sheet_preset(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Overrides page size / margins / gaps / columns from settings["sheet_preset"] (in place).
+    Unknown or empty presets leave the settings alone.
+    """
+    preset = SHEET_PRESETS.get(settings.get("sheet_preset") or "")
+    if not preset or settings.get("stock_type") == "ROLL":
+        settings["sheet_preset"] = ""
+        return settings
+
+    settings.update({
+        "page_size": preset["page_size"],
+        "orientation": "PORTRAIT",
+        "labels_per_row": preset["cols"],
+        "margin_left_mm": preset["margin_left_mm"],
+        "margin_top_mm": preset["margin_top_mm"],
+        "margin_right_mm": 0.0,     # the grid itself defines the right / bottom edge
+        "margin_bottom_mm": 0.0,
+        "gap_x_mm": preset["gap_x_mm"],
+        "gap_y_mm": preset["gap_y_mm"],
+        "auto_layout": 0,
+        "allow_rotate": 0,
+    })
+    return settings
+
+
+def impose(
+    page_w_mm: float,
+    page_h_mm: float,
+    label_w_mm: float,
+    label_h_mm: float,
+    settings: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Grid of labels on one sheet for the print settings (see _get_print_settings).
+
+    auto_layout: as many columns as fit, trying the label both upright and turned 90°
+    (allow_rotate) and keeping whichever puts more labels on the page.
+    Otherwise labels_per_row is used, capped at what actually fits.
+
+    Returns page / grid / cell size (the rotated footprint when "rotated"), per_page,
+    utilization (label area / page area) and a user-facing warning ("" when fine).
+    """
+    ml = settings["margin_left_mm"]
+    mt = settings["margin_top_mm"]
+    mr = settings["margin_right_mm"]
+    mb = settings["margin_bottom_mm"]
+    gx = settings["gap_x_mm"]
+    gy = settings["gap_y_mm"]
+
+    avail_w = page_w_mm - ml - mr - max(0.0, settings["offset_x_mm"])
+    avail_h = page_h_mm - mt - mb - max(0.0, settings["offset_y_mm"])
+
+    options = [(False, label_w_mm, label_h_mm)]
+    if settings.get("auto_layout") and settings.get("allow_rotate") and abs(label_w_mm - label_h_mm) > 0.01:
+        options.append((True, label_h_mm, label_w_mm))
+
+    best: Optional[Dict[str, Any]] = None
+    warning = ""
+    for rotated, cell_w, cell_h in options:
+        max_cols = fit_count(avail_w, cell_w, gx)
+        rows = fit_count(avail_h, cell_h, gy)
+
+        if settings.get("auto_layout"):
+            cols = max_cols
+        else:
+            wanted = max(1, int(settings["labels_per_row"]))
+            cols = min(wanted, max_cols)
+            if wanted > max_cols:
+                needed = wanted * cell_w + (wanted - 1) * gx
+                warning = (
+                    f"{wanted} labels per row need {needed:.1f}mm but only {avail_w:.1f}mm is available; "
+                    f"using {max(1, max_cols)}."
+                )
+
+        candidate = {
+            "rotated": rotated,
+            "cell_w_mm": cell_w,
+            "cell_h_mm": cell_h,
+            "cols": cols,
+            "rows": rows,
+            "per_page": cols * rows,
+        }
+        # ties keep the upright placement
+        if best is None or candidate["per_page"] > best["per_page"]:
+            best = candidate
+
+    if best["per_page"] == 0:
+        warning = (
+            f"A {label_w_mm:.1f} x {label_h_mm:.1f}mm label does not fit the "
+            f"{max(0.0, avail_w):.1f} x {max(0.0, avail_h):.1f}mm printable area; check page size and margins."
+        )
+        best.update(cols=max(1, best["cols"]), rows=max(1, best["rows"]))
+        best["per_page"] = best["cols"] * best["rows"]
+
+    preset = SHEET_PRESETS.get(settings.get("sheet_preset") or "")
+    if preset and not warning and (
+        abs(preset["label_w_mm"] - label_w_mm) > PRESET_SIZE_TOLERANCE_MM
+        or abs(preset["label_h_mm"] - label_h_mm) > PRESET_SIZE_TOLERANCE_MM
+    ):
+        warning = (
+            f"{preset['title']} labels are {preset['label_w_mm']} x {preset['label_h_mm']}mm; "
+            f"this template is {label_w_mm:.1f} x {label_h_mm:.1f}mm."
+        )
+
+    page_area = page_w_mm * page_h_mm
+    best.update({
+        "page_w_mm": page_w_mm,
+        "page_h_mm": page_h_mm,
+        "utilization": (best["per_page"] * label_w_mm * label_h_mm / page_area) if page_area > 0 else 0.0,
+        "warning": warning,
+    })
+    return best
+
@@ -1,7 +1,9 @@
 # workspaces/utils/label_codes.py
 
 import base64
+from html import escape
 from io import BytesIO
+from typing import List, Tuple
 
 import barcode
 from barcode.writer import ImageWriter
@@ -50,4 +52,109 @@ def make_qr_png(data: str) -> str:
     img.save(buf, format="PNG")
     png_bytes = buf.getvalue()
 
-    return "data:image/png;base64," + base64.b64encode(png_bytes).decode("ascii")
\ No newline at end of file
+    return "data:image/png;base64," + base64.b64encode(png_bytes).decode("ascii")
+
+
+# ------------------------------------------------------------------
+# Vector outputs (SVG / run lists). Same symbology + options as the PNGs,
+# but no rasterizing, PNG encoding or base64 per value.
+# ------------------------------------------------------------------
+
+BARCODE_QUIET_MODULES = 12      # quiet_zone 3.0 / module_width 0.25
+BARCODE_BAR_MODULES = 80        # module_height 20.0 / module_width 0.25
+BARCODE_TEXT_MODULES = 22       # room for the human readable line
+QR_BORDER = 4
+
+
+def barcode_modules(data: str) -> str:
+    """
+    Code128 module string ("1" = bar, "0" = space), without quiet zones.
+    """
+    BClass = barcode.get_barcode_class("code128")
+    return "".join(BClass(data).build())
+
+
+def barcode_runs(data: str) -> List[Tuple[int, int]]:
+    """
+    Run-length bars for Code128: [(x, width), ...] in module units, without quiet zones.
+    """
+    modules = barcode_modules(data)
+    runs = []
+    x = 0
+    n = len(modules)
+    while x < n:
+        if modules[x] != "1":
+            x += 1
+            continue
+        start = x
+        while x < n and modules[x] == "1":
+            x += 1
+        runs.append((start, x - start))
+    return runs
+
+
+def qr_matrix(data: str) -> List[List[bool]]:
+    """
+    QR module matrix (True = dark), including the quiet zone border.
+    """
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=ERROR_CORRECT_M,
+        border=QR_BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def make_barcode_svg(data: str) -> str:
+    """
+    Return inline <svg> markup for a Code128 barcode: one rect per bar run + the
+    human readable text. Scales to its box like object-fit: contain.
+    """
+    runs = barcode_runs(data)
+    total_modules = (runs[-1][0] + runs[-1][1]) if runs else 0  # Code128 ends on a bar
+    q = BARCODE_QUIET_MODULES
+    vw = total_modules + 2 * q
+    vh = BARCODE_BAR_MODULES + BARCODE_TEXT_MODULES
+
+    bars = "".join(
+        f'<rect x="{x + q}" y="0" width="{w}" height="{BARCODE_BAR_MODULES}"/>'
+        for x, w in runs
+    )
+    text = (
+        f'<text x="{vw / 2:g}" y="{vh - 4}" font-size="16" text-anchor="middle" '
+        f'font-family="DejaVu Sans Mono, monospace">{escape(data)}</text>'
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {vw} {vh}" '
+        f'width="100%" height="100%" shape-rendering="crispEdges">'
+        f'<rect width="{vw}" height="{vh}" fill="#fff"/><g fill="#000">{bars}{text}</g></svg>'
+    )
+
+
+def make_qr_svg(data: str) -> str:
+    """
+    Return inline <svg> markup for a QR code: the whole module matrix as a single
+    stroked path (one horizontal segment per run of dark modules).
+    """
+    matrix = qr_matrix(data)
+    n = len(matrix)
+
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < n:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < n and row[x]:
+                x += 1
+            parts.append(f"M{start} {y}.5h{x - start}")
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {n} {n}" '
+        f'width="100%" height="100%" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/><path d="{"".join(parts)}" stroke="#000" stroke-width="1"/></svg>'
+    )
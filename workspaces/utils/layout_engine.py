@@ -101,7 +101,8 @@ def save_layout_to_template(template, incoming_items: List[Dict[str, Any]]) -> N
         "items": normalize_items(incoming_items),
     }
     template.layout_json = payload
-    template.save(update_fields=["layout_json"])
+    # updated_at is the compiled-layout cache version (see compiled_layout.py)
+    template.save(update_fields=["layout_json", "updated_at"])
 
 def load_layout_from_template(template) -> Dict[str, Any]:
     width_cm = float(template.width_cm or 10)
@@ -0,0 +1,395 @@
+# workspaces/utils/pdf_render.py
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from workspaces.utils.code_cache import barcode_runs, qr_matrix
+from workspaces.utils.label_codes import BARCODE_QUIET_MODULES
+
+
+# CSS clip-path polygons used by _label_print_label.html (percent of the box, top-left origin)
+SHAPE_POLYGONS = {
+    "TRIANGLE": [(50, 0), (0, 100), (100, 100)],
+    "STAR": [
+        (50, 0), (61, 35), (98, 35), (68, 57), (79, 91),
+        (50, 70), (21, 91), (32, 57), (2, 35), (39, 35),
+    ],
+}
+
+# Base-14 fonts only: they need no embedding and keep the PDF small.
+FONT_FAMILIES = {
+    "helvetica": ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique"),
+    "times": ("Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic"),
+    "courier": ("Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique"),
+}
+
+LINE_HEIGHT = 1.1          # matches .pl-val / .pl-lbl line-height
+LABEL_FONT_SCALE = 0.85    # matches .pl-lbl font-size
+
+
+def pdf_font_name(family: str, bold: bool, italic: bool) -> str:
+    fam = (family or "").lower()
+    if "times" in fam or "georgia" in fam or ("serif" in fam and "sans" not in fam):
+        names = FONT_FAMILIES["times"]
+    elif "courier" in fam or "mono" in fam:
+        names = FONT_FAMILIES["courier"]
+    else:
+        names = FONT_FAMILIES["helvetica"]
+    return names[(1 if bold else 0) + (2 if italic else 0)]
+
+
+def pdf_color(value: str):
+    """
+    Parse a CSS-ish color ("#rrggbb", "#rgb", named). Returns None for transparent/invalid.
+    """
+    v = (value or "").strip()
+    if not v or v.lower() == "transparent":
+        return None
+    try:
+        return colors.toColor(v)
+    except Exception:
+        return None
+
+
+def label_origin_mm(settings: Dict[str, Any], layout_info: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Grid origin + gaps in mm, mirroring the paginate() logic of label_batch_print_full.html.
+    """
+    is_roll = settings.get("stock_type") == "ROLL"
+    return {
+        "x0": (0.0 if is_roll else float(settings.get("margin_left_mm") or 0)) + max(0.0, float(settings.get("offset_x_mm") or 0)),
+        "y0": (0.0 if is_roll else float(settings.get("margin_top_mm") or 0)) + max(0.0, float(settings.get("offset_y_mm") or 0)),
+        "gap_x": 0.0 if is_roll else float(settings.get("gap_x_mm") or 0),
+        "gap_y": 0.0 if is_roll else float(settings.get("gap_y_mm") or 0),
+    }
+
+
+def _draw_shape(c, it, w, h):
+    color = pdf_color(it.get("shape_color") or "#000000")
+    if color is None:
+        return
+    c.setFillColor(color)
+    shape = (it.get("shape_type") or "RECT").upper()
+
+    if shape == "CIRCLE":
+        # border-radius: 9999px -> pill/circle depending on aspect
+        c.roundRect(0, 0, w, h, min(w, h) / 2.0, stroke=0, fill=1)
+        return
+
+    points = SHAPE_POLYGONS.get(shape)
+    if not points:
+        c.rect(0, 0, w, h, stroke=0, fill=1)
+        return
+
+    p = c.beginPath()
+    for i, (px, py) in enumerate(points):
+        x = w * px / 100.0
+        y = h - (h * py / 100.0)
+        if i == 0:
+            p.moveTo(x, y)
+        else:
+            p.lineTo(x, y)
+    p.close()
+    c.drawPath(p, stroke=0, fill=1)
+
+
+def _draw_barcode(c, value, w, h):
+    if not value:
+        return
+
+    # human readable line under the bars (like the PNG writer does)
+    font_size = min(h * 0.18, 10.0)
+    text_gap = font_size * 0.4
+    bar_h = h - font_size - text_gap
+    if bar_h < h * 0.5:
+        font_size = 0
+        bar_h = h
+
+    runs = barcode_runs(value)
+    if not runs:
+        return
+    modules = runs[-1][0] + runs[-1][1]
+    q = BARCODE_QUIET_MODULES
+    bar_w = w / float(modules + 2 * q)
+
+    c.setFillColor(colors.black)
+    p = c.beginPath()
+    for x, rw in runs:
+        p.rect((x + q) * bar_w, h - bar_h, rw * bar_w, bar_h)
+    c.drawPath(p, stroke=0, fill=1)
+
+    if font_size:
+        c.setFont("Helvetica", font_size)
+        c.drawCentredString(w / 2.0, font_size * 0.2, value)
+
+
+def _qr_form(c, value, forms):
+    """
+    QR payloads repeat across labels (they don't carry the serial), so each distinct
+    value is drawn once as a form XObject and referenced from every label.
+    """
+    key = ("QR", value)
+    if key in forms:
+        return forms[key]
+
+    matrix = qr_matrix(value)
+    n = len(matrix)
+
+    name = f"qr{len(forms)}"
+    c.beginForm(name, lowerx=0, lowery=0, upperx=n, uppery=n)
+    c.setFillColor(colors.black)
+    p = c.beginPath()
+    for r, row in enumerate(matrix):
+        x = 0
+        while x < n:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < n and row[x]:
+                x += 1
+            p.rect(start, n - r - 1, x - start, 1)
+    c.drawPath(p, stroke=0, fill=1)
+    c.endForm()
+
+    forms[key] = (name, n)
+    return forms[key]
+
+
+def _draw_qr(c, value, w, h, forms):
+    if not value:
+        return
+    name, n = _qr_form(c, value, forms)
+    side = min(w, h)  # object-fit: contain
+    c.saveState()
+    c.translate((w - side) / 2.0, (h - side) / 2.0)
+    c.scale(side / n, side / n)
+    c.doForm(name)
+    c.restoreState()
+
+
+def _draw_lines(c, lines, font, size, color, align, x_left, width, y_top, underline):
+    y = y_top
+    c.setFont(font, size)
+    c.setFillColor(color)
+    for line in lines:
+        y -= size * LINE_HEIGHT
+        baseline = y + size * 0.22
+        lw = stringWidth(line, font, size)
+        if align == "center":
+            x = x_left + (width - lw) / 2.0
+        elif align == "right":
+            x = x_left + width - lw
+        else:
+            x = x_left
+        c.drawString(x, baseline, line)
+        if underline and line:
+            c.setStrokeColor(color)
+            c.setLineWidth(max(0.25, size * 0.06))
+            c.line(x, baseline - size * 0.12, x + lw, baseline - size * 0.12)
+    return y
+
+
+def _draw_text(c, it, w, h, mm_per_px, with_label):
+    color = pdf_color(it.get("text_color") or "#000000") or colors.black
+    font = pdf_font_name(it.get("font_family"), bool(it.get("font_bold")), bool(it.get("font_italic")))
+    size = max(0.5, float(it.get("font_size_mm") or 2.0)) * mm
+    align = it.get("text_align") or "left"
+    underline = bool(it.get("font_underline"))
+
+    # .pl-txt padding: 6px 8px (UI px), gap 4px
+    pad_y = 6 * mm_per_px * mm
+    pad_x = 8 * mm_per_px * mm
+    gap = 4 * mm_per_px * mm
+    inner_w = max(1.0, w - 2 * pad_x)
+
+    y = h - pad_y
+    if with_label:
+        lbl_size = size * LABEL_FONT_SCALE
+        label = str(it.get("name") or it.get("key") or "")
+        lines = simpleSplit(label, font, lbl_size, inner_w) if label else []
+        y = _draw_lines(c, lines, font, lbl_size, color, align, pad_x, inner_w, y, underline)
+        y -= gap
+
+    value = str(it.get("value") or "")
+    lines = simpleSplit(value, font, size, inner_w) if value else []
+    _draw_lines(c, lines, font, size, color, align, pad_x, inner_w, y, underline)
+
+
+def _draw_items(c, items: List[Dict[str, Any]], lh: float, mm_per_px: float, forms: Dict) -> None:
+    for it in sorted(items, key=lambda x: int(x.get("z_index") or 0)):
+        ft = (it.get("field_type") or "TEXT").upper()
+        w = float(it.get("w_mm") or 0.1) * mm
+        h = float(it.get("h_mm") or 0.1) * mm
+        x = float(it.get("x_mm") or 0) * mm
+        y = lh - float(it.get("y_mm") or 0) * mm - h
+
+        c.saveState()
+        c.translate(x, y)
+        ep = c.beginPath()
+        ep.rect(0, 0, w, h)
+        c.clipPath(ep, stroke=0, fill=0)
+
+        el_bg = pdf_color(it.get("bg_color"))
+        if el_bg is not None:
+            c.setFillColor(el_bg)
+            c.rect(0, 0, w, h, stroke=0, fill=1)
+
+        if ft == "SHAPE":
+            _draw_shape(c, it, w, h)
+        elif ft == "BARCODE":
+            _draw_barcode(c, str(it.get("value") or ""), w, h)
+        elif ft == "QRCODE":
+            _draw_qr(c, str(it.get("value") or ""), w, h, forms)
+        elif ft == "IMAGE_URL":
+            # remote images are not fetched server-side
+            pass
+        elif ft == "STATIC_TEXT":
+            _draw_text(c, it, w, h, mm_per_px, with_label=False)
+        else:
+            _draw_text(c, it, w, h, mm_per_px, with_label=bool(it.get("show_label")))
+
+        c.restoreState()
+
+
+def static_layer_form(c, static_items: List[Dict[str, Any]], label_w_mm: float, label_h_mm: float,
+                      canvas_bg: str = "#ffffff", mm_per_px: float = 1.0, forms: Dict = None) -> str:
+    """
+    Draws the label background + static items (layout.static_mm, values filled in) once as a
+    form XObject and returns its name; every label then references it with doForm.
+    """
+    if forms is None:
+        forms = {}
+    key = ("STATIC",)
+    if key in forms:
+        return forms[key]
+
+    lw = label_w_mm * mm
+    lh = label_h_mm * mm
+    name = "static"
+
+    c.beginForm(name, lowerx=0, lowery=0, upperx=lw, uppery=lh)
+    bg = pdf_color(canvas_bg)
+    if bg is not None:
+        c.setFillColor(bg)
+        c.rect(0, 0, lw, lh, stroke=0, fill=1)
+    _draw_items(c, static_items, lh, mm_per_px, forms)
+    c.endForm()
+
+    forms[key] = name
+    return name
+
+
+def draw_label(c, items: List[Dict[str, Any]], label_w_mm: float, label_h_mm: float,
+               canvas_bg: str = "#ffffff", mm_per_px: float = 1.0, forms: Dict = None,
+               static_form: str = "") -> None:
+    """
+    Draw one label with its bottom-left corner at the current origin.
+    items are print items (x_mm/y_mm/w_mm/h_mm + value), as built for _label_print_label.html.
+    forms: per-document cache of reusable XObjects (pass the same dict for every label).
+    static_form: name from static_layer_form; replaces the background (items then only
+    holds the per-label items).
+    """
+    if forms is None:
+        forms = {}
+    lw = label_w_mm * mm
+    lh = label_h_mm * mm
+
+    c.saveState()
+    p = c.beginPath()
+    p.rect(0, 0, lw, lh)
+    c.clipPath(p, stroke=0, fill=0)
+
+    if static_form:
+        c.doForm(static_form)
+    else:
+        bg = pdf_color(canvas_bg)
+        if bg is not None:
+            c.setFillColor(bg)
+            c.rect(0, 0, lw, lh, stroke=0, fill=1)
+
+    _draw_items(c, items, lh, mm_per_px, forms)
+
+    c.restoreState()
+
+
+def render_labels_pdf(
+    out,
+    labels: Iterable[Dict[str, Any]],
+    *,
+    settings: Dict[str, Any],
+    layout_info: Dict[str, Any],
+    label_w_mm: float,
+    label_h_mm: float,
+    canvas_bg: str = "#ffffff",
+    mm_per_px: float = 1.0,
+    static_items: Optional[List[Dict[str, Any]]] = None,
+    title: str = "",
+) -> int:
+    """
+    Writes a print-ready PDF to `out` (path or binary file object).
+    labels: iterable of {"index", "serial", "items"} as built by _build_batch_label_payload.
+    static_items: static_values(layout.static_mm), drawn once as a shared form XObject; label
+    items then only carry layout.dynamic_mm. Without it every label is drawn in full.
+    Pages follow _compute_preview_layout (cols x rows per page). Returns the label count.
+    """
+    page_w = float(layout_info["page_w_mm"])
+    page_h = float(layout_info["page_h_mm"])
+    cols = max(1, int(layout_info["cols"]))
+    per_page = max(1, int(layout_info["per_page"]))
+    origin = label_origin_mm(settings, layout_info)
+
+    # rotated imposition: each grid cell holds the label turned 90° clockwise
+    rotated = bool(layout_info.get("rotated"))
+    cell_w = float(layout_info.get("cell_w_mm") or label_w_mm)
+    cell_h = float(layout_info.get("cell_h_mm") or label_h_mm)
+
+    c = canvas.Canvas(out, pagesize=(page_w * mm, page_h * mm), pageCompression=1)
+    if title:
+        c.setTitle(title)
+
+    forms = {}
+    static_form = ""
+    if static_items is not None:
+        static_form = static_layer_form(
+            c, static_items, label_w_mm, label_h_mm,
+            canvas_bg=canvas_bg, mm_per_px=mm_per_px, forms=forms,
+        )
+
+    count = 0
+    slot = 0
+    for label in labels:
+        if slot == per_page:
+            c.showPage()
+            slot = 0
+
+        col = slot % cols
+        row = slot // cols
+        x_mm = origin["x0"] + col * (cell_w + origin["gap_x"])
+        y_top_mm = origin["y0"] + row * (cell_h + origin["gap_y"])
+
+        c.saveState()
+        if rotated:
+            # label top edge runs down the cell's right side
+            c.translate(x_mm * mm, (page_h - y_top_mm) * mm)
+            c.rotate(-90)
+        else:
+            c.translate(x_mm * mm, (page_h - y_top_mm - label_h_mm) * mm)
+        draw_label(
+            c, label["items"], label_w_mm, label_h_mm,
+            canvas_bg=canvas_bg, mm_per_px=mm_per_px, forms=forms, static_form=static_form,
+        )
+        c.restoreState()
+
+        slot += 1
+        count += 1
+
+    c.showPage()
+    c.save()
+    return count
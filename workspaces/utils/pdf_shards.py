@@ -0,0 +1,127 @@
+# workspaces/utils/pdf_shards.py
+from __future__ import annotations
+
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings as django_settings
+from django.db import connections
+
+SHARD_MIN_LABELS = 2000      # below this one process is faster than pool start-up + merge
+SHARDS_PER_PROCESS = 4       # more shards than processes keeps cores busy until the end
+
+
+def render_processes() -> int:
+    n = getattr(django_settings, "LABEL_RENDER_PROCESSES", None) or os.cpu_count() or 1
+    return max(1, int(n))
+
+
+def page_shards(total_labels: int, per_page: int, processes: int) -> List[Tuple[int, int]]:
+    """
+    Split labels 1..total_labels into page-aligned (start, end) label ranges, so each
+    shard starts on a fresh page and the merged document paginates exactly like a
+    single-pass render.
+    """
+    per_page = max(1, int(per_page))
+    total_pages = max(1, math.ceil(total_labels / per_page))
+    shard_count = max(1, min(total_pages, processes * SHARDS_PER_PROCESS))
+    pages_per_shard = math.ceil(total_pages / shard_count)
+
+    shards = []
+    start = 1
+    while start <= total_labels:
+        end = min(total_labels, start + pages_per_shard * per_page - 1)
+        shards.append((start, end))
+        start = end + 1
+    return shards
+
+
+def _init_worker():
+    # forkserver/spawn children start without Django configured
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+def _render_shard(batch_id: int, start: int, end: int, params: Dict[str, Any], out_path: str) -> int:
+    from workspaces.models import LabelBatch
+    from workspaces.utils.batch_expansion import iter_batch_labels, label_values, static_values
+    from workspaces.utils.compiled_layout import get_compiled_layout
+    from workspaces.utils.pdf_render import render_labels_pdf
+
+    batch = LabelBatch.objects.select_related("template", "workspace__org").get(id=batch_id)
+    layout = get_compiled_layout(batch.template)
+
+    labels = (
+        {"index": rec.index, "serial": rec.serial, "items": label_values(rec, layout.dynamic_mm)}
+        for rec in iter_batch_labels(batch, layout.items_ui, start, end)
+    )
+    return render_labels_pdf(
+        out_path,
+        labels,
+        settings=params.get("settings") or {},
+        layout_info=params["layout_info"],
+        label_w_mm=layout.label_w_mm,
+        label_h_mm=layout.label_h_mm,
+        canvas_bg=layout.canvas_bg,
+        mm_per_px=layout.mm_per_px,
+        static_items=static_values(layout.static_mm),
+        title=f"Label batch #{batch_id}",
+    )
+
+
+def merge_pdfs(paths: List[str], out, title: str = "") -> None:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    if title:
+        writer.add_metadata({"/Title": title})
+    writer.write(out)
+    writer.close()
+
+
+def render_batch_pdf_sharded(
+    out,
+    batch,
+    total_labels: int,
+    params: Dict[str, Any],
+    processes: Optional[int] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Renders the whole batch to `out` using a process pool: page-aligned shards are
+    rendered to temp PDFs in parallel, then merged in order.
+    on_progress(labels_done) is called as shards finish. Returns the label count.
+    """
+    processes = processes or render_processes()
+    per_page = int(params["layout_info"]["per_page"] or 1)
+    shards = page_shards(total_labels, per_page, processes)
+
+    tmpdir = tempfile.mkdtemp(prefix=f"batch{batch.id}_")
+    try:
+        paths = [os.path.join(tmpdir, f"shard_{i:05d}.pdf") for i in range(len(shards))]
+
+        # children must not share the parent's DB sockets
+        connections.close_all()
+
+        done = 0
+        with ProcessPoolExecutor(max_workers=min(processes, len(shards)), initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_render_shard, batch.id, start, end, params, path)
+                for (start, end), path in zip(shards, paths)
+            ]
+            for fut in as_completed(futures):
+                done += fut.result()
+                if on_progress:
+                    on_progress(done)
+
+        merge_pdfs(paths, out, title=f"Label batch #{batch.id}")
+        return done
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,122 @@
+# workspaces/utils/png_zip.py
+from __future__ import annotations
+
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connections
+
+from workspaces.utils.pdf_shards import _init_worker
+
+ZIP_CHUNK_LABELS = 100      # labels per pool task; results travel back as PNG bytes
+POOL_MIN_LABELS = 200       # below this one process is faster than pool start-up
+TASKS_PER_PROCESS = 2       # in-flight tasks per process (bounds memory held by results)
+
+
+class _ZipSink:
+    """
+    Write-only stream for ZipFile: collects what was written since the last drain().
+    No tell()/seek(), so zipfile falls back to its streaming (non-seekable) mode.
+    """
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def png_name(index: int, serial: str, digits: int) -> str:
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", serial or "").strip("._")[:64]
+    return f"{index:0{digits}d}_{safe}.png" if safe else f"{index:0{digits}d}.png"
+
+
+def _label_chunks(total: int, size: int) -> Iterator[Tuple[int, int]]:
+    start = 1
+    while start <= total:
+        end = min(total, start + size - 1)
+        yield start, end
+        start = end + 1
+
+
+def _label_pngs(batch, dpi: int, digits: int, start: Optional[int] = None,
+                end: Optional[int] = None) -> Iterator[Tuple[str, bytes]]:
+    from workspaces.utils.batch_expansion import iter_batch_labels
+    from workspaces.utils.compiled_layout import get_compiled_layout
+    from workspaces.utils.raster_render import RasterLabelRenderer
+
+    layout = get_compiled_layout(batch.template)
+    renderer = RasterLabelRenderer(layout, dpi)
+    for rec in iter_batch_labels(batch, layout.items_ui, start, end):
+        yield png_name(rec.index, rec.serial, digits), renderer.png(rec)
+
+
+def _render_png_chunk(batch_id: int, start: int, end: int, dpi: int, digits: int) -> List[Tuple[str, bytes]]:
+    from workspaces.models import LabelBatch
+
+    batch = LabelBatch.objects.select_related("template", "workspace__org").get(id=batch_id)
+    return list(_label_pngs(batch, dpi, digits, start, end))
+
+
+def iter_label_pngs(batch, total: int, dpi: int, processes: int = 1) -> Iterator[Tuple[str, bytes]]:
+    """
+    (name, png) pairs for labels 1..total. With processes > 1 (render_worker only: the
+    pool closes the caller's DB connections and forks) large batches are rendered in
+    chunks, yielded as each chunk finishes (so not necessarily in label order).
+    """
+    digits = max(4, len(str(total)))
+    if processes <= 1 or total < POOL_MIN_LABELS:
+        yield from _label_pngs(batch, dpi, digits)
+        return
+
+    chunks = _label_chunks(total, ZIP_CHUNK_LABELS)
+    window = processes * TASKS_PER_PROCESS
+
+    # children must not share the parent's DB sockets
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+        pending = set()
+        try:
+            for start, end in chunks:
+                pending.add(pool.submit(_render_png_chunk, batch.id, start, end, dpi, digits))
+                if len(pending) < window:
+                    continue
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield from fut.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield from fut.result()
+        finally:
+            # render failed / job abandoned: drop queued chunks
+            for fut in pending:
+                fut.cancel()
+
+
+def iter_png_zip(pngs: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """
+    ZIP bytes for (name, png) pairs, produced as the entries come in. Entries are stored,
+    not deflated (PNG is already compressed); only the current image is held in memory.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for name, data in pngs:
+            zf.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
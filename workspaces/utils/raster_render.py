@@ -0,0 +1,357 @@
+# workspaces/utils/raster_render.py
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings as django_settings
+from PIL import Image, ImageDraw, ImageFont, TiffImagePlugin
+
+from workspaces.utils import code_cache
+from workspaces.utils.label_codes import BARCODE_QUIET_MODULES, barcode_runs
+from workspaces.utils.layout_engine import compute_label_engine
+from workspaces.utils.pdf_render import LABEL_FONT_SCALE, LINE_HEIGHT, SHAPE_POLYGONS, pdf_color
+
+# DejaVu ships with most Linux images; LABEL_RASTER_FONT_DIR can point at other TTFs
+# with the same file names.
+FONT_FILES = {
+    "sans": ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf", "DejaVuSans-Oblique.ttf", "DejaVuSans-BoldOblique.ttf"),
+    "serif": ("DejaVuSerif.ttf", "DejaVuSerif-Bold.ttf", "DejaVuSerif-Italic.ttf", "DejaVuSerif-BoldItalic.ttf"),
+    "mono": ("DejaVuSansMono.ttf", "DejaVuSansMono-Bold.ttf", "DejaVuSansMono-Oblique.ttf", "DejaVuSansMono-BoldOblique.ttf"),
+}
+
+SPRITE_CACHE_SIZE = 256     # rendered masks kept per item (values repeat across row quantities)
+PNG_COMPRESS_LEVEL = 3      # labels are mostly flat colour; higher levels cost time, not bytes
+BARCODE_TEXT_PT = 10.0      # max human readable size under the bars (as in the PDF renderer)
+MIN_DPI = 72
+MAX_DPI = 600
+
+Color = Tuple[int, int, int]
+
+
+def rgb(value: str) -> Optional[Color]:
+    c = pdf_color(value)
+    if c is None or c.alpha < 0.5:
+        return None
+    return int(round(c.red * 255)), int(round(c.green * 255)), int(round(c.blue * 255))
+
+
+def clamp_dpi(value, default: int) -> int:
+    try:
+        dpi = int(value or default)
+    except (TypeError, ValueError):
+        dpi = int(default)
+    return min(MAX_DPI, max(MIN_DPI, dpi))
+
+
+def font_style(family: str) -> str:
+    fam = (family or "").lower()
+    if "times" in fam or "georgia" in fam or ("serif" in fam and "sans" not in fam):
+        return "serif"
+    if "courier" in fam or "mono" in fam:
+        return "mono"
+    return "sans"
+
+
+@lru_cache(maxsize=256)
+def get_font(style: str, bold: bool, italic: bool, size_px: int) -> ImageFont.ImageFont:
+    """
+    Cached FreeType font objects (opening a TTF costs far more than drawing with it).
+    """
+    names = FONT_FILES.get(style, FONT_FILES["sans"])
+    font_dir = getattr(django_settings, "LABEL_RASTER_FONT_DIR", "") or ""
+    for name in (names[(1 if bold else 0) + (2 if italic else 0)], names[0]):
+        for path in ((os.path.join(font_dir, name),) if font_dir else ()) + (name,):
+            try:
+                return ImageFont.truetype(path, size_px)
+            except OSError:
+                continue
+    return ImageFont.load_default(size_px)
+
+
+def _wrap(font, text: str, width: int) -> List[str]:
+    """
+    Greedy word wrap by measured width; words longer than a line are split (like word-break).
+    """
+    lines = []
+    for para in str(text).split("\n"):
+        line = ""
+        for word in para.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if font.getlength(candidate) <= width or not line and len(word) <= 1:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            while len(word) > 1 and font.getlength(word) > width:
+                cut = len(word) - 1
+                while cut > 1 and font.getlength(word[:cut]) > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+class RasterItem:
+    """
+    One layout item in device pixels. sprite(value) is its 8-bit coverage mask, drawn in
+    self.color over the item box; masks are cached per value.
+    """
+
+    def __init__(self, it: Dict[str, Any], px_per_mm: float, mm_per_px: float):
+        self.ft = (it.get("field_type") or "TEXT").upper()
+        self.key = (it.get("key") or "").strip()
+        self.static_value = it.get("static_value") or it.get("name") or ""
+        self.x = int(round(float(it.get("x_mm") or 0) * px_per_mm))
+        self.y = int(round(float(it.get("y_mm") or 0) * px_per_mm))
+        self.w = max(1, int(round(float(it.get("w_mm") or 0.1) * px_per_mm)))
+        self.h = max(1, int(round(float(it.get("h_mm") or 0.1) * px_per_mm)))
+        self.bg = rgb(it.get("bg_color"))
+
+        if self.ft == "SHAPE":
+            self.color = rgb(it.get("shape_color") or "#000000")
+        elif self.ft in ("BARCODE", "QRCODE"):
+            self.color = (0, 0, 0)
+        else:
+            self.color = rgb(it.get("text_color") or "#000000") or (0, 0, 0)
+
+        self.shape = (it.get("shape_type") or "RECT").upper()
+        self.px_per_mm = px_per_mm
+        size = max(1, int(round(max(0.5, float(it.get("font_size_mm") or 2.0)) * px_per_mm)))
+        style = font_style(it.get("font_family"))
+        bold, italic = bool(it.get("font_bold")), bool(it.get("font_italic"))
+        self.font = get_font(style, bold, italic, size)
+        self.label_font = get_font(style, bold, italic, max(1, int(round(size * LABEL_FONT_SCALE))))
+        self.font_px = size
+        self.align = it.get("text_align") or "left"
+        self.underline = bool(it.get("font_underline"))
+        show_label = self.ft not in ("STATIC_TEXT", "SHAPE", "BARCODE", "QRCODE", "IMAGE_URL") and bool(it.get("show_label"))
+        self.label = str(it.get("name") or it.get("key") or "") if show_label else ""
+
+        # same .pl-txt padding as the HTML/PDF renderers
+        self.pad_x = int(round(8 * mm_per_px * px_per_mm))
+        self.pad_y = int(round(6 * mm_per_px * px_per_mm))
+        self.gap = int(round(4 * mm_per_px * px_per_mm))
+
+        self._sprites: "OrderedDict[str, Optional[np.ndarray]]" = OrderedDict()
+
+    def value_for(self, rec) -> str:
+        if self.ft == "BARCODE":
+            return rec.barcode_value
+        if self.ft == "QRCODE":
+            return rec.qr_value
+        if self.ft in ("STATIC_TEXT", "SHAPE"):
+            return self.static_value
+        if not self.key:
+            return ""
+        return str((rec.row.field_values or {}).get(self.key, "") or "")
+
+    def sprite(self, value: str) -> Optional[np.ndarray]:
+        if self.ft == "BARCODE":
+            # serial-bearing values never repeat: not worth caching
+            return self._barcode_mask(value) if value else None
+
+        cached = self._sprites.get(value, False)
+        if cached is not False:
+            self._sprites.move_to_end(value)
+            return cached
+
+        if self.ft == "SHAPE":
+            mask = self._shape_mask() if self.color else None
+        elif self.ft == "QRCODE":
+            mask = self._qr_mask(value) if value else None
+        elif self.ft == "IMAGE_URL":
+            mask = None   # remote images are not fetched server-side
+        else:
+            mask = self._text_mask(value)
+
+        self._sprites[value] = mask
+        if len(self._sprites) > SPRITE_CACHE_SIZE:
+            self._sprites.popitem(last=False)
+        return mask
+
+    # -- masks -------------------------------------------------------
+
+    def _shape_mask(self) -> np.ndarray:
+        img = Image.new("L", (self.w, self.h), 0)
+        draw = ImageDraw.Draw(img)
+        if self.shape == "CIRCLE":
+            draw.rounded_rectangle((0, 0, self.w - 1, self.h - 1), radius=min(self.w, self.h) / 2.0, fill=255)
+        elif self.shape in SHAPE_POLYGONS:
+            draw.polygon([(self.w * px / 100.0, self.h * py / 100.0) for px, py in SHAPE_POLYGONS[self.shape]], fill=255)
+        else:
+            draw.rectangle((0, 0, self.w, self.h), fill=255)
+        return np.asarray(img)
+
+    def _barcode_mask(self, value: str) -> Optional[np.ndarray]:
+        runs = barcode_runs(value)
+        if not runs:
+            return None
+
+        font_px = min(self.h * 0.18, BARCODE_TEXT_PT / 72.0 * 25.4 * self.px_per_mm)
+        bar_h = int(self.h - font_px * 1.4)
+        if bar_h < self.h * 0.5:
+            font_px = 0
+            bar_h = self.h
+
+        modules = runs[-1][0] + runs[-1][1]
+        bar_w = self.w / float(modules + 2 * BARCODE_QUIET_MODULES)
+
+        row = np.zeros(self.w, dtype=np.uint8)
+        for x, rw in runs:
+            x0 = int(round((x + BARCODE_QUIET_MODULES) * bar_w))
+            x1 = max(x0 + 1, int(round((x + BARCODE_QUIET_MODULES + rw) * bar_w)))
+            row[x0:x1] = 255
+
+        mask = np.zeros((self.h, self.w), dtype=np.uint8)
+        mask[:bar_h] = row
+
+        if font_px >= 1:
+            img = Image.fromarray(mask)
+            font = get_font("sans", False, False, max(1, int(round(font_px))))
+            ImageDraw.Draw(img).text((self.w / 2.0, self.h - font_px * 0.2), value, font=font, fill=255, anchor="ms")
+            mask = np.asarray(img)
+        return mask
+
+    def _qr_mask(self, value: str) -> np.ndarray:
+        matrix = np.asarray(code_cache.qr_matrix(value), dtype=bool)
+        n = matrix.shape[0]
+        side = min(self.w, self.h)   # object-fit: contain
+        idx = (np.arange(side) * n) // side
+        mask = np.zeros((self.h, self.w), dtype=np.uint8)
+        ox = (self.w - side) // 2
+        oy = (self.h - side) // 2
+        mask[oy:oy + side, ox:ox + side] = matrix[np.ix_(idx, idx)] * np.uint8(255)
+        return mask
+
+    def _text_lines(self, draw, font, size, lines, y) -> int:
+        inner_w = max(1, self.w - 2 * self.pad_x)
+        line_h = size * LINE_HEIGHT
+        for line in lines:
+            lw = font.getlength(line)
+            if self.align == "center":
+                x = self.pad_x + (inner_w - lw) / 2.0
+            elif self.align == "right":
+                x = self.pad_x + inner_w - lw
+            else:
+                x = self.pad_x
+            draw.text((x, y + line_h * 0.78), line, font=font, fill=255, anchor="ls")
+            if self.underline and line:
+                uy = y + line_h * 0.9
+                draw.line((x, uy, x + lw, uy), fill=255, width=max(1, int(size * 0.06)))
+            y += line_h
+            if y >= self.h:
+                break
+        return int(y)
+
+    def _text_mask(self, value: str) -> Optional[np.ndarray]:
+        if not value and not self.label:
+            return None
+        inner_w = max(1, self.w - 2 * self.pad_x)
+        img = Image.new("L", (self.w, self.h), 0)
+        draw = ImageDraw.Draw(img)
+
+        y = self.pad_y
+        if self.label:
+            label_px = self.label_font.size
+            y = self._text_lines(draw, self.label_font, label_px, _wrap(self.label_font, self.label, inner_w), y)
+            y += self.gap
+        if value and y < self.h:
+            self._text_lines(draw, self.font, self.font_px, _wrap(self.font, value, inner_w), y)
+        return np.asarray(img)
+
+
+def _blend(canvas: np.ndarray, mask: np.ndarray, color: Color, x: int, y: int) -> None:
+    h, w = canvas.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(w, x + mask.shape[1]), min(h, y + mask.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    m = mask[y0 - y:y1 - y, x0 - x:x1 - x]
+    region = canvas[y0:y1, x0:x1]
+
+    solid = m == 255
+    region[solid] = color
+    partial = (m > 0) & ~solid
+    if partial.any():
+        a = m[partial].astype(np.uint16)[:, None]
+        px = region[partial].astype(np.uint16)
+        region[partial] = ((px * (255 - a) + np.array(color, dtype=np.uint16) * a + 127) // 255).astype(np.uint8)
+
+
+def _fill(canvas: np.ndarray, color: Color, x: int, y: int, w: int, h: int) -> None:
+    canvas[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = color
+
+
+class RasterLabelRenderer:
+    """
+    Renders labels of one compiled layout to RGB NumPy arrays at `dpi` (template DPI by
+    default). The background + static layer (layout.static_mm) is composited once; each
+    label starts from a copy of it and only draws its per-label items.
+    """
+
+    def __init__(self, layout, dpi: int):
+        engine = compute_label_engine(layout.width_cm, layout.height_cm, dpi)
+        self.dpi = engine["dpi"]
+        self.width = engine["real_w_px"]
+        self.height = engine["real_h_px"]
+        px_per_mm = engine["real_px_per_cm"] / 10.0
+
+        self.items = [RasterItem(it, px_per_mm, layout.mm_per_px) for it in layout.dynamic_mm]
+
+        base = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        base[:] = rgb(layout.canvas_bg) or (255, 255, 255)
+        for it in layout.static_mm:
+            item = RasterItem(it, px_per_mm, layout.mm_per_px)
+            self._draw(base, item, item.static_value)
+        base.setflags(write=False)
+        self.base = base
+
+    def _draw(self, canvas: np.ndarray, item: RasterItem, value: str) -> None:
+        if item.bg:
+            _fill(canvas, item.bg, item.x, item.y, item.w, item.h)
+        mask = item.sprite(value)
+        if mask is not None and item.color:
+            _blend(canvas, mask, item.color, item.x, item.y)
+
+    def render(self, rec) -> np.ndarray:
+        canvas = self.base.copy()
+        for item in self.items:
+            self._draw(canvas, item, item.value_for(rec))
+        return canvas
+
+    def image(self, rec) -> Image.Image:
+        return Image.fromarray(self.render(rec), "RGB")
+
+    def png(self, rec) -> bytes:
+        buf = BytesIO()
+        self.image(rec).save(buf, format="PNG", dpi=(self.dpi, self.dpi), compress_level=PNG_COMPRESS_LEVEL)
+        return buf.getvalue()
+
+
+def write_tiff(
+    out,
+    renderer: RasterLabelRenderer,
+    records: Iterable,
+    on_page: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Streams one TIFF page per label record to `out` (seekable binary file), deflate
+    compressed. Pages are written as they are rendered, so memory stays flat.
+    Returns the page count.
+    """
+    count = 0
+    with TiffImagePlugin.AppendingTiffWriter(out, new=True) as tf:
+        for rec in records:
+            renderer.image(rec).save(tf, format="TIFF", dpi=(renderer.dpi, renderer.dpi), compression="tiff_adobe_deflate")
+            tf.newFrame()
+            count += 1
+            if on_page:
+                on_page(count)
+    return count
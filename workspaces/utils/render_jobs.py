@@ -0,0 +1,279 @@
+# workspaces/utils/render_jobs.py
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from django.conf import settings as django_settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from workspaces.models import LabelBatch, RenderJob
+from workspaces.utils.artifact_cache import artifact_key, cached_artifact_path, store_artifact
+from workspaces.utils.batch_expansion import (
+    batch_label_total,
+    export_fieldnames,
+    iter_batch_labels,
+    iter_export_rows,
+    label_values,
+    static_values,
+)
+from workspaces.utils.compiled_layout import get_compiled_layout
+from workspaces.utils.csv_stream import gzip_chunks, iter_csv_chunks
+from workspaces.utils.pdf_render import render_labels_pdf
+from workspaces.utils.pdf_shards import SHARD_MIN_LABELS, render_batch_pdf_sharded, render_processes
+from workspaces.utils.png_zip import iter_label_pngs, iter_png_zip
+from workspaces.utils.raster_render import RasterLabelRenderer, clamp_dpi, write_tiff
+from workspaces.utils.thermal import clamp_thermal_dpi, thermal_format, thermal_labels
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_EVERY = 250                    # labels between progress writes
+STALE_AFTER = timedelta(minutes=10)     # RUNNING job without heartbeat -> requeued
+MAX_ATTEMPTS = 3
+SYNC_RENDER_MAX_LABELS = 500            # bigger batches render through the queue from the print page
+HTML_PRINT_MAX_LABELS = 2000            # browser print view above this is replaced by the (queued) PDF
+PURGE_CHUNK_SIZE = 200
+
+
+def job_retention() -> timedelta:
+    # finished jobs (and their artifact files) older than this are deleted by purge_old_jobs
+    return timedelta(days=int(getattr(django_settings, "RENDER_JOB_RETENTION_DAYS", 7)))
+
+
+def enqueue_render_job(batch: LabelBatch, kind: str, params: Dict[str, Any], user=None) -> RenderJob:
+    return RenderJob.objects.create(
+        batch=batch,
+        kind=kind,
+        params=params or {},
+        created_by=user,
+        progress_total=batch_label_total(batch),
+    )
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Puts RUNNING jobs whose worker stopped heart-beating back in the queue
+    (or fails them after MAX_ATTEMPTS).
+    """
+    cutoff = timezone.now() - STALE_AFTER
+    stale = RenderJob.objects.filter(status=RenderJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=RenderJob.STATUS_FAILED,
+        error="Worker stopped responding.",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=RenderJob.STATUS_QUEUED)
+    return failed + requeued
+
+
+def purge_old_jobs(now=None) -> int:
+    """
+    Deletes DONE / FAILED jobs that finished more than job_retention() ago; their artifact
+    files go with them (see workspaces.signals). Returns the number of jobs deleted.
+    """
+    cutoff = (now or timezone.now()) - job_retention()
+    old = RenderJob.objects.filter(
+        status__in=[RenderJob.STATUS_DONE, RenderJob.STATUS_FAILED],
+        finished_at__lt=cutoff,
+    )
+
+    deleted = 0
+    while True:
+        ids = list(old.values_list("id", flat=True)[:PURGE_CHUNK_SIZE])
+        if not ids:
+            return deleted
+        RenderJob.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+
+
+def claim_next_job() -> Optional[RenderJob]:
+    """
+    Atomically takes the oldest queued job. SKIP LOCKED lets several workers poll the
+    same table without handing out a job twice (ignored on backends without row locks).
+    """
+    with transaction.atomic():
+        job = (
+            RenderJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=RenderJob.STATUS_QUEUED)
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        now = timezone.now()
+        job.status = RenderJob.STATUS_RUNNING
+        job.started_at = now
+        job.heartbeat_at = now
+        job.attempts += 1
+        job.progress_done = 0
+        job.save(update_fields=["status", "started_at", "heartbeat_at", "attempts", "progress_done"])
+        return job
+
+
+def _track_progress(job: RenderJob, items: Iterable) -> Iterator:
+    done = 0
+    for item in items:
+        yield item
+        done += 1
+        if done % PROGRESS_EVERY == 0:
+            RenderJob.objects.filter(pk=job.pk).update(progress_done=done, heartbeat_at=timezone.now())
+    job.progress_done = done
+
+
+def _render_pdf(job: RenderJob, out) -> str:
+    batch = job.batch
+    layout = get_compiled_layout(batch.template)
+    params = job.params or {}
+
+    filename = f"label_batch_{batch.id}.pdf"
+    total = batch_label_total(batch)
+
+    # same artifact cache as label_batch_print_pdf
+    cache_key = artifact_key(batch, "pdf", params.get("settings") or {})
+    cached_path = cached_artifact_path(batch, cache_key, "pdf")
+    if cached_path:
+        with open(cached_path, "rb") as fh:
+            shutil.copyfileobj(fh, out)
+        job.progress_done = total
+        return filename
+
+    if total >= SHARD_MIN_LABELS and render_processes() > 1:
+        def on_progress(done):
+            job.progress_done = done
+            RenderJob.objects.filter(pk=job.pk).update(progress_done=done, heartbeat_at=timezone.now())
+
+        render_batch_pdf_sharded(out, batch, total, params, on_progress=on_progress)
+        _store_pdf(batch, cache_key, out)
+        return filename
+
+    labels = (
+        {"index": rec.index, "serial": rec.serial, "items": label_values(rec, layout.dynamic_mm)}
+        for rec in iter_batch_labels(batch, layout.items_ui)
+    )
+    render_labels_pdf(
+        out,
+        _track_progress(job, labels),
+        settings=params.get("settings") or {},
+        layout_info=params["layout_info"],
+        label_w_mm=layout.label_w_mm,
+        label_h_mm=layout.label_h_mm,
+        canvas_bg=layout.canvas_bg,
+        mm_per_px=layout.mm_per_px,
+        static_items=static_values(layout.static_mm),
+        title=f"Label batch #{batch.id}",
+    )
+    _store_pdf(batch, cache_key, out)
+    return filename
+
+
+def _store_pdf(batch, cache_key, out) -> None:
+    out.seek(0)
+    store_artifact(batch, cache_key, "pdf", out)
+
+
+def _render_csv(job: RenderJob, out) -> str:
+    batch = job.batch
+    layout = get_compiled_layout(batch.template)
+    rows = _track_progress(job, iter_export_rows(batch, layout))
+    chunks = iter_csv_chunks(export_fieldnames(layout), rows)
+
+    filename = f"label_batch_{batch.id}.csv"
+    if (job.params or {}).get("compress") == "gzip":
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+
+    for chunk in chunks:
+        out.write(chunk)
+    return filename
+
+
+def _render_tiff(job: RenderJob, out) -> str:
+    batch = job.batch
+    layout = get_compiled_layout(batch.template)
+    dpi = clamp_dpi((job.params or {}).get("dpi"), batch.template.dpi)
+
+    renderer = RasterLabelRenderer(layout, dpi)
+    write_tiff(out, renderer, _track_progress(job, iter_batch_labels(batch, layout.items_ui)))
+    return f"label_batch_{batch.id}.tiff"
+
+
+def _render_png_zip(job: RenderJob, out) -> str:
+    batch = job.batch
+    dpi = clamp_dpi((job.params or {}).get("dpi"), batch.template.dpi)
+
+    # the worker owns its process, so it can fork a render pool
+    pngs = iter_label_pngs(batch, batch_label_total(batch), dpi, processes=render_processes())
+    for chunk in iter_png_zip(_track_progress(job, pngs)):
+        out.write(chunk)
+    return f"label_batch_{batch.id}_png.zip"
+
+
+def _render_thermal(job: RenderJob, out) -> str:
+    batch = job.batch
+    layout = get_compiled_layout(batch.template)
+    params = job.params or {}
+    settings = params.get("settings") or {}
+    fmt = thermal_format(params.get("format"))
+    dpi = clamp_thermal_dpi(params.get("dpi"), batch.template.dpi)
+
+    ext = fmt.lower()
+    filename = f"label_batch_{batch.id}.{ext}"
+
+    # same artifact cache as label_batch_print_thermal
+    cache_key = artifact_key(batch, ext, dict(settings, dpi=dpi))
+    cached_path = cached_artifact_path(batch, cache_key, ext)
+    if cached_path:
+        with open(cached_path, "rb") as fh:
+            shutil.copyfileobj(fh, out)
+        job.progress_done = batch_label_total(batch)
+        return filename
+
+    preamble, labels = thermal_labels(fmt, batch, layout, settings, dpi)
+    out.write(preamble.encode("utf-8"))
+    for _, text in _track_progress(job, labels):
+        out.write(text.encode("utf-8"))
+
+    out.seek(0)
+    store_artifact(batch, cache_key, ext, out)
+    return filename
+
+
+RENDERERS = {
+    RenderJob.KIND_PDF: _render_pdf,
+    RenderJob.KIND_CSV: _render_csv,
+    RenderJob.KIND_TIFF: _render_tiff,
+    RenderJob.KIND_PNG_ZIP: _render_png_zip,
+    RenderJob.KIND_THERMAL: _render_thermal,
+}
+
+
+def run_job(job: RenderJob) -> None:
+    """
+    Renders job into a temp file, then stores it as job.artifact. Exceptions mark the
+    job FAILED (the worker keeps going).
+    """
+    try:
+        renderer = RENDERERS[job.kind]
+        with tempfile.TemporaryFile() as out:
+            filename = renderer(job, out)
+            out.seek(0)
+            job.artifact.save(os.path.join(str(job.batch_id), filename), File(out, name=filename), save=False)
+
+        job.status = RenderJob.STATUS_DONE
+        job.error = ""
+    except Exception as e:
+        logger.exception("Render job %s failed", job.id)
+        job.status = RenderJob.STATUS_FAILED
+        job.error = str(e)[:2000] or e.__class__.__name__
+
+    job.finished_at = timezone.now()
+    job.heartbeat_at = job.finished_at
+    job.save(update_fields=["status", "error", "artifact", "progress_done", "finished_at", "heartbeat_at"])
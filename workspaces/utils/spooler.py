@@ -0,0 +1,155 @@
+# workspaces/utils/spooler.py
+from __future__ import annotations
+
+import logging
+import select
+import socket
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RAW_PORT = 9100
+CHUNK_LABELS = 50          # labels per write between acknowledgements
+SEND_BUFFER_BYTES = 64 * 1024
+CONNECT_TIMEOUT = 10.0
+IO_TIMEOUT = 30.0
+MAX_RETRIES = 5
+RETRY_BACKOFF = 2.0        # seconds, doubled per consecutive failure
+
+ZPL_STATUS_QUERY = b"~HS"
+ETX = b"\x03"
+
+
+class SpoolError(Exception):
+    """Raised when the printer cannot be reached after all retries."""
+
+    def __init__(self, message: str, last_acked: int):
+        super().__init__(message)
+        self.last_acked = last_acked
+
+
+# (start_label) -> (preamble, iterator of (label number, commands))
+LabelSource = Callable[[int], Tuple[str, Iterator[Tuple[int, str]]]]
+
+
+class RawPrinterSpooler:
+    """
+    Streams printer-native labels to a raw TCP (JetDirect / port 9100) printer.
+
+    Labels go out in chunks of `chunk_labels`. With ack="status" (ZPL printers) every chunk
+    is followed by a ~HS host status query and the spooler waits for the reply: the printer
+    has then parsed everything before it, so the chunk counts as acknowledged and the wait
+    doubles as flow control. With ack="sent" (EPL or printers without status) a chunk is
+    acknowledged once the kernel has accepted it; the small send buffer keeps that close to
+    what the printer has actually received, but a drop can still lose up to a buffer's worth.
+
+    On a connection drop the spooler reconnects and resumes after the last acknowledged label.
+    Labels the printer took in after that point are sent again (at-least-once).
+    """
+
+    def __init__(self, host: str, port: int = RAW_PORT, *, ack: str = "status",
+                 chunk_labels: int = CHUNK_LABELS, max_retries: int = MAX_RETRIES,
+                 connect_timeout: float = CONNECT_TIMEOUT, io_timeout: float = IO_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.ack = ack
+        self.chunk_labels = max(1, chunk_labels)
+        self.max_retries = max(0, max_retries)
+        self.connect_timeout = connect_timeout
+        self.io_timeout = io_timeout
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        sock.settimeout(self.io_timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _wait_status(self, sock: socket.socket) -> None:
+        # ~HS answers with three STX ... ETX framed strings
+        sock.sendall(ZPL_STATUS_QUERY)
+        buf = b""
+        while buf.count(ETX) < 3:
+            data = sock.recv(1024)
+            if not data:
+                raise ConnectionError("printer closed the connection")
+            buf += data
+
+    def _check_open(self, sock: socket.socket) -> None:
+        # a raw port never talks back unasked, so readable means the printer hung up
+        readable, _, _ = select.select([sock], [], [], 0)
+        if readable and not sock.recv(1024):
+            raise ConnectionError("printer closed the connection")
+
+    def _send_chunk(self, sock: socket.socket, payload: str) -> None:
+        if self.ack != "status":
+            self._check_open(sock)
+        sock.sendall(payload.encode("utf-8"))
+        if self.ack == "status":
+            self._wait_status(sock)
+
+    def _run_once(self, source: LabelSource, start: int,
+                  on_progress: Optional[Callable[[int], None]]) -> int:
+        """
+        One connection: sends labels from `start` until the source is exhausted.
+        Returns the last acknowledged label number; raises OSError on connection problems
+        (with self._acked updated so the caller can resume).
+        """
+        preamble, labels = source(start)
+        sock = self._connect()
+        try:
+            if preamble:
+                sock.sendall(preamble.encode("utf-8"))
+
+            parts = []
+            last_in_chunk = self._acked
+            for label_no, text in labels:
+                parts.append(text)
+                last_in_chunk = label_no
+                if len(parts) >= self.chunk_labels:
+                    self._send_chunk(sock, "".join(parts))
+                    parts = []
+                    self._acked = last_in_chunk
+                    if on_progress:
+                        on_progress(self._acked)
+
+            if parts:
+                self._send_chunk(sock, "".join(parts))
+                self._acked = last_in_chunk
+                if on_progress:
+                    on_progress(self._acked)
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            sock.close()
+        return self._acked
+
+    def spool(self, source: LabelSource, start_label: int = 1,
+              on_progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Prints labels start_label..end of `source`. Returns the last label sent.
+        Raises SpoolError (with .last_acked) once retries are exhausted.
+        """
+        self._acked = max(0, start_label - 1)
+        failures = 0
+
+        while True:
+            before = self._acked
+            try:
+                return self._run_once(source, self._acked + 1, on_progress)
+            except OSError as e:
+                # only consecutive failures without progress count towards the limit
+                failures = 1 if self._acked > before else failures + 1
+                if failures > self.max_retries:
+                    raise SpoolError(
+                        f"Printer {self.host}:{self.port} unreachable: {e}", self._acked
+                    ) from e
+                delay = RETRY_BACKOFF * (2 ** (failures - 1))
+                logger.warning(
+                    "Spool to %s:%s dropped after label %s (%s); retrying in %.0fs",
+                    self.host, self.port, self._acked, e, delay,
+                )
+                time.sleep(delay)
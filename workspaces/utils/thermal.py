@@ -0,0 +1,448 @@
+# workspaces/utils/thermal.py
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from workspaces.utils import code_cache
+from workspaces.utils.batch_expansion import LabelRecord, iter_batch_labels
+from workspaces.utils.label_codes import BARCODE_QUIET_MODULES, QR_BORDER, barcode_modules
+from workspaces.utils.pdf_render import LABEL_FONT_SCALE, LINE_HEIGHT, pdf_color
+
+FORMAT_ZPL = "ZPL"
+FORMAT_EPL = "EPL"
+THERMAL_FORMATS = (FORMAT_ZPL, FORMAT_EPL)
+
+DEFAULT_DPI = 203
+MIN_DPI = 100
+MAX_DPI = 600
+
+# EPL2 resident fonts at 203 dpi: font -> (char width, char height) in dots
+EPL_FONTS = {
+    "1": (8, 12),
+    "2": (10, 16),
+    "3": (12, 20),
+    "4": (14, 24),
+    "5": (32, 48),
+}
+
+
+def thermal_format(value) -> str:
+    fmt = (value or FORMAT_ZPL).upper()
+    return fmt if fmt in THERMAL_FORMATS else FORMAT_ZPL
+
+
+def clamp_thermal_dpi(value, default) -> int:
+    try:
+        dpi = int(value or default or DEFAULT_DPI)
+    except (TypeError, ValueError):
+        dpi = DEFAULT_DPI
+    return min(MAX_DPI, max(MIN_DPI, dpi))
+
+
+def is_dark(value: str) -> bool:
+    """
+    Thermal printers are 1-bit: anything darker than mid-grey prints black, the rest is paper.
+    """
+    c = pdf_color(value)
+    if c is None or c.alpha < 0.5:
+        return False
+    return (0.299 * c.red + 0.587 * c.green + 0.114 * c.blue) < 0.5
+
+
+class ThermalItem:
+    """
+    One layout item with its geometry already in printer dots; only the value changes per label.
+    """
+    __slots__ = ("ft", "key", "x", "y", "w", "h", "font", "label_font", "align", "label",
+                 "static_value", "reverse", "fill_bg", "shape", "shape_dark", "pad_x", "pad_y", "gap")
+
+    def __init__(self, it: Dict[str, Any], dpmm: float, mm_per_px: float):
+        self.ft = it["field_type"]
+        self.key = (it.get("key") or "").strip()
+        self.x = int(round(float(it.get("x_mm") or 0) * dpmm))
+        self.y = int(round(float(it.get("y_mm") or 0) * dpmm))
+        self.w = max(1, int(round(float(it.get("w_mm") or 0.1) * dpmm)))
+        self.h = max(1, int(round(float(it.get("h_mm") or 0.1) * dpmm)))
+        self.font = max(8, int(round(float(it.get("font_size_mm") or 2.0) * dpmm)))
+        self.label_font = max(8, int(round(self.font * LABEL_FONT_SCALE)))
+        self.align = it.get("text_align") or "left"
+        show_label = self.ft != "STATIC_TEXT" and bool(it.get("show_label"))
+        self.label = str(it.get("name") or it.get("key") or "") if show_label else ""
+        self.static_value = it.get("static_value") or it.get("name") or ""
+        self.fill_bg = is_dark(it.get("bg_color"))
+        self.reverse = self.fill_bg
+        self.shape = (it.get("shape_type") or "RECT").upper()
+        self.shape_dark = is_dark(it.get("shape_color") or "#000000")
+
+        # same .pl-txt padding as the HTML/PDF renderers
+        self.pad_x = int(round(8 * mm_per_px * dpmm))
+        self.pad_y = int(round(6 * mm_per_px * dpmm))
+        self.gap = int(round(4 * mm_per_px * dpmm))
+
+    def value_for(self, rec: LabelRecord) -> str:
+        if self.ft == "BARCODE":
+            return rec.barcode_value
+        if self.ft == "QRCODE":
+            return rec.qr_value
+        if self.ft == "STATIC_TEXT":
+            return self.static_value
+        if not self.key:
+            return ""
+        return str((rec.row.field_values or {}).get(self.key, "") or "")
+
+
+def compile_items(items_mm: List[dict], dpi: int, mm_per_px: float) -> List[ThermalItem]:
+    dpmm = float(dpi) / 25.4
+    ordered = sorted(items_mm, key=lambda x: int(x.get("z_index") or 0))
+    return [
+        ThermalItem(it, dpmm, mm_per_px)
+        for it in ordered
+        if it["field_type"] != "IMAGE_URL"  # remote images are not fetched server-side
+    ]
+
+
+# Code128 charset switches only look at which characters are digits, so the symbol width
+# does not depend on the digit values: labels of one batch (same base, serial width) share it.
+# Exception: python-barcode folds a leading "99" pair (== the TO_C code) into the start code.
+_DIGITS_TO_ZERO = str.maketrans("123456789", "000000000")
+
+
+@lru_cache(maxsize=256)
+def _code128_width(shape: str) -> int:
+    return max(1, len(barcode_modules(shape)))
+
+
+def barcode_width(value: str) -> int:
+    """
+    Code128 width of value in modules (without quiet zones), encoding once per digit pattern.
+    """
+    shape = value.translate(_DIGITS_TO_ZERO)
+    if value.startswith("99"):
+        shape = "99" + shape[2:]
+    return _code128_width(shape)
+
+
+def _barcode_fit(value: str, w: int) -> Tuple[int, int]:
+    """
+    (module width in dots, x offset) so the symbol + quiet zones fit and centre in w dots.
+    """
+    modules = barcode_width(value)
+    total = modules + 2 * BARCODE_QUIET_MODULES
+    module_w = max(1, w // total)
+    return module_w, max(0, (w - module_w * modules) // 2)
+
+
+def _qr_fit(value: str, w: int, h: int) -> Tuple[int, int, int]:
+    """
+    (magnification, x offset, y offset) for a QR in a w x h box (object-fit: contain).
+    """
+    n = max(1, len(code_cache.qr_matrix(value)) - 2 * QR_BORDER)
+    side = min(w, h)
+    mag = max(1, min(10, side // n))
+    size = n * mag
+    return mag, max(0, (w - size) // 2), max(0, (h - size) // 2)
+
+
+def _text_lines(text: str, font_h: int, width: int) -> List[str]:
+    # rough wrap for printers without measured fonts (~0.55 em per glyph)
+    return _wrap(text, max(1, int(width / max(1.0, font_h * 0.55))))
+
+
+def _wrap(text: str, per_line: int) -> List[str]:
+    lines = []
+    for para in str(text).split("\n"):
+        while len(para) > per_line:
+            cut = para.rfind(" ", 0, per_line + 1)
+            if cut <= 0:
+                cut = per_line
+            lines.append(para[:cut].rstrip())
+            para = para[cut:].lstrip()
+        lines.append(para)
+    return lines
+
+
+# ------------------------------------------------------------------
+# ZPL II
+# ------------------------------------------------------------------
+
+def zpl_escape(value: str) -> str:
+    # used with ^FH_ : control characters become _XX hex escapes
+    return str(value).replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+
+ZPL_ALIGN = {"left": "L", "center": "C", "right": "R"}
+
+
+# DRAM object (gone after a power cycle): the job preamble defines it on every connection
+ZPL_FORMAT_NAME = "R:WSLABEL.ZPL"
+
+
+def _zpl_text_block(x, y, w, h, font_h, align, text, reverse, fn=0) -> str:
+    max_lines = max(1, int(h / (font_h * LINE_HEIGHT)))
+    data = f"^FN{fn}" if fn else f"^FH_^FD{zpl_escape(text)}"
+    return (
+        f"^FO{x},{y}^A0N,{font_h},0"
+        f"^FB{w},{max_lines},{int(font_h * (LINE_HEIGHT - 1))},{ZPL_ALIGN.get(align, 'L')},0"
+        f"{'^FR' if reverse else ''}{data}^FS"
+    )
+
+
+def zpl_item(t: ThermalItem, value: str, fn: int = 0) -> str:
+    """
+    ZPL fields for one item. fn > 0 (text items inside a stored format) leaves the value
+    as a ^FN placeholder that each label fills in.
+    """
+    out = []
+    if t.fill_bg:
+        out.append(f"^FO{t.x},{t.y}^GB{t.w},{t.h},{min(t.w, t.h)},B,0^FS")
+
+    if t.ft == "SHAPE":
+        if not t.shape_dark:
+            return "".join(out)
+        thick = max(1, min(t.w, t.h))
+        if t.shape == "CIRCLE":
+            out.append(f"^FO{t.x},{t.y}^GE{t.w},{t.h},{thick},B^FS")
+        elif t.shape == "RECT":
+            out.append(f"^FO{t.x},{t.y}^GB{t.w},{t.h},{thick},B,0^FS")
+        # TRIANGLE / STAR have no native ZPL primitive; they are left out
+        return "".join(out)
+
+    if not value and not fn:
+        return "".join(out)
+
+    if t.ft == "BARCODE":
+        text_h = min(int(t.h * 0.18), t.font)
+        bar_h = max(1, t.h - text_h - max(1, text_h // 2))
+        module_w, dx = _barcode_fit(value, t.w)
+        out.append(f"^FO{t.x + dx},{t.y}^BY{module_w}^BCN,{bar_h},Y,N,N,A^FH_^FD{zpl_escape(value)}^FS")
+        return "".join(out)
+
+    if t.ft == "QRCODE":
+        mag, dx, dy = _qr_fit(value, t.w, t.h)
+        out.append(f"^FO{t.x + dx},{t.y + dy}^BQN,2,{mag}^FH_^FDMA,{zpl_escape(value)}^FS")
+        return "".join(out)
+
+    x = t.x + t.pad_x
+    y = t.y + t.pad_y
+    inner_w = max(1, t.w - 2 * t.pad_x)
+    bottom = t.y + t.h
+
+    if t.label:
+        lines = len(_text_lines(t.label, t.label_font, inner_w))
+        label_h = int(lines * t.label_font * LINE_HEIGHT)
+        out.append(_zpl_text_block(x, y, inner_w, label_h, t.label_font, t.align, t.label, t.reverse))
+        y += label_h + t.gap
+
+    if y < bottom:
+        out.append(_zpl_text_block(x, y, inner_w, bottom - y, t.font, t.align, value, t.reverse, fn))
+    return "".join(out)
+
+
+def zpl_label(items: List[ThermalItem], rec: LabelRecord, header: str) -> str:
+    body = "".join(zpl_item(t, t.value_for(rec)) for t in items)
+    return f"^XA{header}{body}^XZ\n"
+
+
+def _overlaps(a: ThermalItem, b: ThermalItem) -> bool:
+    return a.x < b.x + b.w and b.x < a.x + a.w and a.y < b.y + b.h and b.y < a.y + a.h
+
+
+def zpl_stored_format(items: List[ThermalItem], header: str) -> Tuple[str, List[Tuple[int, ThermalItem]], List[ThermalItem]]:
+    """
+    Moves everything that does not change shape per label into a ^DF stored format:
+    shapes, static text and text fields (as ^FN placeholders). Barcodes / QR codes are
+    sized to their value, so they stay in the per-label part.
+    Returns (format definition, [(field number, item)], per-label items).
+
+    The format prints before the per-label fields. Everything prints black, so that
+    reordering only shows where a reverse (^FR) field overlaps something it used to be
+    painted after; such items stay per-label.
+    """
+    body = []
+    fields = []
+    rest = []
+    for t in items:
+        if t.ft in ("BARCODE", "QRCODE") or any(
+            (t.reverse or r.reverse) and _overlaps(t, r) for r in rest
+        ):
+            rest.append(t)
+        elif t.ft in ("SHAPE", "STATIC_TEXT"):
+            body.append(zpl_item(t, t.static_value))
+        else:
+            fields.append((len(fields) + 1, t))
+            body.append(zpl_item(t, "", fn=len(fields)))
+
+    definition = f"^XA^DF{ZPL_FORMAT_NAME}^FS{header}{''.join(body)}^XZ\n"
+    return definition, fields, rest
+
+
+def zpl_recall_label(fields: List[Tuple[int, ThermalItem]], rest: List[ThermalItem], rec: LabelRecord) -> str:
+    parts = [f"^XA^XF{ZPL_FORMAT_NAME}^FS"]
+    for fn, t in fields:
+        value = t.value_for(rec)
+        if value:
+            parts.append(f"^FN{fn}^FH_^FD{zpl_escape(value)}^FS")
+    for t in rest:
+        parts.append(zpl_item(t, t.value_for(rec)))
+    parts.append("^XZ\n")
+    return "".join(parts)
+
+
+def zpl_header(w_dots: int, h_dots: int, off_x: int, off_y: int) -> str:
+    # UTF-8 (^CI28), print width, label length, label home (calibration offset)
+    return f"^CI28^PW{w_dots}^LL{h_dots}^LH{off_x},{off_y}"
+
+
+# ------------------------------------------------------------------
+# EPL2
+# ------------------------------------------------------------------
+
+def epl_escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def epl_font(height: int, dpi: int) -> Tuple[str, int, int]:
+    """
+    Closest resident font + multiplier for a target glyph height in dots.
+    Returns (font, multiplier, char width in dots).
+    """
+    scale = dpi / 203.0
+    best = None
+    for font, (cw, ch) in EPL_FONTS.items():
+        for mult in range(1, 9):
+            diff = abs(ch * scale * mult - height)
+            if best is None or diff < best[0]:
+                best = (diff, font, mult, int(cw * scale * mult))
+    _, font, mult, cw = best
+    return font, mult, cw
+
+
+def _epl_text_block(x, y, w, h, font_h, align, text, reverse, dpi) -> List[str]:
+    font, mult, cw = epl_font(font_h, dpi)
+    per_line = max(1, w // max(1, cw))
+    line_h = int(font_h * LINE_HEIGHT)
+    max_lines = max(1, h // max(1, line_h))
+
+    out = []
+    for n, line in enumerate(_wrap(text, per_line)[:max_lines]):
+        lw = len(line) * cw
+        if align == "center":
+            lx = x + max(0, (w - lw) // 2)
+        elif align == "right":
+            lx = x + max(0, w - lw)
+        else:
+            lx = x
+        out.append(f'A{lx},{y + n * line_h},0,{font},{mult},{mult},{"R" if reverse else "N"},"{epl_escape(line)}"')
+    return out
+
+
+def epl_item(t: ThermalItem, value: str, dpi: int) -> List[str]:
+    out = []
+    if t.fill_bg:
+        out.append(f"LO{t.x},{t.y},{t.w},{t.h}")
+
+    if t.ft == "SHAPE":
+        # EPL2 only draws boxes; circles/triangles/stars are left out
+        if t.shape_dark and t.shape == "RECT":
+            out.append(f"LO{t.x},{t.y},{t.w},{t.h}")
+        return out
+
+    if not value:
+        return out
+
+    if t.ft == "BARCODE":
+        text_h = min(int(t.h * 0.18), t.font)
+        bar_h = max(1, t.h - text_h - max(1, text_h // 2))
+        module_w, dx = _barcode_fit(value, t.w)
+        out.append(f'B{t.x + dx},{t.y},0,1,{module_w},{module_w},{bar_h},B,"{epl_escape(value)}"')
+        return out
+
+    if t.ft == "QRCODE":
+        mag, dx, dy = _qr_fit(value, t.w, t.h)
+        out.append(f'b{t.x + dx},{t.y + dy},Q,m2,s{mag},eM,"{epl_escape(value)}"')
+        return out
+
+    x = t.x + t.pad_x
+    y = t.y + t.pad_y
+    inner_w = max(1, t.w - 2 * t.pad_x)
+    bottom = t.y + t.h
+
+    if t.label:
+        label_lines = _epl_text_block(x, y, inner_w, bottom - y, t.label_font, t.align, t.label, t.reverse, dpi)
+        out += label_lines
+        y += int(len(label_lines) * t.label_font * LINE_HEIGHT) + t.gap
+
+    if y < bottom:
+        out += _epl_text_block(x, y, inner_w, bottom - y, t.font, t.align, value, t.reverse, dpi)
+    return out
+
+
+def epl_label(items: List[ThermalItem], rec: LabelRecord, dpi: int) -> str:
+    lines = ["N"]
+    for t in items:
+        lines += epl_item(t, t.value_for(rec), dpi)
+    lines.append("P1")
+    return "\n".join(lines) + "\n"
+
+
+def epl_header(w_dots: int, h_dots: int, gap_dots: int, off_x: int, off_y: int) -> str:
+    # I8,B = UTF-8-ish 8-bit codepage, q = print width, Q = label length + gap, R = reference point
+    return f"\nI8,B\nq{w_dots}\nQ{h_dots},{gap_dots}\nR{off_x},{off_y}\n"
+
+
+# ------------------------------------------------------------------
+# Batch output
+# ------------------------------------------------------------------
+
+def thermal_labels(
+    fmt: str,
+    batch,
+    layout,
+    settings: Dict[str, Any],
+    dpi: int = DEFAULT_DPI,
+    start_index: Optional[int] = None,
+    end_index: Optional[int] = None,
+) -> Tuple[str, Iterator[Tuple[int, str]]]:
+    """
+    (preamble, iterator of (label number, commands)) for a batch. The preamble is the
+    job-level printer setup (EPL) or stored label format (ZPL) that must be resent on
+    every new connection; each ZPL label then only carries its own field data.
+    """
+    dpmm = float(dpi) / 25.4
+    items = compile_items(layout.items_mm, dpi, layout.mm_per_px)
+
+    w_dots = int(round(layout.label_w_mm * dpmm))
+    h_dots = int(round(layout.label_h_mm * dpmm))
+    off_x = int(round(max(0.0, float(settings.get("offset_x_mm") or 0)) * dpmm))
+    off_y = int(round(max(0.0, float(settings.get("offset_y_mm") or 0)) * dpmm))
+
+    records = iter_batch_labels(batch, layout.items_ui, start_index, end_index)
+
+    if fmt == FORMAT_EPL:
+        gap_dots = int(round(max(0.0, float(settings.get("gap_y_mm") or 0)) * dpmm)) or int(round(3 * dpmm))
+        preamble = epl_header(w_dots, h_dots, gap_dots, off_x, off_y)
+        return preamble, ((rec.index, epl_label(items, rec, dpi)) for rec in records)
+
+    preamble, fields, rest = zpl_stored_format(items, zpl_header(w_dots, h_dots, off_x, off_y))
+    return preamble, ((rec.index, zpl_recall_label(fields, rest, rec)) for rec in records)
+
+
+def iter_thermal_job(
+    fmt: str,
+    batch,
+    layout,
+    settings: Dict[str, Any],
+    dpi: int = DEFAULT_DPI,
+    start_index: Optional[int] = None,
+    end_index: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Printer-native commands for a batch, one chunk per label (ROLL stock: one label per
+    "page"). Barcodes/QR use the printer's own ^BC/^BQ (ZPL) or B/b (EPL) symbologies.
+    """
+    preamble, labels = thermal_labels(fmt, batch, layout, settings, dpi, start_index, end_index)
+    if preamble:
+        yield preamble
+    for _, text in labels:
+        yield text
@@ -1,56 +1,76 @@
 import csv
 from io import TextIOWrapper
 import os
+import tempfile
+from django.conf import settings as django_settings
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, FileResponse, StreamingHttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.core.files.storage import default_storage
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils.text import slugify
 from django.db.models import Q
 from django.views.decorators.http import require_POST
 from accounts.models import User
-from .models import Workspace, WorkspaceField, WorkspaceMembership, OrgRoleChangeLog, LabelTemplate, LabelTemplateField, GlobalTemplate, GlobalTemplateField, LabelBatch, LabelBatchItem
+from .models import Workspace, WorkspaceField, WorkspaceMembership, OrgRoleChangeLog, LabelTemplate, LabelTemplateField, GlobalTemplate, GlobalTemplateField, LabelBatch, RenderJob
 from .forms import WorkspaceCreateStep1Form, ManualFieldsForm, LabelTemplateForm, TemplateDuplicateForm, GlobalTemplateForm
 import json
-from .utils.label_codes import make_barcode_png, make_qr_png
+from .utils import code_cache
 from decimal import Decimal
-from .utils.layout_engine import save_layout_to_template, load_layout_from_template, canvas_ui_size, compute_label_engine, ui_to_real, real_to_ui, get_ui_px_per_cm
+from .utils.layout_engine import save_layout_to_template, load_layout_from_template, canvas_ui_size, compute_label_engine, ui_to_real, real_to_ui
+from .utils.compiled_layout import get_compiled_layout
 from django.db import transaction
 import math
 from django.utils.safestring import mark_safe
 from .utils.bulk_import import (
-    build_expected_headers,
     parse_csv_bytes,
-    parse_xlsx_bytes,
+    iter_xlsx_rows,
     make_csv_template_bytes,
     make_xlsx_template_bytes,
     validate_and_normalize_rows,
 )
-from .utils.qr_payload import build_qr_payload
-from django.db.models import Count
-from billing.usage import record_label_generation
+from .utils.pdf_render import render_labels_pdf
+from .utils.batch_index import build_batch_index
+from .utils.batch_ingest import ingest_batch_items
+from .utils.batch_expansion import iter_batch_labels, batch_label_total, label_values, static_values, export_fieldnames, iter_export_rows
+from .utils.csv_stream import iter_csv_chunks, gzip_chunks
+from .utils.render_jobs import enqueue_render_job, SYNC_RENDER_MAX_LABELS, HTML_PRINT_MAX_LABELS
+from .utils.raster_render import RasterLabelRenderer, clamp_dpi
+from .utils.png_zip import iter_label_pngs, iter_png_zip
+from .utils.imposition import PAGE_SIZES, SHEET_PRESETS, apply_sheet_preset, impose
+from .utils.thermal import iter_thermal_job, clamp_thermal_dpi, thermal_format
+from .utils.artifact_cache import (
+    artifact_etag,
+    artifact_key,
+    artifact_last_modified,
+    cached_artifact_path,
+    store_artifact,
+    store_artifact_text,
+)
+from django.db.models import Count, IntegerField, Sum
+from django.db.models.functions import Coalesce
+from billing.usage import LabelLimitExceeded, charge_label_generation, commit_reservation, release_reservation, reserve_labels
 from billing.usage import get_effective_entitlements, get_labels_remaining
 from billing.guards import limit_redirect
 from workspaces.models import Workspace
 
 WIZARD_SESSION_KEY = 'workspace_wizard'
+DEFAULT_BATCH_MAX_QUANTITY = 1_000_000   # labels per batch (LABEL_BATCH_MAX_QUANTITY overrides)
 UI_MAX_SIDE_PX = 700.0  # single source of truth
 
 
-def _org_suffix4(org) -> str:
-    raw = str(getattr(org, "id", "") or "")
-    return raw[-4:].zfill(4)
+# columnar batches keep their rows in LabelBatchColumns, older ones as LabelBatchItems
+BATCH_ROW_COUNT = Coalesce(Sum("columns__row_count"), Count("items"), output_field=IntegerField())
+
 
+def _batch_max_quantity() -> int:
+    return max(1, int(getattr(django_settings, "LABEL_BATCH_MAX_QUANTITY", None) or DEFAULT_BATCH_MAX_QUANTITY))
 
-def _build_barcode_base(org, batch, ean: str, gs1: str) -> str:
-    ean = (ean or "").strip()
-    gs1 = (gs1 or "").strip()
-    org_suffix = _org_suffix4(org)
-    batch_part = str(getattr(batch, "id", "") or "")
-    return f"{ean}{gs1}{org_suffix}{batch_part}"
 
 def _get_print_settings(request, template):
     d = template.print_defaults or {}
@@ -86,15 +106,15 @@ def _get_print_settings(request, template):
         "margin_bottom_mm": max(0.0, f("m_bottom", d.get("margin_bottom_mm", 5))),
         "offset_x_mm": f("off_x", d.get("offset_x_mm", 0)),
         "offset_y_mm": f("off_y", d.get("off_y", d.get("offset_y_mm", 0))),
+        # 0/1 ints (not bools): settings are dropped into the print templates as a JS literal
+        # opt-in, so existing templates keep their grid; sheet presets fix the grid themselves
+        "auto_layout": 1 if i("auto_layout", d.get("auto_layout", 0)) else 0,
+        "allow_rotate": 1 if i("rotate", d.get("allow_rotate", 1)) else 0,
+        "sheet_preset": (request.GET.get("preset", d.get("sheet_preset")) or "").upper(),
     }
-    return settings
+    return apply_sheet_preset(settings)
 
 def _get_page_dimensions_mm(settings):
-    page_sizes = {
-        "A4": {"w": 210.0, "h": 297.0},
-        "LETTER": {"w": 215.9, "h": 279.4},
-    }
-
     if settings["stock_type"] == "ROLL":
         return None, None
 
@@ -102,7 +122,7 @@ def _get_page_dimensions_mm(settings):
         w = settings["custom_w_mm"]
         h = settings["custom_h_mm"]
     else:
-        size = page_sizes.get(settings["page_size"], page_sizes["A4"])
+        size = PAGE_SIZES.get(settings["page_size"], PAGE_SIZES["A4"])
         w, h = size["w"], size["h"]
 
     if settings["orientation"] == "LANDSCAPE":
@@ -113,175 +133,52 @@ def _get_page_dimensions_mm(settings):
 
 def _compute_preview_layout(settings, label_w_mm, label_h_mm):
     if settings["stock_type"] == "ROLL":
-        cols = 1
-        rows = 1
-        per_page = 1
         return {
             "page_w_mm": label_w_mm,
             "page_h_mm": label_h_mm,
-            "cols": cols,
-            "rows": rows,
-            "per_page": per_page,
+            "cols": 1,
+            "rows": 1,
+            "per_page": 1,
+            "rotated": False,
+            "cell_w_mm": label_w_mm,
+            "cell_h_mm": label_h_mm,
+            "utilization": 1.0,
+            "warning": "",
         }
 
     page_w, page_h = _get_page_dimensions_mm(settings)
+    return impose(page_w, page_h, label_w_mm, label_h_mm, settings)
 
-    cols = max(1, int(settings["labels_per_row"]))
-    gx = settings["gap_x_mm"]
-    gy = settings["gap_y_mm"]
-    ml = settings["margin_left_mm"]
-    mt = settings["margin_top_mm"]
-    mr = settings["margin_right_mm"]
-    mb = settings["margin_bottom_mm"]
-    ox = settings["offset_x_mm"]
-    oy = settings["offset_y_mm"]
+def _artifact_conditional(request, etag, last_modified):
+    ts = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=ts)
 
-    avail_w = page_w - ml - mr - ox
-    avail_h = page_h - mt - mb - oy
 
-    rows = math.floor((avail_h + gy) / (label_h_mm + gy))
-    rows = max(1, rows)
+def _artifact_response(resp, etag, last_modified):
+    # cached print artifacts: let browsers revalidate instead of re-downloading
+    resp["ETag"] = etag
+    if last_modified:
+        resp["Last-Modified"] = http_date(last_modified.timestamp())
+    resp["Cache-Control"] = "private, no-cache"
+    return resp
 
-    per_page = max(1, cols * rows)
-
-    return {
-        "page_w_mm": page_w,
-        "page_h_mm": page_h,
-        "cols": cols,
-        "rows": rows,
-        "per_page": per_page,
-    }
 
 def _build_batch_label_payload(batch, items_ui, base_items_mm, start_index=None, end_index=None):
     labels = []
-    is_multi = (batch.mode == LabelBatch.MODE_MULTI)
-
-    barcode_cache = {}
-    qr_cache = {}
-
-    def barcode_img_for(value):
-        if not value:
-            return None
-        if value not in barcode_cache:
-            barcode_cache[value] = make_barcode_png(value)
-        return barcode_cache[value]
-
-    def qr_img_for(value):
-        if not value:
-            return None
-        if value not in qr_cache:
-            qr_cache[value] = make_qr_png(value)
-        return qr_cache[value]
-
-    global_index = 0
-
-    def in_range(idx):
-        if start_index is None and end_index is None:
-            return True
-        return start_index <= idx <= end_index
-
-    if is_multi:
-        rows = list(batch.items.order_by("row_index"))
-
-        sku_totals = {}
-        for row in rows:
-            sku_key = (
-                (row.ean_code or "").strip(),
-                (row.gs1_code or "").strip(),
-            )
-            sku_totals[sku_key] = sku_totals.get(sku_key, 0) + int(getattr(row, "quantity", 1) or 1)
-
-        sku_counters = {}
-
-        for row in rows:
-            row_values = row.field_values or {}
-            ean = (row.ean_code or "").strip()
-            gs1 = (row.gs1_code or "").strip()
-            sku_key = (ean, gs1)
-
-            row_qty = int(getattr(row, "quantity", 1) or 1)
-            total_for_sku = sku_totals.get(sku_key, row_qty)
-            serial_digits = max(3, len(str(total_for_sku)))
-
-            qr_value = build_qr_payload(row.ean_code, row.gs1_code, row_values, items_ui)
-            qr_img = qr_img_for(qr_value)
-
-            barcode_base = _build_barcode_base(batch.workspace.org, batch, ean, gs1)
-
-            for _ in range(row_qty):
-                global_index += 1
-                sku_counters[sku_key] = sku_counters.get(sku_key, 0) + 1
-                serial_num = sku_counters[sku_key]
-                serial = str(serial_num).zfill(serial_digits)
-
-                if not in_range(global_index):
-                    continue
-
-                barcode_value = f"{barcode_base}{serial}" if barcode_base else ""
-                barcode_img = barcode_img_for(barcode_value)
-
-                label_items = []
-                for it in base_items_mm:
-                    out = dict(it)
-                    ft = out["field_type"]
-                    key = (out.get("key") or "").strip()
-
-                    if ft == "BARCODE":
-                        out["value"] = barcode_value
-                        out["image_data_url"] = barcode_img
-                    elif ft == "QRCODE":
-                        out["value"] = qr_value
-                        out["image_data_url"] = qr_img
-                    elif ft == "STATIC_TEXT":
-                        out["value"] = out.get("static_value") or out.get("name") or ""
-                    else:
-                        out["value"] = row_values.get(key, "") if key else ""
 
-                    label_items.append(out)
+    # inline SVG (vector) codes for print; shared LRU + disk cache (code_cache.py)
+    for rec in iter_batch_labels(batch, items_ui, start_index, end_index):
+        label_items = label_values(rec, base_items_mm)
+        for out in label_items:
+            ft = out["field_type"]
+            if ft == "BARCODE":
+                out["svg_markup"] = code_cache.barcode_svg(rec.barcode_value)
+            elif ft == "QRCODE":
+                out["svg_markup"] = code_cache.qr_svg(rec.qr_value)
 
-                labels.append({"index": global_index, "serial": serial, "items": label_items})
-
-    else:
-        user_values = batch.field_values or {}
-        barcode_base = _build_barcode_base(batch.workspace.org, batch, batch.ean_code, batch.gs1_code)
-        qty = int(batch.quantity or 1)
-        serial_digits = max(3, len(str(qty)))
-
-        qr_value = build_qr_payload(batch.ean_code, batch.gs1_code, user_values, items_ui)
-        qr_img = qr_img_for(qr_value)
-
-        for i in range(1, qty + 1):
-            global_index += 1
-            if not in_range(global_index):
-                continue
-
-            serial = str(i).zfill(serial_digits)
-            barcode_value = f"{barcode_base}{serial}" if barcode_base else serial
-            barcode_img = barcode_img_for(barcode_value)
-
-            label_items = []
-            for it in base_items_mm:
-                out = dict(it)
-                ft = out["field_type"]
-                key = (out.get("key") or "").strip()
-
-                if ft == "BARCODE":
-                    out["value"] = barcode_value
-                    out["image_data_url"] = barcode_img
-                elif ft == "QRCODE":
-                    out["value"] = qr_value
-                    out["image_data_url"] = qr_img
-                elif ft == "STATIC_TEXT":
-                    out["value"] = out.get("static_value") or out.get("name") or ""
-                else:
-                    out["value"] = user_values.get(key, "") if key else ""
-
-                label_items.append(out)
-
-            labels.append({"index": global_index, "serial": serial, "items": label_items})
-
-    return labels, global_index
+        labels.append({"index": rec.index, "serial": rec.serial, "items": label_items})
 
+    return labels, batch_label_total(batch)
 
 
 def input_fields_from_items(items):
@@ -1577,7 +1474,7 @@ def label_template_canvas(request, template_id):
     if request.method == "POST":
         canvas_bg_color = (request.POST.get("canvas_bg_color") or "").strip() or "#ffffff"
         template.canvas_bg_color = canvas_bg_color
-        template.save(update_fields=["canvas_bg_color"])
+        template.save(update_fields=["canvas_bg_color", "updated_at"])
 
         raw = (request.POST.get("layout_data") or "").strip()
         if not raw:
@@ -1794,7 +1691,6 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
 from workspaces.utils.layout_engine import load_layout_from_template, canvas_ui_size
-from workspaces.utils.label_codes import make_barcode_png, make_qr_png
 from .models import LabelTemplate
 
 @login_required
@@ -1870,8 +1766,8 @@ def label_template_preview(request, template_id):
     barcode_value = f"{barcode_base}{serial}"
     qr_value = barcode_value
 
-    barcode_img = make_barcode_png(barcode_value)
-    qr_img = make_qr_png(qr_value)
+    barcode_img = code_cache.barcode_png(barcode_value)
+    qr_img = code_cache.qr_png(qr_value)
 
     return render(
         request,
@@ -2354,9 +2250,8 @@ def label_generate_single(request, workspace_id, template_id):
             return redirect("my_workspaces")
 
     # ✅ SINGLE SOURCE OF TRUTH
-    stored = load_layout_from_template(template)
-    meta = stored.get("_meta") or {}
-    items = stored.get("items") or []
+    layout = get_compiled_layout(template)
+    items = layout.items_ui
 
     remaining = get_labels_remaining(workspace.org)  # None => unlimited
     if remaining is not None and remaining <= 0:
@@ -2366,13 +2261,8 @@ def label_generate_single(request, workspace_id, template_id):
         messages.error(request, "No template layout found. Please open Canvas and Save once.")
         return redirect("label_template_canvas", template_id=template.id)
 
-    width_cm = float(template.width_cm or 10)
-    height_cm = float(template.height_cm or 10)
-
-    ui_px_per_cm = float(meta.get("ui_px_per_cm") or get_ui_px_per_cm(width_cm, height_cm))
-    canvas_width, canvas_height = canvas_ui_size(width_cm, height_cm, ui_px_per_cm)
-
-    canvas_bg = (template.canvas_bg_color or "#ffffff").strip() or "#ffffff"
+    canvas_width, canvas_height = canvas_ui_size(layout.width_cm, layout.height_cm, layout.ui_px_per_cm)
+    canvas_bg = layout.canvas_bg
 
     input_fields = input_fields_from_items(items)
 
@@ -2396,8 +2286,9 @@ def label_generate_single(request, workspace_id, template_id):
         errors = []
         if not ean_code:
             errors.append("EAN code is mandatory.")
-        if quantity < 1 or quantity > 2000:
-            errors.append("Quantity must be between 1 and 2000.")
+        max_quantity = _batch_max_quantity()
+        if quantity < 1 or quantity > max_quantity:
+            errors.append(f"Quantity must be between 1 and {max_quantity}.")
 
         remaining = get_labels_remaining(workspace.org)
         if remaining is not None and quantity > remaining:
@@ -2423,6 +2314,7 @@ def label_generate_single(request, workspace_id, template_id):
                     "template": template,
                     "input_fields": input_fields,
                     "quantity": quantity or 1,
+                    "max_quantity": _batch_max_quantity(),
                     "ean_code": ean_code,
                     "has_gs1": has_gs1,
                     "gs1_code": gs1_code,
@@ -2435,17 +2327,22 @@ def label_generate_single(request, workspace_id, template_id):
                 },
             )
 
-        batch = LabelBatch.objects.create(
-            workspace=workspace,
-            template=template,
-            created_by=user,
-            mode=LabelBatch.MODE_SINGLE,
-            ean_code=ean_code,
-            gs1_code=gs1_code,
-            quantity=quantity,
-            field_values=field_values,
-        )
-        record_label_generation(org=workspace.org, qty=int(batch.quantity or 1))
+        # batch + usage charge commit together; the charge re-checks the limit atomically
+        try:
+            with transaction.atomic():
+                batch = LabelBatch.objects.create(
+                    workspace=workspace,
+                    template=template,
+                    created_by=user,
+                    mode=LabelBatch.MODE_SINGLE,
+                    ean_code=ean_code,
+                    gs1_code=gs1_code,
+                    quantity=quantity,
+                    field_values=field_values,
+                )
+                charge_label_generation(org=workspace.org, qty=int(batch.quantity or 1), batch=batch)
+        except LabelLimitExceeded as e:
+            return limit_redirect(request, workspace.org, str(e))
 
         messages.success(request, "Label batch created.")
         return redirect("label_generate_single_preview", workspace_id=workspace.id, batch_id=batch.id)
@@ -2458,6 +2355,7 @@ def label_generate_single(request, workspace_id, template_id):
             "template": template,
             "input_fields": input_fields,
             "quantity": quantity,
+            "max_quantity": _batch_max_quantity(),
             "ean_code": ean_code,
             "has_gs1": has_gs1,
             "gs1_code": gs1_code,
@@ -2483,92 +2381,27 @@ def label_generate_single_preview(request, workspace_id, batch_id):
     batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
     template = batch.template
 
-    stored = load_layout_from_template(template)
-    meta = stored.get("_meta") or {}
-    items = stored.get("items") or []
-
-    width_cm = float(template.width_cm or 10)
-    height_cm = float(template.height_cm or 10)
-    ui_px_per_cm = float(meta.get("ui_px_per_cm") or get_ui_px_per_cm(width_cm, height_cm))
-    canvas_width, canvas_height = canvas_ui_size(width_cm, height_cm, ui_px_per_cm)
-
-    canvas_bg = (template.canvas_bg_color or "#ffffff").strip() or "#ffffff"
+    layout = get_compiled_layout(template)
+    canvas_width, canvas_height = canvas_ui_size(layout.width_cm, layout.height_cm, layout.ui_px_per_cm)
+    canvas_bg = layout.canvas_bg
 
     # ----------------------------
-    # Pick the preview "row"
+    # Preview = label #1 of the batch (same expansion as print/export)
     # ----------------------------
-    user_values = {}
-    ean = ""
-    gs1 = ""
-    serial = "001"
-
-    if batch.mode == LabelBatch.MODE_MULTI:
-        first = batch.items.order_by("row_index").first()
-        if not first:
-            messages.error(request, "This bulk batch has no rows.")
-            return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
-
-        user_values = first.field_values or {}
-        ean = (first.ean_code or "").strip()
-        gs1 = (first.gs1_code or "").strip()
-
-        # serial based on row_index if present (keeps preview aligned with print)
-        try:
-            row_qty = int(getattr(first, "quantity", 1) or 1)
-        except Exception:
-            row_qty = 1
-
-        serial_digits = max(3, len(str(row_qty)))
-        serial = str(1).zfill(serial_digits)  # always first label of that SKU row
-
-    else:
-        user_values = batch.field_values or {}
-        ean = (batch.ean_code or "").strip()
-        gs1 = (batch.gs1_code or "").strip()
-        serial = "001"
-
-    # ✅ IMPORTANT: base must come from the chosen data (row or batch)
-    barcode_base = _build_barcode_base(workspace.org, batch, ean, gs1)
-
-    # If you want serial always appended (like print), keep this:
-    barcode_value = f"{barcode_base}{serial}" if barcode_base else ""
-    qr_value = build_qr_payload(ean, gs1, user_values, items)
-
-    barcode_img = make_barcode_png(barcode_value) if barcode_value else None
-    qr_img = make_qr_png(qr_value) if qr_value else None
-
-    def norm_align(v):
-        v = (v or "left").lower()
-        return v if v in ("left", "center", "right") else "left"
+    first = next(iter_batch_labels(batch, layout.items_ui, 1, 1), None)
+    if first is None:
+        messages.error(request, "This bulk batch has no rows.")
+        return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
 
-    render_items = []
-    for it in items:
-        ft = (it.get("field_type") or "TEXT").upper()
-        key = (it.get("key") or "").strip()
-
-        out = dict(it)
+    barcode_img = code_cache.barcode_png(first.barcode_value)
+    qr_img = code_cache.qr_png(first.qr_value)
 
-        # normalize for renderer stability
-        out["field_type"] = ft
-        out["text_align"] = norm_align(out.get("text_align"))
-        out["show_label"] = bool(out.get("show_label", True))
-        out["bg_color"] = (out.get("bg_color") or "transparent").strip() or "transparent"
-        out["text_color"] = (out.get("text_color") or "#000000").strip() or "#000000"
-        out["font_family"] = (out.get("font_family") or "Inter").strip() or "Inter"
-        out["font_size"] = int(out.get("font_size") or 14)
-
-        if ft == "BARCODE":
-            out["value"] = barcode_value
+    render_items = label_values(first, layout.items_norm)
+    for out in render_items:
+        if out["field_type"] == "BARCODE":
             out["image_data_url"] = barcode_img
-        elif ft == "QRCODE":
-            out["value"] = qr_value
+        elif out["field_type"] == "QRCODE":
             out["image_data_url"] = qr_img
-        elif ft == "STATIC_TEXT":
-            out["value"] = out.get("static_value") or out.get("name") or ""
-        else:
-            out["value"] = user_values.get(key, "") if key else ""
-
-        render_items.append(out)
 
     return render(
         request,
@@ -2598,7 +2431,7 @@ def label_batch_history(request, workspace_id):
         LabelBatch.objects
         .filter(workspace=workspace)
         .select_related("template", "created_by")
-        .annotate(row_count=Count("items"))   # <-- LabelBatchItem related_name="items"
+        .annotate(row_count=BATCH_ROW_COUNT)
         .order_by("-created_at")
     )
 
@@ -2624,61 +2457,18 @@ def label_batch_print(request, workspace_id, batch_id):
     batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
     template = batch.template
 
-    stored = load_layout_from_template(template)
-    meta = stored.get("_meta") or {}
-    items_ui = stored.get("items") or []
-
-    width_cm = float(template.width_cm or 10)
-    height_cm = float(template.height_cm or 10)
-
-    ui_px_per_cm = float(meta.get("ui_px_per_cm") or get_ui_px_per_cm(width_cm, height_cm))
-    mm_per_px = 10.0 / float(ui_px_per_cm or 1.0)
-
-    label_w_mm = width_cm * 10.0
-    label_h_mm = height_cm * 10.0
-    canvas_bg = (template.canvas_bg_color or "#ffffff").strip() or "#ffffff"
-
-    def norm_align(v):
-        v = (v or "left").lower()
-        return v if v in ("left", "center", "right") else "left"
-
-    def item_to_mm(it):
-        ft = (it.get("field_type") or "TEXT").upper()
-        out = dict(it)
-        out["field_type"] = ft
-
-        out["x_mm"] = float(out.get("x") or 0) * mm_per_px
-        out["y_mm"] = float(out.get("y") or 0) * mm_per_px
-        out["w_mm"] = max(0.1, float(out.get("width") or 1) * mm_per_px)
-        out["h_mm"] = max(0.1, float(out.get("height") or 1) * mm_per_px)
-
-        out["z_index"] = int(out.get("z_index") or 0)
-        out["font_family"] = (out.get("font_family") or "Inter").strip() or "Inter"
-        fs_px = float(out.get("font_size") or 14)
-        out["font_size_mm"] = max(0.5, fs_px * mm_per_px)
-        out["font_bold"] = bool(out.get("font_bold"))
-        out["font_italic"] = bool(out.get("font_italic"))
-        out["font_underline"] = bool(out.get("font_underline"))
-        out["text_align"] = norm_align(out.get("text_align"))
-        out["text_color"] = (out.get("text_color") or "#000000").strip() or "#000000"
-        out["bg_color"] = (out.get("bg_color") or "transparent").strip() or "transparent"
-        out["show_label"] = bool(out.get("show_label", True))
-        out["shape_type"] = (out.get("shape_type") or "RECT").upper()
-        out["shape_color"] = (out.get("shape_color") or "#000000").strip() or "#000000"
-
-        return out
-
-    base_items_mm = [item_to_mm(it) for it in items_ui]
+    layout = get_compiled_layout(template)
+    items_ui = layout.items_ui
+    base_items_mm = layout.items_mm
+    mm_per_px = layout.mm_per_px
+    label_w_mm = layout.label_w_mm
+    label_h_mm = layout.label_h_mm
+    canvas_bg = layout.canvas_bg
 
     settings = _get_print_settings(request, template)
     layout_info = _compute_preview_layout(settings, label_w_mm, label_h_mm)
 
-    if batch.mode == LabelBatch.MODE_MULTI:
-        total_labels = sum(int(getattr(r, "quantity", 1) or 1) for r in batch.items.all())
-    else:
-        total_labels = int(batch.quantity or 1)
-
-    total_labels = max(1, total_labels)
+    total_labels = max(1, batch_label_total(batch))
 
     preview_page = max(1, int(request.GET.get("preview_page", 1) or 1))
     per_page = max(1, int(layout_info["per_page"] or 1))
@@ -2696,11 +2486,6 @@ def label_batch_print(request, workspace_id, batch_id):
         end_index=end_index,
     )
 
-    page_sizes = {
-        "A4": {"w": 210.0, "h": 297.0},
-        "LETTER": {"w": 215.9, "h": 279.4},
-    }
-
     return render(
         request,
         "workspaces/label_batch_print.html",
@@ -2714,7 +2499,8 @@ def label_batch_print(request, workspace_id, batch_id):
             "mm_per_px": mm_per_px,
             "labels": labels,
             "defaults": settings,
-            "page_sizes_json": mark_safe(json.dumps(page_sizes)),
+            "page_sizes_json": mark_safe(json.dumps(PAGE_SIZES)),
+            "sheet_presets": sorted(SHEET_PRESETS.items(), key=lambda kv: kv[1]["title"]),
 
             # preview pagination
             "preview_page": preview_page,
@@ -2724,12 +2510,15 @@ def label_batch_print(request, workspace_id, batch_id):
             "page_label_count": len(labels),
             "start_index": start_index,
             "end_index": end_index,
+            "use_render_job": total_labels > SYNC_RENDER_MAX_LABELS,
+            "use_html_print": total_labels <= HTML_PRINT_MAX_LABELS,
 
             # computed layout for current settings
             "page_w_mm": layout_info["page_w_mm"],
             "page_h_mm": layout_info["page_h_mm"],
             "grid_cols": layout_info["cols"],
             "grid_rows": layout_info["rows"],
+            "layout_json": mark_safe(json.dumps(layout_info)),
         },
     )
 
@@ -2746,69 +2535,47 @@ def label_batch_print_full(request, workspace_id, batch_id):
     batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
     template = batch.template
 
-    stored = load_layout_from_template(template)
-    meta = stored.get("_meta") or {}
-    items_ui = stored.get("items") or []
-
-    width_cm = float(template.width_cm or 10)
-    height_cm = float(template.height_cm or 10)
-
-    ui_px_per_cm = float(meta.get("ui_px_per_cm") or get_ui_px_per_cm(width_cm, height_cm))
-    mm_per_px = 10.0 / float(ui_px_per_cm or 1.0)
-
-    label_w_mm = width_cm * 10.0
-    label_h_mm = height_cm * 10.0
-    canvas_bg = (template.canvas_bg_color or "#ffffff").strip() or "#ffffff"
+    layout = get_compiled_layout(template)
+    items_ui = layout.items_ui
+    mm_per_px = layout.mm_per_px
+    label_w_mm = layout.label_w_mm
+    label_h_mm = layout.label_h_mm
+    canvas_bg = layout.canvas_bg
+    settings = _get_print_settings(request, template)
 
-    def norm_align(v):
-        v = (v or "left").lower()
-        return v if v in ("left", "center", "right") else "left"
+    # one DOM node per label: past this the browser stalls, the print page uses the PDF instead
+    if batch_label_total(batch) > HTML_PRINT_MAX_LABELS:
+        messages.info(request, f"Batches over {HTML_PRINT_MAX_LABELS} labels print from the PDF download.")
+        return redirect(reverse("label_batch_print", args=[workspace.id, batch.id]) + "?" + request.GET.urlencode())
+
+    # rendered pages are cached per (batch, template version, print settings)
+    cache_key = artifact_key(batch, "html", settings)
+    etag = artifact_etag(cache_key)
+    last_modified = artifact_last_modified(batch)
+
+    not_modified = _artifact_conditional(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    cached_path = cached_artifact_path(batch, cache_key, "html")
+    if cached_path:
+        return _artifact_response(
+            FileResponse(open(cached_path, "rb"), content_type="text/html; charset=utf-8"),
+            etag, last_modified,
+        )
 
-    def item_to_mm(it):
-        ft = (it.get("field_type") or "TEXT").upper()
-        out = dict(it)
-        out["field_type"] = ft
-
-        out["x_mm"] = float(out.get("x") or 0) * mm_per_px
-        out["y_mm"] = float(out.get("y") or 0) * mm_per_px
-        out["w_mm"] = max(0.1, float(out.get("width") or 1) * mm_per_px)
-        out["h_mm"] = max(0.1, float(out.get("height") or 1) * mm_per_px)
-
-        out["z_index"] = int(out.get("z_index") or 0)
-        out["font_family"] = (out.get("font_family") or "Inter").strip() or "Inter"
-        fs_px = float(out.get("font_size") or 14)
-        out["font_size_mm"] = max(0.5, fs_px * mm_per_px)
-        out["font_bold"] = bool(out.get("font_bold"))
-        out["font_italic"] = bool(out.get("font_italic"))
-        out["font_underline"] = bool(out.get("font_underline"))
-        out["text_align"] = norm_align(out.get("text_align"))
-        out["text_color"] = (out.get("text_color") or "#000000").strip() or "#000000"
-        out["bg_color"] = (out.get("bg_color") or "transparent").strip() or "transparent"
-        out["show_label"] = bool(out.get("show_label", True))
-        out["shape_type"] = (out.get("shape_type") or "RECT").upper()
-        out["shape_color"] = (out.get("shape_color") or "#000000").strip() or "#000000"
-
-        return out
-
-    base_items_mm = [item_to_mm(it) for it in items_ui]
-    settings = _get_print_settings(request, template)
     layout_info = _compute_preview_layout(settings, label_w_mm, label_h_mm)
 
+    # static layer (background shapes / static text) is emitted once and cloned client-side
     labels, total_labels = _build_batch_label_payload(
         batch=batch,
         items_ui=items_ui,
-        base_items_mm=base_items_mm,
+        base_items_mm=layout.dynamic_mm,
         start_index=None,
         end_index=None,
     )
 
-    page_sizes = {
-        "A4": {"w": 210.0, "h": 297.0},
-        "LETTER": {"w": 215.9, "h": 279.4},
-    }
-
-    return render(
-        request,
+    html = render_to_string(
         "workspaces/label_batch_print_full.html",
         {
             "workspace": workspace,
@@ -2819,8 +2586,9 @@ def label_batch_print_full(request, workspace_id, batch_id):
             "label_h_mm": label_h_mm,
             "mm_per_px": mm_per_px,
             "labels": labels,
+            "static_items": static_values(layout.static_mm),
             "defaults": settings,
-            "page_sizes_json": mark_safe(json.dumps(page_sizes)),
+            "page_sizes_json": mark_safe(json.dumps(PAGE_SIZES)),
             "total_labels": total_labels,
 
             # computed layout for current settings
@@ -2828,15 +2596,21 @@ def label_batch_print_full(request, workspace_id, batch_id):
             "page_h_mm": layout_info["page_h_mm"],
             "grid_cols": layout_info["cols"],
             "grid_rows": layout_info["rows"],
+            "layout_json": mark_safe(json.dumps(layout_info)),
 
             "auto_print": True,
         },
+        request=request,
     )
+    store_artifact_text(batch, cache_key, "html", html)
 
-
+    return _artifact_response(HttpResponse(html), etag, last_modified)
 
 @login_required
-def label_batch_export_csv(request, workspace_id, batch_id):
+def label_batch_print_pdf(request, workspace_id, batch_id):
+    """
+    Server-side vector PDF of the whole batch (same print settings as label_batch_print_full).
+    """
     user = request.user
     workspace = get_object_or_404(Workspace, id=workspace_id)
     org = workspace.org
@@ -2848,161 +2622,314 @@ def label_batch_export_csv(request, workspace_id, batch_id):
     batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
     template = batch.template
 
-    # Layout (single source of truth for what fields exist)
-    stored = load_layout_from_template(template)
-    items = stored.get("items") or []
+    layout = get_compiled_layout(template)
+    items_ui = layout.items_ui
+    mm_per_px = layout.mm_per_px
+    label_w_mm = layout.label_w_mm
+    label_h_mm = layout.label_h_mm
+    canvas_bg = layout.canvas_bg
+    settings = _get_print_settings(request, template)
 
-    # Variable columns (exclude shapes/static/barcode/qr/serial etc)
-    # Your helper now includes QUANTITY, EAN_CODE, GS1_CODE etc — but for export we’ll build a nicer sheet.
-    _, var_keys = build_expected_headers(items)
+    disposition = "attachment" if request.GET.get("download") == "1" else "inline"
+    filename = f"label_batch_{batch.id}.pdf"
 
-    # Determine if barcode/qr exist in template
-    has_barcode = any((it.get("field_type") or "").upper() == "BARCODE" for it in items)
-    has_qr = any((it.get("field_type") or "").upper() == "QRCODE" for it in items)
+    cache_key = artifact_key(batch, "pdf", settings)
+    etag = artifact_etag(cache_key)
+    last_modified = artifact_last_modified(batch)
 
-    # Build a stable mapping key -> display name (prefer item.name)
-    key_to_name = {}
-    for it in items:
-        k = (it.get("key") or "").strip()
-        ft = (it.get("field_type") or "").upper()
-        if not k:
-            continue
-        # only map user-input keys
-        if ft in ("SHAPE", "STATIC_TEXT", "BARCODE", "QRCODE", "SERIAL"):
-            continue
-        key_to_name[k] = (it.get("name") or k).strip() or k
-
-    # Variable columns in template order
-    var_cols = [key_to_name.get(k, k) for k in var_keys]
-
-    # CSV headers
-    # We export one row per printed label so history export stays useful for BOTH modes.
-    fieldnames = [
-        "Label Index",
-        "Row Index",
-        "Row Quantity",
-        "Row Serial",
-        "EAN Code",
-        "GS1 Code",
-    ]
-    if has_barcode:
-        fieldnames.append("Barcode Encoded")
-    if has_qr:
-        fieldnames.append("QR Encoded")
-
-    fieldnames += var_cols
-
-    rows = []
-
-    def serial_digits_for(n: int) -> int:
-        return max(3, len(str(max(1, int(n or 1)))))
-
-    if batch.mode == LabelBatch.MODE_MULTI:
-        label_index_global = 0
-        rows_qs = list(batch.items.order_by("row_index"))
-
-        sku_totals = {}
-        for row in rows_qs:
-            sku_key = (
-                (row.ean_code or "").strip(),
-                (row.gs1_code or "").strip(),
-            )
-            sku_totals[sku_key] = sku_totals.get(sku_key, 0) + int(getattr(row, "quantity", 1) or 1)
+    not_modified = _artifact_conditional(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
 
-        sku_counters = {}
+    cached_path = cached_artifact_path(batch, cache_key, "pdf")
+    if cached_path:
+        resp = FileResponse(open(cached_path, "rb"), content_type="application/pdf")
+        resp["Content-Disposition"] = f'{disposition}; filename="{filename}"'
+        return _artifact_response(resp, etag, last_modified)
 
-        for row in rows_qs:
-            row_i = int(getattr(row, "row_index", 1) or 1)
-            row_qty = int(getattr(row, "quantity", 1) or 1)
-            row_qty = max(1, row_qty)
+    if batch_label_total(batch) > SYNC_RENDER_MAX_LABELS:
+        messages.info(request, f"Batches over {SYNC_RENDER_MAX_LABELS} labels are rendered in the background; use Download PDF on the print page.")
+        return redirect(reverse("label_batch_print", args=[workspace.id, batch.id]) + "?" + request.GET.urlencode())
 
-            ean = (row.ean_code or "").strip()
-            gs1 = (row.gs1_code or "").strip()
-            sku_key = (ean, gs1)
+    layout_info = _compute_preview_layout(settings, label_w_mm, label_h_mm)
 
-            fv = row.field_values or {}
+    # barcodes/QR are drawn as vectors by the PDF renderer; labels are expanded lazily and
+    # only carry their per-label items (the static layer is drawn once)
+    labels = (
+        {"index": rec.index, "serial": rec.serial, "items": label_values(rec, layout.dynamic_mm)}
+        for rec in iter_batch_labels(batch, items_ui)
+    )
 
-            total_for_sku = sku_totals.get(sku_key, row_qty)
-            sd = max(3, len(str(total_for_sku)))
+    out = tempfile.TemporaryFile()
+    render_labels_pdf(
+        out,
+        labels,
+        settings=settings,
+        layout_info=layout_info,
+        label_w_mm=label_w_mm,
+        label_h_mm=label_h_mm,
+        canvas_bg=canvas_bg,
+        mm_per_px=mm_per_px,
+        static_items=static_values(layout.static_mm),
+        title=f"Label batch #{batch.id}",
+    )
+    out.seek(0)
 
-            barcode_base = _build_barcode_base(workspace.org, batch, ean, gs1)
+    cached_path = store_artifact(batch, cache_key, "pdf", out)
+    if cached_path:
+        out.close()
+        out = open(cached_path, "rb")
+    else:
+        out.seek(0)
 
-            for _ in range(row_qty):
-                label_index_global += 1
-                sku_counters[sku_key] = sku_counters.get(sku_key, 0) + 1
-                serial_num = sku_counters[sku_key]
-                row_serial = str(serial_num).zfill(sd)
+    resp = FileResponse(out, content_type="application/pdf")
+    resp["Content-Disposition"] = f'{disposition}; filename="{filename}"'
+    return _artifact_response(resp, etag, last_modified)
 
-                barcode_value = f"{barcode_base}{row_serial}" if barcode_base else ""
-                qr_value = barcode_value
 
-                out = {
-                    "Label Index": label_index_global,
-                    "Row Index": row_i,
-                    "Row Quantity": row_qty,
-                    "Row Serial": row_serial,
-                    "EAN Code": ean,
-                    "GS1 Code": gs1,
-                }
 
-                if has_barcode:
-                    out["Barcode Encoded"] = barcode_value
-                if has_qr:
-                    out["QR Encoded"] = qr_value
+@login_required
+def label_batch_print_thermal(request, workspace_id, batch_id):
+    """
+    Printer-native ZPL (default) or EPL for ROLL stock: ?format=zpl|epl&dpi=203.
+    Uses the printer's own barcode/QR commands instead of images.
+    """
+    user = request.user
+    workspace = get_object_or_404(Workspace, id=workspace_id)
+    org = workspace.org
 
-                for k in var_keys:
-                    col = key_to_name.get(k, k)
-                    out[col] = (fv.get(k, "") or "")
+    if not user.org or user.org != org:
+        messages.error(request, "You are not linked to this organisation.")
+        return redirect("dashboard")
 
-                rows.append(out)
+    batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
+    template = batch.template
+
+    fmt = thermal_format(request.GET.get("format"))
+    dpi = clamp_thermal_dpi(request.GET.get("dpi"), template.dpi)
 
+    layout = get_compiled_layout(template)
+    settings = _get_print_settings(request, template)
+
+    ext = fmt.lower()
+    filename = f"label_batch_{batch.id}.{ext}"
+
+    cache_key = artifact_key(batch, ext, dict(settings, dpi=dpi))
+    etag = artifact_etag(cache_key)
+    last_modified = artifact_last_modified(batch)
+
+    not_modified = _artifact_conditional(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    cached_path = cached_artifact_path(batch, cache_key, ext)
+    if cached_path:
+        out = open(cached_path, "rb")
     else:
-        # SINGLE: expand by batch.quantity
-        qty = int(batch.quantity or 1)
-        qty = max(1, qty)
+        # the whole job is built before the first byte goes out: big batches use the worker
+        if batch_label_total(batch) > SYNC_RENDER_MAX_LABELS:
+            messages.info(request, f"Batches over {SYNC_RENDER_MAX_LABELS} labels are rendered in the background; use {fmt} on the print page.")
+            return redirect(reverse("label_batch_print", args=[workspace.id, batch.id]) + "?" + request.GET.urlencode())
+
+        out = tempfile.TemporaryFile()
+        for chunk in iter_thermal_job(fmt, batch, layout, settings, dpi=dpi):
+            out.write(chunk.encode("utf-8"))
+        out.seek(0)
+
+        cached_path = store_artifact(batch, cache_key, ext, out)
+        if cached_path:
+            out.close()
+            out = open(cached_path, "rb")
+        else:
+            out.seek(0)
 
-        ean = (batch.ean_code or "").strip()
-        gs1 = (batch.gs1_code or "").strip()
-        barcode_base = _build_barcode_base(workspace.org, batch, ean, gs1)
+    resp = FileResponse(out, content_type="text/plain; charset=utf-8")
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return _artifact_response(resp, etag, last_modified)
 
-        fv = batch.field_values or {}
 
-        sd = serial_digits_for(qty)
+@login_required
+def label_batch_label_png(request, workspace_id, batch_id):
+    """
+    One label as a PNG at the template DPI: ?index=N (1-based label number, default 1),
+    ?dpi= to override, ?download=1 for an attachment.
+    """
+    user = request.user
+    workspace = get_object_or_404(Workspace, id=workspace_id)
+    org = workspace.org
 
-        for i in range(1, qty + 1):
-            row_serial = str(i).zfill(sd)
+    if not user.org or user.org != org:
+        messages.error(request, "You are not linked to this organisation.")
+        return redirect("dashboard")
 
-            barcode_value = f"{barcode_base}{row_serial}" if barcode_base else ""
-            qr_value = barcode_value
+    batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
+    template = batch.template
+    layout = get_compiled_layout(template)
 
-            out = {
-                "Label Index": i,
-                "Row Index": 1,
-                "Row Quantity": qty,
-                "Row Serial": row_serial,
-                "EAN Code": ean,
-                "GS1 Code": gs1,
-            }
+    try:
+        index = int(request.GET.get("index") or 1)
+    except ValueError:
+        index = 1
+    index = min(max(1, index), max(1, batch_label_total(batch)))
 
-            if has_barcode:
-                out["Barcode Encoded"] = barcode_value
-            if has_qr:
-                out["QR Encoded"] = qr_value
+    rec = next(iter_batch_labels(batch, layout.items_ui, index, index), None)
+    if rec is None:
+        raise Http404("Label not found in this batch.")
 
-            for k in var_keys:
-                col = key_to_name.get(k, k)
-                out[col] = (fv.get(k, "") or "")
+    renderer = RasterLabelRenderer(layout, clamp_dpi(request.GET.get("dpi"), template.dpi))
+
+    disposition = "attachment" if request.GET.get("download") == "1" else "inline"
+    resp = HttpResponse(renderer.png(rec), content_type="image/png")
+    resp["Content-Disposition"] = f'{disposition}; filename="label_batch_{batch.id}_{index}.png"'
+    return resp
 
-            rows.append(out)
 
-    response = HttpResponse(content_type="text/csv; charset=utf-8")
-    response["Content-Disposition"] = f'attachment; filename="label_batch_{batch.id}.csv"'
+@login_required
+def label_batch_export_png_zip(request, workspace_id, batch_id):
+    """
+    Every label of the batch as its own PNG (template DPI, ?dpi= to override), streamed
+    as a ZIP. Only small batches render here (one process); larger ones go through a
+    PNG_ZIP RenderJob from the print page.
+    """
+    user = request.user
+    workspace = get_object_or_404(Workspace, id=workspace_id)
+    org = workspace.org
 
-    writer = csv.DictWriter(response, fieldnames=fieldnames)
-    writer.writeheader()
-    for r in rows:
-        writer.writerow(r)
+    if not user.org or user.org != org:
+        messages.error(request, "You are not linked to this organisation.")
+        return redirect("dashboard")
 
+    batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
+    total = batch_label_total(batch)
+    if total <= 0:
+        raise Http404("This batch has no labels.")
+
+    if total > SYNC_RENDER_MAX_LABELS:
+        messages.info(request, f"Batches over {SYNC_RENDER_MAX_LABELS} labels are rendered in the background; use PNG ZIP on the print page.")
+        return redirect(reverse("label_batch_print", args=[workspace.id, batch.id]) + "?" + request.GET.urlencode())
+
+    dpi = clamp_dpi(request.GET.get("dpi"), batch.template.dpi)
+    pngs = iter_label_pngs(batch, total, dpi)
+    response = StreamingHttpResponse(iter_png_zip(pngs), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="label_batch_{batch.id}_png.zip"'
+    return response
+
+
+@login_required
+@require_POST
+def label_batch_render_job_create(request, workspace_id, batch_id):
+    """
+    Queue a background PDF/CSV/TIFF/PNG ZIP/ZPL/EPL render (picked up by `manage.py render_worker`).
+    Print settings come from the query string, like label_batch_print_pdf.
+    """
+    user = request.user
+    workspace = get_object_or_404(Workspace, id=workspace_id)
+    org = workspace.org
+
+    if not user.org or user.org != org:
+        return JsonResponse({"ok": False, "error": "Unauthorized"}, status=403)
+
+    batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
+    template = batch.template
+
+    kind = (request.POST.get("kind") or RenderJob.KIND_PDF).upper()
+    if kind not in dict(RenderJob.KIND_CHOICES):
+        return JsonResponse({"ok": False, "error": "Unknown job kind"}, status=400)
+
+    layout = get_compiled_layout(template)
+    settings = _get_print_settings(request, template)
+    params = {
+        "settings": settings,
+        "layout_info": _compute_preview_layout(settings, layout.label_w_mm, layout.label_h_mm),
+    }
+    if (request.POST.get("compress") or "").lower() == "gzip":
+        params["compress"] = "gzip"
+    if kind in (RenderJob.KIND_TIFF, RenderJob.KIND_PNG_ZIP):
+        params["dpi"] = clamp_dpi(request.POST.get("dpi"), template.dpi)
+    if kind == RenderJob.KIND_THERMAL:
+        params["format"] = thermal_format(request.POST.get("format"))
+        params["dpi"] = clamp_thermal_dpi(request.POST.get("dpi"), template.dpi)
+
+    job = enqueue_render_job(batch, kind, params, user=user)
+    return JsonResponse(_render_job_payload(job), status=202)
+
+
+def _render_job_payload(job):
+    data = {
+        "ok": True,
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "done": job.progress_done,
+        "total": job.progress_total,
+        "percent": job.percent,
+        "error": job.error,
+        "status_url": reverse("render_job_status", args=[job.id]),
+        "download_url": None,
+    }
+    if job.status == RenderJob.STATUS_DONE and job.artifact:
+        data["download_url"] = reverse("render_job_download", args=[job.id])
+    return data
+
+
+def _get_user_render_job(request, job_id):
+    job = get_object_or_404(RenderJob.objects.select_related("batch__workspace"), id=job_id)
+    user = request.user
+    if not user.org or user.org_id != job.batch.workspace.org_id:
+        return None
+    return job
+
+
+@login_required
+def render_job_status(request, job_id):
+    job = _get_user_render_job(request, job_id)
+    if job is None:
+        return JsonResponse({"ok": False, "error": "Unauthorized"}, status=403)
+    return JsonResponse(_render_job_payload(job))
+
+
+@login_required
+def render_job_download(request, job_id):
+    job = _get_user_render_job(request, job_id)
+    if job is None:
+        messages.error(request, "You are not linked to this organisation.")
+        return redirect("dashboard")
+
+    if job.status != RenderJob.STATUS_DONE or not job.artifact:
+        return JsonResponse({"ok": False, "error": "Job is not finished yet"}, status=409)
+
+    name = os.path.basename(job.artifact.name)
+    return FileResponse(job.artifact.open("rb"), as_attachment=True, filename=name)
+
+
+@login_required
+def label_batch_export_csv(request, workspace_id, batch_id):
+    user = request.user
+    workspace = get_object_or_404(Workspace, id=workspace_id)
+    org = workspace.org
+
+    if not user.org or user.org != org:
+        messages.error(request, "You are not linked to this organisation.")
+        return redirect("dashboard")
+
+    batch = get_object_or_404(LabelBatch, id=batch_id, workspace=workspace)
+    template = batch.template
+
+    # one CSV row per printed label, streamed from the shared expansion engine
+    layout = get_compiled_layout(template)
+    fieldnames = export_fieldnames(layout)
+    rows = iter_export_rows(batch, layout)
+
+    chunks = iter_csv_chunks(fieldnames, rows)
+    filename = f"label_batch_{batch.id}.csv"
+
+    if (request.GET.get("compress") or "").lower() == "gzip":
+        response = StreamingHttpResponse(gzip_chunks(chunks), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type="text/csv; charset=utf-8")
+
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -3018,9 +2945,7 @@ def label_generate_multi_export_template(request, workspace_id, template_id):
     
     template = get_object_or_404(LabelTemplate, id=template_id, workspace=workspace)
 
-    stored = load_layout_from_template(template)
-    items = stored.get("items") or []
-    headers, _ = build_expected_headers(items)
+    headers = get_compiled_layout(template).headers
 
     fmt = (request.GET.get("format") or "csv").lower().strip()
 
@@ -3058,9 +2983,8 @@ def label_generate_multi(request, workspace_id, template_id):
     if remaining is not None and remaining <= 0:
         return limit_redirect(request, workspace.org, "No labels left. Please upgrade to generate more labels.")
     
-    stored = load_layout_from_template(template)
-    items = stored.get("items") or []
-    headers, var_keys = build_expected_headers(items)
+    layout = get_compiled_layout(template)
+    headers, var_keys = layout.headers, layout.var_keys
 
 
     if request.method == "POST":
@@ -3069,19 +2993,21 @@ def label_generate_multi(request, workspace_id, template_id):
             messages.error(request, "Please upload a CSV or XLSX file.")
             return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
 
-        content = f.read()
         name = (f.name or "").lower()
 
+        # XLSX rows are streamed straight from the upload and validated as they are read,
+        # so read errors can surface mid-validation too.
         try:
             if name.endswith(".xlsx"):
-                file_headers, rows = parse_xlsx_bytes(content)
+                file_headers, rows = iter_xlsx_rows(f)
             else:
-                file_headers, rows = parse_csv_bytes(content)
+                file_headers, rows = parse_csv_bytes(f.read())
+
+            normalized_rows, errors = validate_and_normalize_rows(headers, var_keys, file_headers, rows)
         except Exception:
             messages.error(request, "Could not read the file. Please upload a valid CSV/XLSX.")
             return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
 
-        normalized_rows, errors = validate_and_normalize_rows(headers, var_keys, file_headers, rows)
         if errors:
             for e in errors[:10]:
                 messages.error(request, e)
@@ -3089,42 +3015,45 @@ def label_generate_multi(request, workspace_id, template_id):
                 messages.error(request, f"...and {len(errors)-10} more issues.")
             return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
 
-        # Create MULTI batch + items
-        with transaction.atomic():
+        total_qty = sum(int(r.get("quantity") or 1) for r in normalized_rows)
+        max_quantity = _batch_max_quantity()
+        if total_qty < 1 or total_qty > max_quantity:
+            messages.error(request, f"Total quantity across the uploaded file must be between 1 and {max_quantity}.")
+            return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
 
-            total_qty = sum(int(r.get("quantity") or 1) for r in normalized_rows)
-            if total_qty < 1 or total_qty > 2000:
-                messages.error(request, "Total quantity across the uploaded file must be between 1 and 2000.")
-                return redirect("label_generate_multi", workspace_id=workspace.id, template_id=template.id)
-
-            remaining = get_labels_remaining(workspace.org)
-            if remaining is not None and total_qty > remaining:
-                return limit_redirect(
-                    request,
-                    workspace.org,
-                    f"You need {total_qty} labels but only {remaining} are left. Please upgrade."
-                )
+        # hold the labels before the (long) import so a concurrent upload cannot spend them;
+        # the hold becomes usage together with the batch, or is given back
+        try:
+            reservation = reserve_labels(workspace.org, total_qty)
+        except LabelLimitExceeded as e:
+            return limit_redirect(request, workspace.org, str(e))
 
-            batch = LabelBatch.objects.create(
-                workspace=workspace,
-                template=template,
-                created_by=user,
-                mode=LabelBatch.MODE_MULTI,
-                quantity=total_qty,
-                ean_code="",
-                gs1_code="",
-                field_values={},  # unused in MULTI
-            )
-            record_label_generation(org=workspace.org, qty=int(total_qty or 0))
-            for idx, r in enumerate(normalized_rows, start=1):
-                LabelBatchItem.objects.create(
-                    batch=batch,
-                    row_index=idx,
-                    ean_code=r["ean_code"],
-                    gs1_code=r.get("gs1_code") or "",
-                    quantity=int(r.get("quantity") or 1),
-                    field_values=r.get("field_values") or {},
+        # Create MULTI batch + items
+        try:
+            with transaction.atomic():
+                batch = LabelBatch.objects.create(
+                    workspace=workspace,
+                    template=template,
+                    created_by=user,
+                    mode=LabelBatch.MODE_MULTI,
+                    quantity=total_qty,
+                    ean_code="",
+                    gs1_code="",
+                    field_values={},  # unused in MULTI
+                    label_index=build_batch_index(
+                        (idx, r["ean_code"], r.get("gs1_code") or "", r.get("quantity") or 1)
+                        for idx, r in enumerate(normalized_rows, start=1)
+                    ),
                 )
+                ingest_batch_items(batch, normalized_rows)
+                commit_reservation(reservation, batch=batch)
+        except LabelLimitExceeded as e:
+            # the hold lapsed during the import and the allowance was used up meanwhile
+            release_reservation(reservation)
+            return limit_redirect(request, workspace.org, str(e))
+        except Exception:
+            release_reservation(reservation)
+            raise
 
         messages.success(request, f"Imported {len(normalized_rows)} rows successfully.")
         return redirect("label_generate_single_preview", workspace_id=workspace.id, batch_id=batch.id)
@@ -3176,7 +3105,7 @@ def org_label_history(request):
         LabelBatch.objects
         .filter(workspace__org=user.org)
         .select_related("workspace", "template", "created_by")
-        .annotate(row_count=Count("items"))  # LabelBatchItem related_name="items"
+        .annotate(row_count=BATCH_ROW_COUNT)
         .order_by("-created_at")
     )
 